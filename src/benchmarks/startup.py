@@ -0,0 +1,120 @@
+"""
+Startup benchmark for the MCP Cloud Server.
+
+Measures, over several fresh interpreters:
+  - import time of the server modules (and whether libcloud was loaded)
+  - time from spawning `main.py` over stdio to the MCP handshake completing
+  - time from spawning to the first tool response
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--tool list_profiles] [--output startup.json]
+
+Without credentials in the environment, dummy ones are used; the default
+list_profiles tool does not contact the provider.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter so that nothing is already imported
+IMPORT_PROBE = """
+import json, sys, time
+started_at = time.perf_counter()
+import mcp.server.fastmcp
+mcp_loaded_at = time.perf_counter()
+import cloud, storage
+finished_at = time.perf_counter()
+print(json.dumps({
+    'mcp_seconds': mcp_loaded_at - started_at,
+    'server_modules_seconds': finished_at - mcp_loaded_at,
+    'libcloud_loaded': 'libcloud' in sys.modules,
+}))
+"""
+
+
+def _server_env():
+    env = dict(os.environ)
+    env.setdefault('CLOUD_ACCESS_KEY', 'benchmark')
+    env.setdefault('CLOUD_SECRET_KEY', 'benchmark')
+    return env
+
+
+def measure_imports():
+    """Time the server module imports in a fresh interpreter"""
+    output = subprocess.check_output([sys.executable, '-c', IMPORT_PROBE], cwd=SRC_DIR,
+                                     env=_server_env(), stderr=subprocess.DEVNULL)
+    return json.loads(output)
+
+
+async def measure_first_response(tool, arguments):
+    """Spawn the server over stdio and time the handshake and the first tool call"""
+    params = StdioServerParameters(command=sys.executable, args=[os.path.join(SRC_DIR, 'main.py')],
+                                   env=_server_env(), cwd=SRC_DIR)
+    started_at = time.perf_counter()
+    with open(os.devnull, 'w') as errlog:
+        async with stdio_client(params, errlog=errlog) as (read_stream, write_stream):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                initialized_at = time.perf_counter()
+                result = await session.call_tool(tool, arguments)
+                responded_at = time.perf_counter()
+    return {
+        'handshake_seconds': initialized_at - started_at,
+        'first_tool_seconds': responded_at - started_at,
+        'tool_error': bool(result.isError),
+    }
+
+
+def _summarize(samples, field):
+    values = [sample[field] for sample in samples]
+    return {
+        'min': round(min(values), 4),
+        'median': round(statistics.median(values), 4),
+        'max': round(max(values), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure MCP Cloud Server startup latency")
+    parser.add_argument('--runs', type=int, default=5, help="Number of fresh processes to measure")
+    parser.add_argument('--tool', default='list_profiles', help="Tool called for the first response")
+    parser.add_argument('--arguments', default='{}', help="JSON arguments for the tool")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    imports = [measure_imports() for _ in range(args.runs)]
+    responses = [asyncio.run(measure_first_response(args.tool, json.loads(args.arguments)))
+                 for _ in range(args.runs)]
+
+    results = {
+        'runs': args.runs,
+        'tool': args.tool,
+        'python': sys.version.split()[0],
+        'imports': {
+            'mcp_seconds': _summarize(imports, 'mcp_seconds'),
+            'server_modules_seconds': _summarize(imports, 'server_modules_seconds'),
+            'libcloud_loaded_at_startup': any(sample['libcloud_loaded'] for sample in imports),
+        },
+        'handshake_seconds': _summarize(responses, 'handshake_seconds'),
+        'first_tool_seconds': _summarize(responses, 'first_tool_seconds'),
+        'tool_errors': sum(sample['tool_error'] for sample in responses),
+    }
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+"""
+Offline benchmark suite for the storage tools.
+
+Every storage tool is exercised against libcloud's LOCAL filesystem driver
+(or, with --s3-endpoint, a local S3-compatible server such as MinIO) using
+synthetic buckets. For each bucket size and tool the suite reports latency
+percentiles, calls and bytes per second, errors, peak RSS and how long the
+event loop was blocked, and writes the results as JSON.
+
+Usage:
+    python benchmarks/storage_bench.py --objects 1000,100000 --output bench.json
+    python benchmarks/storage_bench.py --objects 1000 --baseline bench.json
+    python benchmarks/storage_bench.py --s3-endpoint http://localhost:9000 \\
+        --access-key minioadmin --secret-key minioadmin
+
+The LOCAL driver needs the fasteners package. Populating 10^6 objects
+writes 10^6 files and takes a while; pass --root to reuse a populated tree.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cloud
+import dispatch
+import storage
+import transfer
+
+DEFAULT_OBJECT_COUNTS = [1000]
+DEFAULT_OBJECT_SIZE = 1024
+DEFAULT_ITERATIONS = 50
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_PAGES = 10
+# Objects are spread over this many top-level folders, e.g. d007/obj0000007
+FOLDER_COUNT = 100
+BATCH_SIZE = 100
+# Event loop stalls shorter than this are scheduling noise
+LOOP_LAG_THRESHOLD = 0.005
+LOOP_PROBE_INTERVAL = 0.001
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_bytes():
+    """Return the peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def object_name(index, count):
+    return f"d{index % FOLDER_COUNT:03d}/obj{index:0{len(str(count))}d}"
+
+
+class LoopMonitor:
+    """Measure how long the event loop fails to run a frequently scheduled probe"""
+
+    def __init__(self):
+        self.blocked_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.stalls = 0
+        self._task = None
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LOOP_PROBE_INTERVAL
+            await asyncio.sleep(LOOP_PROBE_INTERVAL)
+            lag = loop.time() - expected
+            if lag > LOOP_LAG_THRESHOLD:
+                self.blocked_seconds += lag
+                self.stalls += 1
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        return {
+            'blocked_seconds': round(self.blocked_seconds, 4),
+            'max_lag_seconds': round(self.max_lag_seconds, 4),
+            'stalls': self.stalls
+        }
+
+
+def _is_error(result):
+    if isinstance(result, list):
+        return any(isinstance(item, dict) and 'error' in item for item in result)
+    return isinstance(result, dict) and ('error' in result or result.get('status') in ('error', 'partial'))
+
+
+async def measure(make_call, iterations, concurrency, bytes_per_call=0):
+    """
+    Run make_call(i) for i in range(iterations), at most concurrency at a time.
+
+    Returns:
+        Dict[str, Any]: Latency percentiles, throughput, errors, peak RSS and event loop blocking
+    """
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _timed(index):
+        nonlocal errors
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                result = await make_call(index)
+                failed = _is_error(result)
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - started_at)
+            errors += failed
+
+    monitor = LoopMonitor()
+    monitor.start()
+    started_at = time.perf_counter()
+    await asyncio.gather(*(_timed(index) for index in range(iterations)))
+    elapsed = time.perf_counter() - started_at
+    loop_stats = await monitor.stop()
+
+    return {
+        'calls': iterations,
+        'errors': errors,
+        'concurrency': concurrency,
+        'elapsed_seconds': round(elapsed, 4),
+        'calls_per_sec': round(iterations / elapsed, 2) if elapsed > 0 else None,
+        'bytes_per_sec': int(bytes_per_call * iterations / elapsed) if bytes_per_call and elapsed > 0 else None,
+        'latency_seconds': {
+            'mean': round(statistics.mean(latencies), 6),
+            'p50': round(percentile(latencies, 0.50), 6),
+            'p90': round(percentile(latencies, 0.90), 6),
+            'p99': round(percentile(latencies, 0.99), 6),
+            'max': round(max(latencies), 6),
+        },
+        'event_loop': loop_stats,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+
+def populate_local(root, bucket, count, payload):
+    """Write a synthetic bucket straight into the LOCAL driver's directory layout"""
+    bucket_dir = os.path.join(root, bucket)
+    # Kept outside the bucket so that it is not listed as an object
+    marker = os.path.join(root, f".{bucket}.populated")
+    if os.path.exists(marker):
+        return
+    for folder in range(min(count, FOLDER_COUNT)):
+        os.makedirs(os.path.join(bucket_dir, f"d{folder:03d}"), exist_ok=True)
+    for index in range(count):
+        with open(os.path.join(bucket_dir, object_name(index, count)), 'wb') as f:
+            f.write(payload)
+    open(marker, 'w').close()
+
+
+def populate_remote(bucket, count, payload):
+    """Create a synthetic bucket through the driver, uploading objects in parallel"""
+    driver = cloud.get_thread_driver()
+    try:
+        container = driver.get_container(bucket)
+    except Exception:
+        container = driver.create_container(bucket)
+    if any(True for _ in driver.iterate_container_objects(container)):
+        return
+
+    def _put(index):
+        item_driver = cloud.get_thread_driver()
+        item_container = cloud.Container(name=container.name, extra=container.extra, driver=item_driver)
+        item_container.upload_object_via_stream(iter([payload]), object_name(index, count))
+
+    tasks = (lambda index=index: _put(index) for index in range(count))
+    transfer.run_windowed(tasks, 32, keep_results=False)
+
+
+async def run_bucket(bucket, count, object_size, iterations, concurrency, max_pages, workdir):
+    """Benchmark every storage tool against one synthetic bucket"""
+    rng = random.Random(count)
+    sample = [object_name(rng.randrange(count), count) for _ in range(iterations)]
+    upload_path = os.path.join(workdir, 'upload.bin')
+    with open(upload_path, 'wb') as f:
+        f.write(os.urandom(object_size))
+    batch_dir = os.path.join(workdir, 'batch-source')
+    os.makedirs(batch_dir, exist_ok=True)
+    for index in range(BATCH_SIZE):
+        with open(os.path.join(batch_dir, f"file{index:03d}.bin"), 'wb') as f:
+            f.write(os.urandom(object_size))
+    folder_objects = min(count, -(-count // FOLDER_COUNT))
+    batch_objects = min(BATCH_SIZE, folder_objects)
+
+    listing_page = 1000
+
+    async def _paged_listing(_):
+        token = None
+        for _page in range(max_pages):
+            result = await storage.list_objects(bucket, page_size=listing_page, continuation_token=token)
+            token = result.get('next_token')
+            if 'error' in result or not token:
+                return result
+        return result
+
+    uploaded = [f"bench-upload/{index:06d}" for index in range(iterations)]
+    scenarios = [
+        ('list_profiles', lambda i: storage.list_profiles(), 0),
+        ('list_buckets', lambda i: storage.list_buckets(), 0),
+        ('get_bucket_details', lambda i: storage.get_bucket_details(bucket), 0),
+        ('list_objects', lambda i: storage.list_objects(bucket, page_size=listing_page), 0),
+        ('list_objects_paged', _paged_listing, 0),
+        ('list_objects_compact', lambda i: storage.list_objects(
+            bucket, page_size=listing_page, fields=['name', 'size'], compact=True), 0),
+        ('list_all_objects', lambda i: storage.list_all_objects(bucket, prefix='d000/', delimiter='/',
+                                                                 page_size=listing_page), 0),
+        ('get_object_cold', lambda i: storage.get_object(bucket, sample[i], revalidate=True), 0),
+        ('get_object_warm', lambda i: storage.get_object(bucket, sample[0]), 0),
+        ('download_object', lambda i: storage.download_object(
+            bucket, sample[i], os.path.join(workdir, 'download', f"{i}.bin")), object_size),
+        ('upload_object', lambda i: storage.upload_object(bucket, uploaded[i], upload_path), object_size),
+        ('delete_object', lambda i: storage.delete_object(bucket, uploaded[i]), 0),
+        ('download_objects', lambda i: storage.download_objects(
+            bucket, os.path.join(workdir, 'batch', str(i)), prefix='d000/', max_objects=batch_objects),
+         object_size * batch_objects),
+        ('upload_objects', lambda i: storage.upload_objects(
+            bucket, source_dir=batch_dir, prefix=f"bench-batch/{i}/"), object_size * BATCH_SIZE),
+        ('sync_prefix', lambda i: storage.sync_prefix(
+            bucket, os.path.join(workdir, 'sync'), prefix='d001/'), 0),
+        ('get_dispatch_stats', lambda i: storage.get_dispatch_stats(), 0),
+        ('get_cache_stats', lambda i: storage.get_cache_stats(), 0),
+    ]
+
+    # Batch tools move BATCH_SIZE objects per call, so they get fewer calls
+    heavy = {'download_objects', 'upload_objects', 'sync_prefix', 'list_objects_paged'}
+    results = {}
+    for name, make_call, bytes_per_call in scenarios:
+        calls = max(1, iterations // 10) if name in heavy else iterations
+        results[name] = await measure(make_call, calls, concurrency, bytes_per_call)
+        print(f"  {name}: p50={results[name]['latency_seconds']['p50']:.4f}s "
+              f"errors={results[name]['errors']}", file=sys.stderr)
+    results['dispatch'] = dispatch.get_stats()
+    return results
+
+
+def compare(results, baseline):
+    """Return p50 latency ratios (current / baseline) for tools present in both result sets"""
+    ratios = {}
+    for bucket_size, tools in results['buckets'].items():
+        previous = baseline.get('buckets', {}).get(bucket_size, {})
+        for name, stats in tools.items():
+            before = previous.get(name, {}).get('latency_seconds', {}).get('p50')
+            after = stats.get('latency_seconds', {}).get('p50') if isinstance(stats, dict) else None
+            if before and after:
+                ratios[f"{bucket_size}/{name}"] = round(after / before, 3)
+    return ratios
+
+
+def configure_driver(args, root):
+    """Point the default cloud profile at the LOCAL driver or an S3-compatible endpoint"""
+    if args.s3_endpoint:
+        endpoint = urlparse(args.s3_endpoint)
+        # The S3 driver uses path-style requests against a custom host
+        cloud.register_profile(cloud.DEFAULT_PROFILE, 'aws', args.access_key, args.secret_key, args.region,
+                               host=endpoint.hostname, port=endpoint.port,
+                               secure=endpoint.scheme == 'https')
+        return 's3-compatible'
+    cloud.SUPPORTED_PROVIDERS.setdefault('local', 'local')
+    if cloud.initialize_cloud_driver_internal('local', root, None, None) is None:
+        raise SystemExit("Could not initialize the LOCAL driver (is fasteners installed?)")
+    return 'local'
+
+
+async def run_suite(args, root, workdir):
+    provider = configure_driver(args, root)
+    payload = os.urandom(args.object_size)
+    results = {
+        'meta': {
+            'provider': provider,
+            'object_size': args.object_size,
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+            'python': sys.version.split()[0],
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'buckets': {}
+    }
+    for count in args.objects:
+        bucket = f"bench-{count}"
+        print(f"Populating {bucket}", file=sys.stderr)
+        started_at = time.perf_counter()
+        if provider == 'local':
+            populate_local(root, bucket, count, payload)
+        else:
+            populate_remote(bucket, count, payload)
+        populate_seconds = time.perf_counter() - started_at
+
+        storage.container_cache.clear()
+        storage.object_cache.clear()
+        dispatch.reset_stats()
+        bucket_workdir = os.path.join(workdir, bucket)
+        os.makedirs(bucket_workdir, exist_ok=True)
+        print(f"Benchmarking {bucket}", file=sys.stderr)
+        tools = await run_bucket(bucket, count, args.object_size, args.iterations, args.concurrency,
+                                 args.max_pages, bucket_workdir)
+        tools['populate_seconds'] = round(populate_seconds, 3)
+        results['buckets'][str(count)] = tools
+        shutil.rmtree(bucket_workdir, ignore_errors=True)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the storage tools offline")
+    parser.add_argument('--objects', default=','.join(map(str, DEFAULT_OBJECT_COUNTS)),
+                        type=lambda value: [int(float(item)) for item in value.split(',')],
+                        help="Comma-separated bucket sizes, e.g. 1000,1e5,1e6")
+    parser.add_argument('--object-size', type=int, default=DEFAULT_OBJECT_SIZE, help="Bytes per object")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help="Calls per tool")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Calls in flight per tool")
+    parser.add_argument('--max-pages', type=int, default=DEFAULT_MAX_PAGES,
+                        help="Pages walked per list_objects_paged call")
+    parser.add_argument('--root', help="LOCAL driver root; populated buckets are kept and reused")
+    parser.add_argument('--s3-endpoint', help="Use an S3-compatible server at this URL instead of LOCAL")
+    parser.add_argument('--access-key', default=os.environ.get(cloud.ENV_CLOUD_KEY))
+    parser.add_argument('--secret-key', default=os.environ.get(cloud.ENV_CLOUD_SECRET))
+    parser.add_argument('--region', default=cloud.DEFAULT_CLOUD_REGION)
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare p50 latencies with a previous results file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    root = args.root or tempfile.mkdtemp(prefix='mcp-cloud-bench-')
+    workdir = tempfile.mkdtemp(prefix='mcp-cloud-bench-work-')
+    try:
+        results = asyncio.run(run_suite(args, root, workdir))
+    finally:
+        dispatch.shutdown()
+        transfer.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            results['p50_ratio_vs_baseline'] = compare(results, json.load(f))
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import base64
+import hashlib
+from typing import Any, Dict, List
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+import cloud
+from cloud import logger
+
+# S3 DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+# Largest object S3 copies in a single CopyObject request
+MAX_COPY_SIZE = 5 * 1024 * 1024 * 1024
+# Bytes per UploadPartCopy request when copying larger objects
+COPY_PART_SIZE = 512 * 1024 * 1024
+
+MODE_BATCH = 'batch'
+MODE_SERVER = 'server'
+MODE_STREAM = 'stream'
+MODE_INDIVIDUAL = 'individual'
+
+
+def _is_amazon_compatible(driver) -> bool:
+    # Google's XML API is S3-like but has no multi-object delete and uses its own copy headers
+    return cloud.is_s3_driver(driver) and getattr(driver, 'type', None) != 'google_storage'
+
+
+def supports_batch_delete(driver) -> bool:
+    """Return True if the driver can delete many objects in one request"""
+    return _is_amazon_compatible(driver)
+
+
+def supports_server_copy(driver) -> bool:
+    """Return True if the provider can copy objects without the data passing through this server"""
+    return _is_amazon_compatible(driver)
+
+
+def _findall(driver, element, tag):
+    from libcloud.utils.xml import fixxpath
+    return element.findall(fixxpath(xpath=tag, namespace=driver.namespace))
+
+
+def _findtext(driver, element, tag):
+    from libcloud.utils.xml import findtext
+    return findtext(element=element, xpath=tag, namespace=driver.namespace, no_text_value=None)
+
+
+def delete_batch(driver, container, names: List[str]) -> Dict[str, str]:
+    """
+    Delete up to DELETE_BATCH_SIZE objects with one S3 DeleteObjects request.
+
+    S3 reports keys that do not exist as deleted.
+
+    Args:
+        driver: S3-compatible storage driver owned by the calling thread
+        container: Container holding the objects
+        names (List[str]): Object names to delete
+
+    Returns:
+        Dict[str, str]: Error message per object name that could not be deleted
+    """
+    from libcloud.utils.py3 import httplib
+
+    if len(names) > DELETE_BATCH_SIZE:
+        raise ValueError(f"At most {DELETE_BATCH_SIZE} objects can be deleted per request")
+    keys = ''.join(f'<Object><Key>{escape(name)}</Key></Object>' for name in names)
+    # Quiet mode only lists the keys that failed
+    data = f'<?xml version="1.0" encoding="UTF-8"?><Delete><Quiet>true</Quiet>{keys}</Delete>'.encode('utf-8')
+    headers = {
+        'Content-Length': len(data),
+        'Content-Type': 'application/xml',
+        'Content-MD5': base64.b64encode(hashlib.md5(data).digest()).decode('utf-8'),
+    }
+    response = driver.connection.request(driver._get_container_path(container), method='POST', data=data,
+                                         headers=headers, params={'delete': ''})
+    if response.status != httplib.OK:
+        raise cloud.LibcloudError(f"Error deleting objects (status {response.status})", driver=driver)
+
+    errors = {}
+    for node in _findall(driver, response.object, 'Error'):
+        key = _findtext(driver, node, 'Key')
+        errors[key] = f"{_findtext(driver, node, 'Message') or 'Delete failed'} ({_findtext(driver, node, 'Code')})"
+    return errors
+
+
+def _copy_headers(source_container_name: str, source_name: str) -> Dict[str, str]:
+    return {'x-amz-copy-source': quote(f'{source_container_name}/{source_name}', safe='/')}
+
+
+def _check_copy_response(driver, response, description: str) -> str:
+    """Return the ETag of a copy result; S3 can report a failed copy in the body of a 200 response"""
+    from libcloud.utils.py3 import httplib
+
+    body = response.object
+    if response.status != httplib.OK or body is None or body.tag.rsplit('}', 1)[-1] == 'Error':
+        message = _findtext(driver, body, 'Message') if body is not None else None
+        raise cloud.LibcloudError(f"Error copying {description}: {message or f'status {response.status}'}",
+                                  driver=driver)
+    return (_findtext(driver, body, 'ETag') or '').replace('"', '')
+
+
+def _server_copy(driver, source, destination_container, destination_name: str) -> str:
+    """Copy an object of up to MAX_COPY_SIZE bytes with one CopyObject request, returning its ETag"""
+    headers = _copy_headers(source.container.name, source.name)
+    headers['x-amz-metadata-directive'] = 'COPY'
+    response = driver.connection.request(driver._get_object_path(destination_container, destination_name),
+                                         method='PUT', headers=headers)
+    return _check_copy_response(driver, response, source.name)
+
+
+def _server_copy_multipart(driver, source, destination_container, destination_name: str) -> str:
+    """
+    Copy a large object as a multipart upload of server-side part copies, returning its ETag.
+
+    Parts are copied one after another: this already runs on a batch worker,
+    and the copy does not move data through this server.
+    """
+    headers = {'Content-Type': source.extra.get('content_type') or
+               driver._determine_content_type(None, destination_name)}
+    upload_id = driver._initiate_multipart(destination_container, destination_name, headers=headers)
+    request_path = driver._get_object_path(destination_container, destination_name)
+    chunks = []
+    try:
+        for number, offset in enumerate(range(0, source.size, COPY_PART_SIZE), start=1):
+            end = min(offset + COPY_PART_SIZE, source.size) - 1
+            headers = _copy_headers(source.container.name, source.name)
+            headers['x-amz-copy-source-range'] = f'bytes={offset}-{end}'
+            response = driver.connection.request(request_path, method='PUT', headers=headers,
+                                                 params={'uploadId': upload_id, 'partNumber': number})
+            chunks.append((number, _check_copy_response(driver, response, f'part {number} of {source.name}')))
+        etag = driver._commit_multipart(destination_container, destination_name, upload_id, chunks)
+    except Exception:
+        try:
+            driver._abort_multipart(destination_container, destination_name, upload_id)
+        except Exception as e:
+            logger.error(f"Failed to abort multipart copy of {source.name}: {str(e)}")
+        raise
+    return etag.replace('"', '') if etag else etag
+
+
+def copy_object(driver, source, destination_container, destination_name: str) -> Dict[str, Any]:
+    """
+    Copy an object, server-side where the provider supports it.
+
+    Other providers stream the object through this server without writing it
+    to disk.
+
+    Args:
+        driver: Storage driver owned by the calling thread
+        source: Object to copy; its size must be known for server-side copies
+        destination_container: Container to copy into, bound to driver
+        destination_name (str): Name of the copy
+
+    Returns:
+        Dict[str, Any]: Name, size, hash and copy mode of the new object
+    """
+    if supports_server_copy(driver):
+        if source.size is not None and source.size > MAX_COPY_SIZE:
+            etag = _server_copy_multipart(driver, source, destination_container, destination_name)
+        else:
+            etag = _server_copy(driver, source, destination_container, destination_name)
+        return {'name': destination_name, 'size': source.size, 'hash': etag, 'mode': MODE_SERVER}
+
+    obj = destination_container.upload_object_via_stream(iterator=driver.download_object_as_stream(source),
+                                                         object_name=destination_name)
+    return {'name': destination_name, 'size': obj.size, 'hash': obj.hash, 'mode': MODE_STREAM}
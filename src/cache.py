@@ -0,0 +1,345 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+from cloud import logger
+
+# Returned by TTLCache.get when a key is not cached, since None is a valid value
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed time-to-live"""
+
+    # Operations only touch memory, so they can run on the event loop
+    blocking = False
+
+    def __init__(self, max_size: int = 256, ttl: float = 300.0):
+        """
+        Args:
+            max_size (int): Maximum number of entries; the least recently used entry is evicted first
+            ttl (float): Seconds an entry stays valid; 0 disables caching
+        """
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return the cached value for key, or default if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return the cached value for key without touching counters or LRU order"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return default
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the least recently used entries if full"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Remove key from the cache, returning True if it was present"""
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            self.invalidations += 1
+            return True
+
+    def invalidate_where(self, predicate) -> int:
+        """Remove every entry whose key matches predicate, returning the number removed"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dict[str, Any]: Size, limits and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    cache TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (cache, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_entries_expiry ON cache_entries (cache, expires_at);
+"""
+
+
+def _encode_key(key: Hashable) -> str:
+    # Keys are tuples of strings and numbers; JSON keeps them readable and comparable across processes
+    return json.dumps(key, separators=(',', ':'))
+
+
+def _decode_key(text: str) -> Hashable:
+    key = json.loads(text)
+    return tuple(key) if isinstance(key, list) else key
+
+
+class SharedTTLCache:
+    """
+    TTLCache kept in a SQLite file, so that server processes on one host share its entries.
+
+    Entries expire by wall-clock time and, when the cache is full, the
+    entries closest to expiry are evicted rather than the least recently
+    used, so that lookups never write; expired rows are removed by set().
+    Keys must be JSON-serialisable and values picklable. Hit/miss counters
+    are per process.
+    """
+
+    # Operations query SQLite and may wait on other processes' writes, so keep them off the event loop
+    blocking = True
+
+    def __init__(self, path: str, name: str, max_size: int = 256, ttl: float = 300.0):
+        """
+        Args:
+            path (str): SQLite database file, created on first use
+            name (str): Name separating this cache's entries from other caches in the same file
+            max_size (int): Maximum number of entries
+            ttl (float): Seconds an entry stays valid; 0 disables caching
+        """
+        self.path = path
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the calling thread's connection; the file is only opened once the cache is used"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5)
+            # WAL lets every process read while one writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SHARED_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _failed(self, action: str, error: Exception):
+        # A busy or broken cache file must not fail the tool call; it just behaves like a miss
+        self._count('errors')
+        logger.warning(f"Shared cache {self.name}: {action} failed: {str(error)}")
+
+    def _lookup(self, key: Hashable):
+        """Return the pickled value for key and whether it expired, or None if it is not stored"""
+        row = self._connect().execute("SELECT value, expires_at FROM cache_entries WHERE cache = ? AND key = ?",
+                                      (self.name, _encode_key(key))).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1] <= time.time()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return the cached value for key, or default if it is missing or expired"""
+        try:
+            entry = self._lookup(key)
+            if entry is None or entry[1]:
+                self._count('misses')
+                return default
+            value = pickle.loads(entry[0])
+        except (sqlite3.Error, pickle.UnpicklingError) as e:
+            self._failed('get', e)
+            self._count('misses')
+            return default
+        self._count('hits')
+        return value
+
+    def peek(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return the cached value for key without touching counters"""
+        try:
+            entry = self._lookup(key)
+            if entry is None or entry[1]:
+                return default
+            return pickle.loads(entry[0])
+        except (sqlite3.Error, pickle.UnpicklingError) as e:
+            self._failed('peek', e)
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, dropping expired entries and evicting the ones closest to expiry if full"""
+        if self.ttl <= 0:
+            return
+        now = time.time()
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            with self._connect() as connection:
+                connection.execute("INSERT OR REPLACE INTO cache_entries (cache, key, value, expires_at) "
+                                   "VALUES (?, ?, ?, ?)", (self.name, _encode_key(key), data, now + self.ttl))
+                expired = connection.execute("DELETE FROM cache_entries WHERE cache = ? AND expires_at <= ?",
+                                             (self.name, now)).rowcount
+                size = connection.execute("SELECT COUNT(*) FROM cache_entries WHERE cache = ?",
+                                          (self.name,)).fetchone()[0]
+                evicted = 0
+                if size > self.max_size:
+                    evicted = connection.execute(
+                        "DELETE FROM cache_entries WHERE cache = ? AND key IN (SELECT key FROM cache_entries "
+                        "WHERE cache = ? ORDER BY expires_at LIMIT ?)",
+                        (self.name, self.name, size - self.max_size)).rowcount
+        except (sqlite3.Error, pickle.PicklingError) as e:
+            self._failed('set', e)
+            return
+        with self._lock:
+            self.expirations += expired
+            self.evictions += evicted
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Remove key from the cache, returning True if it was present"""
+        try:
+            with self._connect() as connection:
+                removed = connection.execute("DELETE FROM cache_entries WHERE cache = ? AND key = ?",
+                                             (self.name, _encode_key(key))).rowcount
+        except sqlite3.Error as e:
+            self._failed('invalidate', e)
+            return False
+        self._count('invalidations', removed)
+        return removed > 0
+
+    def invalidate_where(self, predicate) -> int:
+        """Remove every entry whose key matches predicate, returning the number removed"""
+        try:
+            with self._connect() as connection:
+                rows = connection.execute("SELECT key FROM cache_entries WHERE cache = ?", (self.name,)).fetchall()
+                keys = [(self.name, row[0]) for row in rows if predicate(_decode_key(row[0]))]
+                connection.executemany("DELETE FROM cache_entries WHERE cache = ? AND key = ?", keys)
+        except sqlite3.Error as e:
+            self._failed('invalidate_where', e)
+            return 0
+        self._count('invalidations', len(keys))
+        return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries of this cache"""
+        try:
+            with self._connect() as connection:
+                connection.execute("DELETE FROM cache_entries WHERE cache = ?", (self.name,))
+        except sqlite3.Error as e:
+            self._failed('clear', e)
+
+    def __len__(self):
+        try:
+            return self._connect().execute("SELECT COUNT(*) FROM cache_entries WHERE cache = ? AND expires_at > ?",
+                                           (self.name, time.time())).fetchone()[0]
+        except sqlite3.Error as e:
+            self._failed('len', e)
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dict[str, Any]: Size, limits, database path and this process's hit/miss/eviction counters
+        """
+        size = len(self)
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': size,
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'errors': self.errors,
+                'shared_path': self.path,
+            }
+
+
+def create(name: str, max_size: int, ttl: float, shared_path: str = None):
+    """
+    Build a cache: a SharedTTLCache in shared_path if given, else an in-process TTLCache.
+
+    Args:
+        name (str): Name of the cache within the shared database
+        max_size (int): Maximum number of entries
+        ttl (float): Seconds an entry stays valid; 0 disables caching
+        shared_path (str, optional): SQLite file shared by the server processes
+
+    Returns:
+        TTLCache or SharedTTLCache: The cache
+    """
+    if shared_path:
+        return SharedTTLCache(shared_path, name, max_size=max_size, ttl=ttl)
+    return TTLCache(max_size=max_size, ttl=ttl)
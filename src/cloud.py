@@ -1,25 +1,24 @@
+import asyncio
+import importlib
+import importlib.util
+import itertools
 import logging
 import os
+import random
+import re
+import socket
 import sys
+import threading
+import time
 
-# Try to import libcloud, install it if not available
-try:
-    from libcloud.storage.types import Provider
-    from libcloud.storage.providers import get_driver
-    from libcloud.common.types import LibcloudError
-except ImportError:
-    logging.error("Apache Libcloud not found. Installing...")
-    import subprocess
-    try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "apache-libcloud==3.8.0"])
-        # Now import after installation
-        from libcloud.storage.types import Provider
-        from libcloud.storage.providers import get_driver
-        from libcloud.common.types import LibcloudError
-        logging.info("Successfully installed apache-libcloud")
-    except Exception as e:
-        logging.error(f"Failed to install apache-libcloud: {str(e)}")
-        sys.exit(1)
+# libcloud (and requests, which it pulls in) is imported on first use so that
+# the server can answer the MCP handshake without paying for it; these names
+# are resolved lazily by __getattr__ below
+_LAZY_IMPORTS = {
+    'LibcloudError': 'libcloud.common.types',
+    'Container': 'libcloud.storage.base',
+    'Object': 'libcloud.storage.base',
+}
 
 # Configure logging
 logging.basicConfig(
@@ -40,45 +39,714 @@ DEFAULT_CLOUD_REGION = "us-east-1"
 
 DEFAULT_CLOUD_PROVIDER = "aws"
 
+# Values are libcloud.storage.types.Provider constants, spelled out to avoid importing libcloud
 SUPPORTED_PROVIDERS = {
-    'aws': Provider.S3,
-    'azure': Provider.AZURE_BLOBS,
-    'google': Provider.GOOGLE_STORAGE,
+    'aws': 's3',
+    'azure': 'azure_blobs',
+    'google': 'google_storage',
 }
 
-# Global variables for cloud configuration
+ENV_CLOUD_PROFILES = "CLOUD_PROFILES"
+ENV_CLOUD_HTTP_TIMEOUT = "CLOUD_HTTP_TIMEOUT"
+ENV_CLOUD_POOL_MAXSIZE = "CLOUD_POOL_MAXSIZE"
+ENV_CLOUD_BACKEND = "CLOUD_BACKEND"
+DEFAULT_CLOUD_HTTP_TIMEOUT = 60
+DEFAULT_CLOUD_POOL_MAXSIZE = 10
+DEFAULT_PROFILE = "default"
+
+# Storage backends: libcloud drivers on worker threads, or the asyncio S3
+# client (s3async) for the per-request tools of S3-compatible providers
+BACKEND_LIBCLOUD = "libcloud"
+BACKEND_ASYNC = "async"
+ASYNC_BACKEND_PROVIDERS = ('aws',)
+
+# Resilience settings applied to every provider HTTP request
+ENV_CLOUD_MAX_RETRIES = "CLOUD_MAX_RETRIES"
+ENV_CLOUD_RETRY_BASE_DELAY = "CLOUD_RETRY_BASE_DELAY"
+ENV_CLOUD_RETRY_MAX_DELAY = "CLOUD_RETRY_MAX_DELAY"
+ENV_CLOUD_RATE_LIMIT = "CLOUD_RATE_LIMIT"
+ENV_CLOUD_RATE_BURST = "CLOUD_RATE_BURST"
+ENV_CLOUD_BREAKER_THRESHOLD = "CLOUD_BREAKER_THRESHOLD"
+ENV_CLOUD_BREAKER_COOLDOWN = "CLOUD_BREAKER_COOLDOWN"
+DEFAULT_CLOUD_MAX_RETRIES = 4
+DEFAULT_CLOUD_RETRY_BASE_DELAY = 0.2
+DEFAULT_CLOUD_RETRY_MAX_DELAY = 20.0
+DEFAULT_CLOUD_RATE_LIMIT = 0
+DEFAULT_CLOUD_BREAKER_THRESHOLD = 5
+DEFAULT_CLOUD_BREAKER_COOLDOWN = 30.0
+
+# Error classes returned by classify_error
+ERROR_THROTTLED = "throttled"
+ERROR_TRANSIENT = "transient"
+ERROR_FATAL = "fatal"
+ERROR_UNKNOWN = "unknown"
+_THROTTLE_STATUSES = {429, 503}
+_TRANSIENT_STATUSES = {500, 502, 504}
+_STATUS_PATTERN = re.compile(r'[Ss]tatus code: (\d{3})')
+# Throttled limiters never drop below this many requests per second
+MIN_RATE = 1.0
+# Recovery after throttling: multiply the rate by RATE_RECOVERY every second without throttling
+RATE_RECOVERY = 1.1
+# Retries may use at most this share of recent requests (plus RETRY_BUDGET_MIN) so failures cannot snowball
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MIN = 10
+
+# Global variables for cloud configuration (mirror the default profile)
 provider = None
 driver = None
 key = None
 secret = None
 region = None
 driver_class = None
+driver_kwargs = None
+driver_generation = 0
 # mcp = None
 
+# Named driver profiles, see register_profile()
+profiles = {}
+# Functions called with (profile, driver) for every driver built, e.g. to instrument its connection
+driver_hooks = []
+_registry_lock = threading.Lock()
+# Generations are unique across profiles so cache keys never collide after a re-initialization
+_generations = itertools.count(1)
+
 # Initialize from environment variables if available
 provider = os.environ.get(ENV_CLOUD_PROVIDER, "aws")
 key = os.environ.get(ENV_CLOUD_KEY)
 secret = os.environ.get(ENV_CLOUD_SECRET)
 region = os.environ.get(ENV_CLOUD_REGION, "us-east-1")
 
-def initialize_cloud_driver_internal(in_provider, in_key, in_secret, in_region):
-    """Internal function to initialize cloud driver with given credentials"""
+
+class ProviderUnavailableError(Exception):
+    """Raised without contacting the provider while a profile's circuit breaker is open"""
+
+
+def _error_status(exc):
+    """Return the HTTP status behind a provider error, if it can be determined"""
+    code = getattr(exc, 'code', None)
+    if isinstance(code, int):
+        return code
+    # libcloud reports most unexpected statuses only in the message
+    match = _STATUS_PATTERN.search(str(exc))
+    return int(match.group(1)) if match else None
+
+
+def classify_error(exc):
+    """
+    Classify a failed provider call.
+
+    Returns:
+        str: ERROR_THROTTLED (429/503, back off and retry), ERROR_TRANSIENT (other 5xx or a
+        connection failure, retry), ERROR_FATAL (retrying cannot help) or ERROR_UNKNOWN
+    """
+    from libcloud.common.types import InvalidCredsError
+    from libcloud.storage.types import ContainerDoesNotExistError, ObjectDoesNotExistError
+    from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+
+    if isinstance(exc, (ProviderUnavailableError, InvalidCredsError,
+                        ContainerDoesNotExistError, ObjectDoesNotExistError)):
+        return ERROR_FATAL
+    status = _error_status(exc)
+    if status in _THROTTLE_STATUSES:
+        return ERROR_THROTTLED
+    if status in _TRANSIENT_STATUSES:
+        return ERROR_TRANSIENT
+    if status is not None and 400 <= status < 500:
+        return ERROR_FATAL
+    if isinstance(exc, (ConnectionError, TimeoutError, socket.gaierror, RequestsConnectionError, Timeout)):
+        return ERROR_TRANSIENT
+    return ERROR_UNKNOWN
+
+
+def _retry_after(exc):
+    """Return the delay the provider asked for, in seconds, or 0"""
+    value = getattr(exc, 'retry_after', None)
+    if not value and getattr(exc, 'headers', None):
+        value = exc.headers.get('retry-after') or exc.headers.get('Retry-After')
+    try:
+        return max(0.0, float(value or 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the request rate, adapting to provider throttling.
+
+    When the provider throttles, the rate is halved (at most once per second)
+    and then grows by RATE_RECOVERY each second until it is back at the
+    configured limit, or, without a configured limit, at the rate where
+    throttling began, after which requests are unlimited again.
+    """
+
+    def __init__(self, rate=0, burst=None):
+        """
+        Args:
+            rate (float): Requests per second; 0 means unlimited until the provider throttles
+            burst (float, optional): Bucket capacity; defaults to one second of requests
+        """
+        self.limit = rate if rate and rate > 0 else None
+        self.rate = self.limit
+        self.burst = burst
+        self.ceiling = self.limit
+        self.observed_rate = 0.0
+        self.throttles = 0
+        self.waited_seconds = 0.0
+        now = time.monotonic()
+        self.tokens = self._capacity()
+        self._updated_at = now
+        self._adjusted_at = now
+        self._window_start = now
+        self._window_count = 0
+        self._lock = threading.Lock()
+
+    def _capacity(self):
+        if self.burst:
+            return float(self.burst)
+        return max(1.0, self.rate or 1.0)
+
+    def _recover(self, now):
+        """Grow a throttled rate back towards its ceiling; caller must hold _lock"""
+        if self.rate is None or self.rate == self.limit or now - self._adjusted_at < 1.0:
+            return
+        self.rate *= RATE_RECOVERY
+        self._adjusted_at = now
+        if self.ceiling is None or self.rate >= self.ceiling:
+            self.rate = self.limit
+
+    def _reserve(self):
+        """Take a token if one is available, returning 0, or else the seconds to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            self._recover(now)
+            if self.rate is not None:
+                self.tokens = min(self._capacity(), self.tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self.rate is None or self.tokens >= 1:
+                if self.rate is not None:
+                    self.tokens -= 1
+                self._window_count += 1
+                if now - self._window_start >= 1.0:
+                    self.observed_rate = self._window_count / (now - self._window_start)
+                    self._window_start = now
+                    self._window_count = 0
+                return 0
+            wait = (1 - self.tokens) / self.rate
+            self.waited_seconds += wait
+            return wait
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            wait = self._reserve()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait, without blocking the event loop, until a request may be sent"""
+        while True:
+            wait = self._reserve()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def on_throttle(self):
+        """Halve the rate after the provider throttled a request"""
+        with self._lock:
+            now = time.monotonic()
+            self.throttles += 1
+            # Requests already in flight when the provider started throttling
+            # report together; only back off once for them
+            if self.rate is not None and self.rate != self.limit and now - self._adjusted_at < 1.0:
+                return
+            current = self.rate if self.rate is not None else max(self.observed_rate, MIN_RATE * 2)
+            if self.limit is None:
+                self.ceiling = current
+            self.rate = max(MIN_RATE, current / 2)
+            self.tokens = 0.0
+            self._adjusted_at = now
+
+    def describe(self):
+        with self._lock:
+            return {
+                'rate_limit': self.limit,
+                'current_rate': round(self.rate, 2) if self.rate is not None else None,
+                'observed_rate': round(self.observed_rate, 2),
+                'throttles': self.throttles,
+                'waited_seconds': round(self.waited_seconds, 3),
+            }
+
+
+class CircuitBreaker:
+    """Stop calling a provider after consecutive transient failures, probing again after a cooldown"""
+
+    def __init__(self, threshold, cooldown):
+        """
+        Args:
+            threshold (int): Consecutive transient failures that open the circuit; 0 disables it
+            cooldown (float): Seconds the circuit stays open before one probe request is let through
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        # Token of the probe in flight while half open, None otherwise
+        self._probing = None
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def before_call(self, name):
+        """
+        Raise ProviderUnavailableError if requests must not be sent now.
+
+        Returns:
+            int: Token of the probe this call is, to pass to end_probe; None if it is not a probe
+        """
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    self.rejected += 1
+                    raise ProviderUnavailableError(
+                        f"Provider for profile {name} is unavailable after {self.failures} consecutive "
+                        f"failures; retrying after {self.cooldown:.0f}s")
+                self.state = 'half_open'
+                self._probing = None
+            if self.state == 'half_open':
+                if self._probing is not None:
+                    self.rejected += 1
+                    raise ProviderUnavailableError(f"Provider for profile {name} is being probed")
+                self._probes += 1
+                self._probing = self._probes
+                return self._probing
+            return None
+
+    def end_probe(self, token):
+        """
+        Settle a probe that neither on_success nor on_failure settled.
+
+        An unknown error or a cancelled call says nothing about the provider,
+        so it counts as a failed probe; otherwise the circuit would stay half
+        open and reject every call.
+        """
+        if token is None:
+            return
+        with self._lock:
+            if self._probing == token:
+                self._fail()
+
+    def on_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = None
+
+    def on_failure(self):
+        with self._lock:
+            self._fail()
+
+    def _fail(self):
+        self.failures += 1
+        self._probing = None
+        if self.state == 'half_open' or (self.threshold > 0 and self.failures >= self.threshold):
+            if self.state != 'open':
+                self.trips += 1
+                logger.warning(f"Opening circuit after {self.failures} consecutive provider failures")
+            self.state = 'open'
+            self._opened_at = time.monotonic()
+
+
+class ResiliencePolicy:
+    """
+    Retry, rate limiting and circuit breaking for one profile's provider requests.
+
+    Throttled and transient failures of replayable requests are retried with
+    full-jitter exponential backoff (honouring Retry-After), within a retry
+    budget proportional to recent traffic so that an outage cannot turn into a
+    retry storm.
+    """
+
+    def __init__(self, name, max_retries=None, base_delay=None, max_delay=None,
+                 rate=None, burst=None, threshold=None, cooldown=None):
+        def _setting(value, env_name, default, cast):
+            return cast(os.environ.get(env_name, default)) if value is None else cast(value)
+
+        self.name = name
+        self.max_retries = _setting(max_retries, ENV_CLOUD_MAX_RETRIES, DEFAULT_CLOUD_MAX_RETRIES, int)
+        self.base_delay = _setting(base_delay, ENV_CLOUD_RETRY_BASE_DELAY, DEFAULT_CLOUD_RETRY_BASE_DELAY, float)
+        self.max_delay = _setting(max_delay, ENV_CLOUD_RETRY_MAX_DELAY, DEFAULT_CLOUD_RETRY_MAX_DELAY, float)
+        burst = burst if burst is not None else os.environ.get(ENV_CLOUD_RATE_BURST)
+        self.limiter = RateLimiter(_setting(rate, ENV_CLOUD_RATE_LIMIT, DEFAULT_CLOUD_RATE_LIMIT, float),
+                                   float(burst) if burst else None)
+        self.breaker = CircuitBreaker(
+            _setting(threshold, ENV_CLOUD_BREAKER_THRESHOLD, DEFAULT_CLOUD_BREAKER_THRESHOLD, int),
+            _setting(cooldown, ENV_CLOUD_BREAKER_COOLDOWN, DEFAULT_CLOUD_BREAKER_COOLDOWN, float))
+        self.requests = 0
+        self.retries = 0
+        self.gave_up = 0
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._window_retries = 0
+        self._lock = threading.Lock()
+
+    def _count_request(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 10.0:
+                self._window_start = now
+                self._window_requests = 0
+                self._window_retries = 0
+            self.requests += 1
+            self._window_requests += 1
+
+    def _take_retry(self):
+        """Consume retry budget, returning False if retries are exhausted for now"""
+        with self._lock:
+            if self._window_retries >= RETRY_BUDGET_MIN + RETRY_BUDGET_RATIO * self._window_requests:
+                return False
+            self._window_retries += 1
+            self.retries += 1
+            return True
+
+    def backoff(self, attempt, exc=None):
+        """Return the delay before retry number attempt + 1"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if exc is not None:
+            delay = max(delay, min(self.max_delay, _retry_after(exc)))
+        return delay
+
+    def call(self, func, replayable, *args, **kwargs):
+        """
+        Call func (a single provider request) under this policy.
+
+        Args:
+            func (Callable): Function sending the request
+            replayable (bool): Whether the request can be sent again (its body is not a consumed stream)
+
+        Returns:
+            Any: The return value of func
+        """
+        attempt = 0
+        while True:
+            probe = self.breaker.before_call(self.name)
+            try:
+                self.limiter.acquire()
+                self._count_request()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt, replayable)
+                    if delay is None:
+                        raise
+                else:
+                    self.breaker.on_success()
+                    return result
+            finally:
+                # Unknown errors, BaseExceptions and throttled probes leave the probe unsettled
+                self.breaker.end_probe(probe)
+            attempt += 1
+            time.sleep(delay)
+
+    async def call_async(self, func, replayable, *args, **kwargs):
+        """
+        Await func (a coroutine function sending a single provider request) under this policy.
+
+        Args:
+            func (Callable): Coroutine function sending the request
+            replayable (bool): Whether the request can be sent again
+
+        Returns:
+            Any: The result of func
+        """
+        attempt = 0
+        while True:
+            probe = self.breaker.before_call(self.name)
+            try:
+                await self.limiter.acquire_async()
+                self._count_request()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt, replayable)
+                    if delay is None:
+                        raise
+                else:
+                    self.breaker.on_success()
+                    return result
+            finally:
+                # Cancellation leaves the probe unsettled as well
+                self.breaker.end_probe(probe)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, exc, attempt, replayable):
+        """Record a failed attempt, returning the delay before retrying it, or None to give up"""
+        kind = classify_error(exc)
+        if kind == ERROR_THROTTLED:
+            self.limiter.on_throttle()
+        elif kind == ERROR_TRANSIENT:
+            self.breaker.on_failure()
+        elif kind == ERROR_FATAL:
+            # The provider answered; it is up
+            self.breaker.on_success()
+        if (kind not in (ERROR_THROTTLED, ERROR_TRANSIENT) or not replayable
+                or attempt >= self.max_retries or not self._take_retry()):
+            if kind in (ERROR_THROTTLED, ERROR_TRANSIENT):
+                with self._lock:
+                    self.gave_up += 1
+            return None
+        delay = self.backoff(attempt, exc)
+        logger.warning(f"Retrying {kind} provider request for profile {self.name} in {delay:.2f}s "
+                       f"(attempt {attempt + 1}/{self.max_retries}): {str(exc)}")
+        return delay
+
+    def describe(self):
+        """Return retry, rate limiter and circuit breaker counters"""
+        with self._lock:
+            stats = {
+                'requests': self.requests,
+                'retries': self.retries,
+                'gave_up': self.gave_up,
+            }
+        stats.update(self.limiter.describe())
+        stats.update({
+            'circuit_state': self.breaker.state,
+            'circuit_trips': self.breaker.trips,
+            'circuit_rejected': self.breaker.rejected,
+        })
+        return stats
+
+
+def _install_resilience(policy, in_driver):
+    """Send every request of a driver's connection through a resilience policy"""
+    connection = getattr(in_driver, 'connection', None)
+    if connection is None:
+        return
+    request = connection.request
+
+    def _resilient_request(*args, **kwargs):
+        data = kwargs.get('data', args[2] if len(args) > 2 else None)
+        replayable = data is None or isinstance(data, (bytes, str, dict))
+        return policy.call(request, replayable, *args, **kwargs)
+
+    connection.request = _resilient_request
+
+
+class DriverProfile:
+    """
+    A named cloud account whose drivers are built lazily and per thread.
+
+    libcloud keeps per-request state on the driver's connection object, so a
+    driver must never be used by two threads at once. Each thread gets its
+    own driver (and HTTP connection pool) with the profile's credentials.
+    """
+
+    def __init__(self, name, in_provider, in_key, in_secret, in_region,
+                 host=None, port=None, secure=None, timeout=None, pool_maxsize=None, backend=None):
+        if in_provider not in SUPPORTED_PROVIDERS:
+            raise ValueError(f"Unsupported provider: {in_provider}")
+        backend = backend or BACKEND_LIBCLOUD
+        if backend not in (BACKEND_LIBCLOUD, BACKEND_ASYNC):
+            raise ValueError(f"Unsupported backend: {backend}")
+        if backend == BACKEND_ASYNC and in_provider not in ASYNC_BACKEND_PROVIDERS:
+            raise ValueError(f"The {backend} backend does not support provider {in_provider}")
+        self.name = name
+        self.provider = in_provider
+        self.region = in_region
+        self.backend = backend
+        self.timeout = timeout or DEFAULT_CLOUD_HTTP_TIMEOUT
+        self.pool_maxsize = pool_maxsize or DEFAULT_CLOUD_POOL_MAXSIZE
+        self.generation = next(_generations)
+        self.driver_kwargs = {
+            'key': in_key,
+            'secret': in_secret,
+            'region': in_region
+        }
+        for option, value in (('host', host), ('port', port), ('secure', secure)):
+            if value is not None:
+                self.driver_kwargs[option] = value
+        self.resilience = ResiliencePolicy(name)
+        self.driver_class = None
+        self._driver = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _build(self):
+        """Construct a new driver instance with a tuned connection"""
+        if self.driver_class is None:
+            # Only the selected provider's driver module is imported
+            from libcloud.storage.providers import get_driver
+            self.driver_class = get_driver(SUPPORTED_PROVIDERS[self.provider])
+        new_driver = self.driver_class(**self.driver_kwargs)
+        _tune_connection(new_driver, self.timeout, self.pool_maxsize)
+        for hook in driver_hooks:
+            hook(self, new_driver)
+        # Installed last so that hooks see each attempt of a retried request
+        _install_resilience(self.resilience, new_driver)
+        return new_driver
+
+    def get_driver(self):
+        """Return the profile's shared driver, building it on first use"""
+        if self._driver is None:
+            with self._lock:
+                if self._driver is None:
+                    self._driver = self._build()
+                    logger.info(f"Initialized cloud driver for profile {self.name} ({self.provider})")
+                    if get_profile() is self:
+                        _publish_default(self)
+        return self._driver
+
+    def get_thread_driver(self):
+        """Return a driver instance owned by the calling thread"""
+        if getattr(self._local, 'generation', None) != self.generation:
+            # Build the shared driver first so configuration errors surface once
+            self.get_driver()
+            self._local.driver = self._build()
+            self._local.generation = self.generation
+        return self._local.driver
+
+    def describe(self):
+        """Return the profile's non-secret settings"""
+        return {
+            'name': self.name,
+            'provider': self.provider,
+            'region': self.region,
+            'backend': self.backend,
+            'initialized': self._driver is not None,
+            'circuit_state': self.resilience.breaker.state
+        }
+
+
+def _tune_connection(in_driver, timeout, pool_maxsize):
+    """Apply the request timeout and HTTP connection pool size to a driver's connection"""
+    connection = getattr(in_driver, 'connection', None)
+    if connection is None:
+        return
+    from requests.adapters import HTTPAdapter
+    connection.timeout = timeout
+    try:
+        # Creating the underlying session does not open a socket
+        connection.connect()
+        session = connection.connection.session
+    except Exception:
+        return
+    adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+def register_profile(name, in_provider, in_key, in_secret, in_region, **options):
+    """
+    Register (or replace) a named profile; its driver is built on first use.
+
+    Args:
+        name (str): Profile name used by the storage tools' profile argument
+        in_provider (str): One of SUPPORTED_PROVIDERS
+        in_key (str): Access key
+        in_secret (str): Secret key
+        in_region (str): Region
+        **options: host, port, secure, timeout, pool_maxsize and backend overrides
+
+    Returns:
+        DriverProfile: The registered profile
+    """
+    profile = DriverProfile(name, in_provider, in_key, in_secret, in_region, **options)
+    with _registry_lock:
+        profiles[name] = profile
+    return profile
+
+
+def get_profile(name=None):
+    """Return the named profile (the default profile if name is None), or None if unknown"""
+    with _registry_lock:
+        return profiles.get(name or DEFAULT_PROFILE)
+
+
+def list_profiles():
+    """Return the non-secret settings of every registered profile"""
+    with _registry_lock:
+        return [profile.describe() for profile in profiles.values()]
+
+
+def load_profiles_from_env():
+    """
+    Register the extra profiles named in CLOUD_PROFILES.
+
+    Each name N is configured by CLOUD_<N>_PROVIDER (defaults to N),
+    CLOUD_<N>_ACCESS_KEY, CLOUD_<N>_SECRET_KEY, CLOUD_<N>_REGION and the
+    optional CLOUD_<N>_HOST, CLOUD_<N>_PORT, CLOUD_<N>_SECURE,
+    CLOUD_<N>_HTTP_TIMEOUT, CLOUD_<N>_POOL_MAXSIZE and CLOUD_<N>_BACKEND.
+    """
+    names = [name.strip() for name in os.environ.get(ENV_CLOUD_PROFILES, '').split(',') if name.strip()]
+    for name in names:
+        env_prefix = f"CLOUD_{name.upper()}_"
+
+        def _env(suffix, default=None):
+            return os.environ.get(env_prefix + suffix, default)
+
+        try:
+            options = {
+                'host': _env('HOST'),
+                'port': int(_env('PORT')) if _env('PORT') else None,
+                'secure': _env('SECURE').lower() in ('1', 'true', 'yes') if _env('SECURE') else None,
+                'timeout': float(_env('HTTP_TIMEOUT', os.environ.get(ENV_CLOUD_HTTP_TIMEOUT, DEFAULT_CLOUD_HTTP_TIMEOUT))),
+                'pool_maxsize': int(_env('POOL_MAXSIZE', os.environ.get(ENV_CLOUD_POOL_MAXSIZE, DEFAULT_CLOUD_POOL_MAXSIZE))),
+                'backend': _env('BACKEND'),
+            }
+            register_profile(name, _env('PROVIDER', name), _env('ACCESS_KEY'), _env('SECRET_KEY'),
+                             _env('REGION', DEFAULT_CLOUD_REGION), **options)
+            logger.info(f"Registered cloud profile {name}")
+        except ValueError as e:
+            logger.error(f"Skipping cloud profile {name}: {str(e)}")
+
+
+def _publish_default(profile):
+    """Mirror the default profile into the module-level globals"""
     global driver
     global driver_class
+    global driver_kwargs
+    global driver_generation
+    driver = profile._driver
+    driver_class = profile.driver_class
+    driver_kwargs = profile.driver_kwargs
+    driver_generation = profile.generation
+
+def _set_default_profile(in_provider, in_key, in_secret, in_region, build=True):
+    """Create the default profile, optionally building its driver, and register it"""
+    profile = DriverProfile(
+        DEFAULT_PROFILE, in_provider, in_key, in_secret, in_region,
+        timeout=float(os.environ.get(ENV_CLOUD_HTTP_TIMEOUT, DEFAULT_CLOUD_HTTP_TIMEOUT)),
+        pool_maxsize=int(os.environ.get(ENV_CLOUD_POOL_MAXSIZE, DEFAULT_CLOUD_POOL_MAXSIZE)),
+        backend=os.environ.get(ENV_CLOUD_BACKEND)
+    )
+    if build:
+        profile.get_driver()
+    with _registry_lock:
+        profiles[DEFAULT_PROFILE] = profile
+    _publish_default(profile)
+    return profile
+
+def get_resilience_stats():
+    """Return retry, rate limiting and circuit breaker counters for every profile"""
+    with _registry_lock:
+        registered = list(profiles.values())
+    return {profile.name: dict(profile.resilience.describe(), provider=profile.provider)
+            for profile in registered}
+
+def initialize_cloud_driver_internal(in_provider, in_key, in_secret, in_region):
+    """Internal function to initialize cloud driver with given credentials"""
+    if in_provider not in SUPPORTED_PROVIDERS:
+        logger.error(f"Unsupported provider: {in_provider}")
+        return None
     
+    from libcloud.common.types import LibcloudError
     try:
-        if in_provider not in SUPPORTED_PROVIDERS:
-            logger.error(f"Unsupported provider: {in_provider}")
-            return None
-            
-        driver_class = get_driver(SUPPORTED_PROVIDERS[in_provider])
-        driver = driver_class(
-            key=in_key,
-            secret=in_secret,
-            region=in_region
-        )
+        profile = _set_default_profile(in_provider, in_key, in_secret, in_region)
         logger.info(f"Successfully initialized cloud driver for {in_provider}")
-        return driver
+        return profile.get_driver()
     except LibcloudError as e:
         logger.error(f"LibCloud Error: Failed to initialize cloud driver: {str(e)}")
         return None
@@ -86,8 +754,26 @@ def initialize_cloud_driver_internal(in_provider, in_key, in_secret, in_region):
         logger.error(f"Exception: Failed to initialize cloud driver: {str(e)}")
         return None
 
-def initialize_cloud_driver_from_env(in_provider=None, in_key=None, in_secret=None, in_region=None):
-    """Initialize cloud driver from environment variables"""
+def get_thread_driver(name=None):
+    """
+    Return a driver instance owned by the calling thread.
+
+    Args:
+        name (str, optional): Profile name; the default profile if omitted
+    """
+    profile = get_profile(name)
+    if profile is None:
+        return None
+    return profile.get_thread_driver()
+
+def initialize_cloud_driver_from_env(in_provider=None, in_key=None, in_secret=None, in_region=None, lazy=False):
+    """
+    Initialize cloud driver from environment variables.
+
+    With lazy=True the credentials are validated and the default profile is
+    registered, but libcloud is not imported and the driver is not built
+    until the first tool call; the DriverProfile is returned instead of the driver.
+    """
     global driver
     global provider
     global key
@@ -134,7 +820,15 @@ def initialize_cloud_driver_from_env(in_provider=None, in_key=None, in_secret=No
             sys.exit(1)
             return None
     
+    if importlib.util.find_spec('libcloud') is None:
+        logger.error("Exiting: Apache Libcloud is not installed (pip install -r requirements.txt)")
+        sys.exit(1)
+        return None
+    
     logger.info(f"Attempting to initialize cloud driver for {provider} in {region}")
+    if lazy and provider and key and secret and region:
+        logger.info(f"Deferring cloud driver construction for {provider} until first use")
+        return _set_default_profile(provider, key, secret, region, build=False)
     if provider and key and secret and region:
         driver = initialize_cloud_driver_internal(provider, key, secret, region)
         logger.info(f"Successfully initialized cloud driver for {provider}")
@@ -149,4 +843,16 @@ def initialize_cloud_driver_from_env(in_provider=None, in_key=None, in_secret=No
     pass
 
 
+def is_s3_driver(in_driver):
+    """Return True for S3-compatible drivers, without importing the S3 driver module"""
+    s3 = sys.modules.get('libcloud.storage.drivers.s3')
+    return s3 is not None and isinstance(in_driver, s3.BaseS3StorageDriver)
+
 
+def __getattr__(name):
+    """Resolve the libcloud names in _LAZY_IMPORTS on first access"""
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+    globals()[name] = value
+    return value
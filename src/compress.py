@@ -0,0 +1,176 @@
+import hashlib
+import os
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+COMPRESSIONS = (GZIP, ZSTD)
+# Leading bytes of each compressed format
+MAGIC = {GZIP: b'\x1f\x8b', ZSTD: b'\x28\xb5\x2f\xfd'}
+# User metadata key recording how upload_object compressed an object; downloads
+# only decompress objects that carry it, never ordinary .gz/.zst files
+METADATA_KEY = 'content-compression'
+# Balanced levels: most of the size reduction of higher levels at a fraction of the CPU time
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+# Bytes per chunk handed to the uploader; chunks of in-memory content are views, not copies
+CHUNK_SIZE = 256 * 1024
+
+
+def _zstd():
+    """Return a zstd implementation: the standard library's (Python 3.14+) or the zstandard package"""
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise ValueError("zstd compression requires Python 3.14 or the zstandard package")
+
+
+def check(name: Optional[str]):
+    """Raise ValueError if name is not a supported compression, or its implementation is missing"""
+    if name is None:
+        return
+    if name not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {name} (expected one of {', '.join(COMPRESSIONS)})")
+    if name == ZSTD:
+        _zstd()
+
+
+def compressor(name: str):
+    """Return an object with compress(data) and flush() for the given compression"""
+    if name == GZIP:
+        # wbits 31 writes a gzip header and trailer around the deflate stream
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    zstd = _zstd()
+    if hasattr(zstd.ZstdCompressor, 'compressobj'):
+        return zstd.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zstd.ZstdCompressor(level=ZSTD_LEVEL)
+
+
+def decompressor(name: str):
+    """Return an object with decompress(data) for the given compression"""
+    if name == GZIP:
+        return zlib.decompressobj(31)
+    zstd = _zstd()
+    if hasattr(zstd.ZstdDecompressor, 'decompressobj'):
+        return zstd.ZstdDecompressor().decompressobj()
+    return zstd.ZstdDecompressor()
+
+
+def iter_chunks(data: bytes, chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+    """Yield data in chunks without copying it"""
+    view = memoryview(data)
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset:offset + chunk_size]
+
+
+class EncodedStream:
+    """
+    Iterator that compresses chunks on the fly while checksumming them.
+
+    The SHA-256 and size cover the original content; the MD5 and size of
+    the bytes actually sent let the caller check them against the provider's
+    ETag. Everything is computed in the single pass the upload makes.
+    """
+
+    def __init__(self, chunks: Iterable[Any], compression: str = None):
+        """
+        Args:
+            chunks (Iterable[Any]): bytes-like chunks of the original content
+            compression (str, optional): One of COMPRESSIONS, or None to send the content as is
+        """
+        self._chunks = chunks
+        self.compression = compression
+        self.sha256 = hashlib.sha256()
+        self.md5 = hashlib.md5()
+        self.size = 0
+        self.stored_size = 0
+
+    def _emit(self, data):
+        self.md5.update(data)
+        self.stored_size += len(data)
+        return data
+
+    def __iter__(self) -> Iterator[Any]:
+        encoder = compressor(self.compression) if self.compression else None
+        for chunk in self._chunks:
+            self.sha256.update(chunk)
+            self.size += len(chunk)
+            if encoder is None:
+                yield self._emit(chunk)
+                continue
+            data = encoder.compress(chunk)
+            if data:
+                yield self._emit(data)
+        if encoder is not None:
+            data = encoder.flush()
+            if data:
+                yield self._emit(data)
+
+    def summary(self, etag: str = None) -> Dict[str, Any]:
+        """
+        Return the checksums and sizes of the stream once it has been consumed.
+
+        Args:
+            etag (str, optional): ETag reported by the provider for the stored object
+
+        Returns:
+            Dict[str, Any]: sha256 and size of the content, stored size, compression, and whether the
+            ETag matched the MD5 of the stored bytes (None if the ETag is not a plain MD5, e.g. multipart)
+        """
+        verified = None
+        etag = (etag or '').strip('"')
+        if len(etag) == 32 and '-' not in etag:
+            verified = etag.lower() == self.md5.hexdigest()
+        return {
+            'sha256': self.sha256.hexdigest(),
+            'original_size': self.size,
+            'stored_size': self.stored_size,
+            'compression': self.compression,
+            'etag_verified': verified
+        }
+
+
+def metadata(compression: Optional[str]) -> Dict[str, str]:
+    """Return the user metadata that marks an object as compressed"""
+    return {METADATA_KEY: compression} if compression else {}
+
+
+def from_metadata(meta_data: Optional[Dict[str, str]]) -> Optional[str]:
+    """Return the compression recorded in an object's user metadata, if any"""
+    for key, value in (meta_data or {}).items():
+        if key.lower() == METADATA_KEY and value in COMPRESSIONS:
+            return value
+    return None
+
+
+def sniff_file(path: str) -> Optional[str]:
+    """Return the compression whose magic bytes start the file, if any"""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    return next((name for name, magic in MAGIC.items() if head.startswith(magic)), None)
+
+
+def decompress_file(path: str, compression: str) -> int:
+    """Decompress a file in place via a temporary file, returning the decompressed size"""
+    temp_path = f'{path}.decompress'
+    decoder = decompressor(compression)
+    size = 0
+    try:
+        with open(path, 'rb') as source, open(temp_path, 'wb') as target:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                data = decoder.decompress(chunk)
+                target.write(data)
+                size += len(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return size
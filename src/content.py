@@ -0,0 +1,174 @@
+import base64
+import codecs
+import os
+from typing import Iterator, Optional, Tuple
+
+import transfer
+
+# Environment variable names
+ENV_READ_MAX_BYTES = "READ_MAX_BYTES"
+
+DEFAULT_READ_MAX_BYTES = 1024 * 1024
+DEFAULT_ENCODING = 'utf-8'
+BASE64_ENCODING = 'base64'
+CHUNK_SIZE = 64 * 1024
+# Leading bytes inspected when deciding whether content is binary
+SNIFF_BYTES = 8192
+# Longest line held in memory while scanning; longer lines are split
+MAX_LINE_BYTES = 64 * 1024
+# Bytes per ranged request when scanning objects that may be abandoned early
+SCAN_WINDOW = 1024 * 1024
+
+
+def get_max_bytes() -> int:
+    """Return the largest number of bytes a single read may return"""
+    return max(1, int(os.environ.get(ENV_READ_MAX_BYTES, DEFAULT_READ_MAX_BYTES)))
+
+
+def clamp_length(length: Optional[int]) -> int:
+    """Return length limited to the read cap; a missing length means the cap"""
+    max_bytes = get_max_bytes()
+    if length is None or length < 0:
+        return max_bytes
+    return min(length, max_bytes)
+
+
+def _iter_stream(stream, skip: int, length: int) -> Iterator[bytes]:
+    """Yield length bytes of stream after discarding the first skip bytes, then close it"""
+    remaining = length
+    try:
+        for chunk in stream:
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk = chunk[skip:]
+                skip = 0
+            if len(chunk) > remaining:
+                chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+            if not remaining:
+                break
+    finally:
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+
+
+def iter_range(driver, obj, offset: int, length: int, window: int = None) -> Iterator[bytes]:
+    """
+    Yield chunks of obj covering [offset, offset + length).
+
+    Uses ranged GETs where the driver supports them; otherwise the object is
+    streamed from the start and the bytes before offset are discarded. The
+    stream is closed as soon as the range has been read or the caller stops.
+
+    Some drivers read responses in large fixed chunks (5 MiB for S3), so a
+    caller that may stop early can pass window to fetch the range as
+    consecutive smaller requests and bound what is transferred but unused.
+
+    Args:
+        driver: Storage driver owning obj
+        obj: Object handle (only its name and container are used)
+        offset (int): First byte to read
+        length (int): Number of bytes to read; the range must lie within the object
+        window (int, optional): Maximum bytes per ranged request
+
+    Yields:
+        bytes: Consecutive chunks of the range
+    """
+    if length <= 0:
+        return
+    if not transfer.supports_ranges(driver):
+        yield from _iter_stream(driver.download_object_as_stream(obj, chunk_size=CHUNK_SIZE), offset, length)
+        return
+
+    end = offset + length
+    window = window or length
+    for start in range(offset, end, window):
+        stop = min(start + window, end)
+        stream = driver.download_object_range_as_stream(obj, start, stop, chunk_size=CHUNK_SIZE)
+        yield from _iter_stream(stream, 0, stop - start)
+
+
+def read_range(driver, obj, offset: int, length: int) -> bytes:
+    """Read [offset, offset + length) of obj into memory; length must already be capped"""
+    data = bytearray()
+    for chunk in iter_range(driver, obj, offset, length):
+        data += chunk
+    return bytes(data)
+
+
+def is_binary(data: bytes) -> bool:
+    """Return True if data looks like binary rather than text"""
+    return b'\x00' in data[:SNIFF_BYTES]
+
+
+def decode(data: bytes, encoding: str, final: bool) -> Tuple[str, str, int]:
+    """
+    Decode bytes for a text response.
+
+    Undecodable bytes are replaced, and a multi-byte character cut off at the
+    end of a non-final page is left for the next page. Binary data, or an
+    encoding of 'base64', is returned base64-encoded.
+
+    Args:
+        data (bytes): Bytes to decode
+        encoding (str): Python codec name, or 'base64'
+        final (bool): True if data reaches the end of the object
+
+    Returns:
+        Tuple[str, str, int]: Decoded content, the encoding actually used and the number of bytes consumed
+
+    Raises:
+        LookupError: If encoding is not a known codec
+    """
+    encoding = encoding or DEFAULT_ENCODING
+    if encoding != BASE64_ENCODING:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        if not is_binary(data):
+            text = decoder.decode(data, final=final)
+            pending = len(decoder.getstate()[0])
+            if pending and pending == len(data):
+                # Too little data to finish a single character; do not stall pagination
+                text += decoder.decode(b'', final=True)
+                pending = 0
+            return text, encoding, len(data) - pending
+    return base64.b64encode(data).decode('ascii'), BASE64_ENCODING, len(data)
+
+
+def iter_lines(chunks: Iterator[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Split a chunk stream into lines without joining the whole stream.
+
+    Lines longer than max_line_bytes are yielded in pieces that share a line
+    number, so a file without newlines does not have to fit in memory.
+
+    Args:
+        chunks (Iterator[bytes]): Byte stream, e.g. from iter_range
+        max_line_bytes (int, optional): Longest piece yielded for a single line
+
+    Yields:
+        Tuple[int, int, bytes]: Byte offset of the line in the stream, 1-based line number and the line without its newline
+    """
+    buffer = b''
+    offset = 0
+    line_number = 1
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                break
+            yield offset + start, line_number, buffer[start:end]
+            line_number += 1
+            start = end + 1
+        while len(buffer) - start > max_line_bytes:
+            yield offset + start, line_number, buffer[start:start + max_line_bytes]
+            start += max_line_bytes
+        buffer = buffer[start:]
+        offset += start
+    if buffer:
+        yield offset, line_number, buffer
@@ -0,0 +1,306 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+import metrics
+from cloud import logger
+
+# Environment variable names
+ENV_STORAGE_MAX_WORKERS = "STORAGE_MAX_WORKERS"
+ENV_STORAGE_TOOL_CONCURRENCY = "STORAGE_TOOL_CONCURRENCY"
+ENV_STORAGE_TOOL_LIMITS = "STORAGE_TOOL_LIMITS"
+ENV_STORAGE_COALESCE = "STORAGE_COALESCE"
+DEFAULT_STORAGE_MAX_WORKERS = 16
+DEFAULT_STORAGE_TOOL_CONCURRENCY = 8
+
+# Global dispatch state
+executor = None
+max_workers = None
+tool_concurrency = None
+tool_limits = {}
+
+_lock = threading.Lock()
+# Per-tool concurrency limiters of each event loop; asyncio primitives belong to one loop
+_semaphores = weakref.WeakKeyDictionary()
+_stats = {}
+# In-flight shared calls by (event loop, tool name, key)
+_flights = {}
+
+
+def _parse_tool_limits(value):
+    """Parse a 'tool=limit,tool=limit' string into a dict"""
+    limits = {}
+    if not value:
+        return limits
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        name, limit = item.split('=', 1)
+        try:
+            limits[name.strip()] = max(1, int(limit))
+        except ValueError:
+            logger.warning(f"Ignoring invalid tool limit: {item}")
+    return limits
+
+
+def configure(in_max_workers=None, in_tool_concurrency=None, in_tool_limits=None):
+    """
+    Configure the shared thread pool used to run blocking provider calls.
+
+    Args:
+        in_max_workers (int, optional): Number of worker threads in the pool
+        in_tool_concurrency (int, optional): Default number of concurrent calls allowed per tool
+        in_tool_limits (Dict[str, int], optional): Per-tool overrides of the concurrency limit
+    """
+    global executor
+    global max_workers
+    global tool_concurrency
+    global tool_limits
+
+    if in_max_workers is None:
+        in_max_workers = int(os.environ.get(ENV_STORAGE_MAX_WORKERS, DEFAULT_STORAGE_MAX_WORKERS))
+    if in_tool_concurrency is None:
+        in_tool_concurrency = int(os.environ.get(ENV_STORAGE_TOOL_CONCURRENCY, DEFAULT_STORAGE_TOOL_CONCURRENCY))
+    if in_tool_limits is None:
+        in_tool_limits = _parse_tool_limits(os.environ.get(ENV_STORAGE_TOOL_LIMITS))
+
+    with _lock:
+        old_executor = executor
+        max_workers = max(1, in_max_workers)
+        tool_concurrency = max(1, in_tool_concurrency)
+        tool_limits = dict(in_tool_limits)
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage")
+        _semaphores.clear()
+
+    if old_executor is not None:
+        old_executor.shutdown(wait=False)
+    logger.info(f"Configured storage dispatch: {max_workers} workers, {tool_concurrency} calls per tool")
+
+
+def get_executor():
+    """Return the shared executor, creating it on first use"""
+    if executor is None:
+        configure()
+    return executor
+
+
+def shutdown(wait=True):
+    """Shut down the shared executor"""
+    global executor
+    with _lock:
+        old_executor = executor
+        executor = None
+        _semaphores.clear()
+    if old_executor is not None:
+        old_executor.shutdown(wait=wait)
+
+
+def _get_semaphore(tool_name):
+    """Return the running event loop's concurrency limiter for a tool"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        semaphores = _semaphores.setdefault(loop, {})
+        semaphore = semaphores.get(tool_name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(tool_limits.get(tool_name, tool_concurrency))
+            semaphores[tool_name] = semaphore
+        return semaphore
+
+
+def _get_tool_stats(tool_name):
+    """Return the (mutable) stats record for a tool; caller must hold _lock"""
+    stats = _stats.get(tool_name)
+    if stats is None:
+        stats = {
+            'waiting': 0,
+            'queued': 0,
+            'active': 0,
+            'completed': 0,
+            'failed': 0,
+            'coalesced': 0,
+            'max_queue_depth': 0,
+            'total_wait_seconds': 0.0,
+            'total_run_seconds': 0.0,
+        }
+        _stats[tool_name] = stats
+    return stats
+
+
+async def run_blocking(tool_name: str, func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking callable on the shared thread pool without blocking the event loop.
+
+    Calls are limited per tool so that one slow tool (e.g. a large download)
+    cannot occupy every worker thread.
+
+    Args:
+        tool_name (str): Name used for concurrency limits and metrics
+        func (Callable): Blocking function to run
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        Any: The return value of func
+    """
+    pool = get_executor()
+    semaphore = _get_semaphore(tool_name)
+    enqueued_at = time.monotonic()
+
+    with _lock:
+        stats = _get_tool_stats(tool_name)
+        stats['waiting'] += 1
+        depth = stats['waiting'] + stats['queued']
+        if depth > stats['max_queue_depth']:
+            stats['max_queue_depth'] = depth
+
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+
+    def _run():
+        started_at = time.monotonic()
+        with _lock:
+            stats['queued'] -= 1
+            stats['active'] += 1
+            stats['total_wait_seconds'] += started_at - enqueued_at
+        try:
+            return context.run(metrics.run_profiled, func, *args, **kwargs)
+        finally:
+            with _lock:
+                stats['active'] -= 1
+                stats['total_run_seconds'] += time.monotonic() - started_at
+
+    def _settle(future):
+        # Runs once the worker is done, or when a call is cancelled before a worker picked it up. A call
+        # whose caller was cancelled keeps its slot until its thread actually finishes.
+        with _lock:
+            if future.cancelled():
+                stats['queued'] -= 1
+                stats['failed'] += 1
+            elif future.exception() is not None:
+                stats['failed'] += 1
+            else:
+                stats['completed'] += 1
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # The loop is closed, and its limiter with it
+            pass
+
+    try:
+        await semaphore.acquire()
+    finally:
+        with _lock:
+            stats['waiting'] -= 1
+
+    with _lock:
+        stats['queued'] += 1
+    try:
+        future = pool.submit(_run)
+    except BaseException:
+        with _lock:
+            stats['queued'] -= 1
+            stats['failed'] += 1
+        semaphore.release()
+        raise
+    future.add_done_callback(_settle)
+    # Cancelling the caller cancels the call only if no worker has started it
+    return await asyncio.wrap_future(future)
+
+
+def coalescing_enabled() -> bool:
+    """Return True unless coalescing of identical concurrent calls is disabled"""
+    return os.environ.get(ENV_STORAGE_COALESCE, 'true').lower() not in ('0', 'false', 'no', 'off')
+
+
+async def run_shared(tool_name: str, key: Hashable, func: Callable, *args) -> Any:
+    """
+    Run a blocking callable like run_blocking, sharing it between identical concurrent calls.
+
+    Args:
+        tool_name (str): Name used for concurrency limits and metrics
+        key (Hashable): Normalized arguments identifying the call
+        func (Callable): Blocking function to run
+        *args: Positional arguments for func
+
+    Returns:
+        Any: The return value of func, shared by every caller
+    """
+    return await share(tool_name, key, lambda: run_blocking(tool_name, func, *args))
+
+
+async def share(tool_name: str, key: Hashable, start: Callable[[], Awaitable]) -> Any:
+    """
+    Await start(), sharing the result between identical concurrent calls.
+
+    While a call with the same tool name and key is in flight, later callers
+    wait for its result instead of starting another provider request. The
+    call runs as its own task, so cancelling one caller does not cancel it
+    for the others.
+
+    Args:
+        tool_name (str): Name used for the coalescing counters
+        key (Hashable): Normalized arguments identifying the call
+        start (Callable[[], Awaitable]): Starts the call
+
+    Returns:
+        Any: The call's result, shared by every caller
+    """
+    if not coalescing_enabled():
+        return await start()
+
+    flight_key = (asyncio.get_running_loop(), tool_name, key)
+
+    def _land(done):
+        with _lock:
+            if _flights.get(flight_key) is done:
+                del _flights[flight_key]
+        # Mark the outcome as retrieved in case every caller was cancelled
+        if not done.cancelled():
+            done.exception()
+
+    with _lock:
+        task = _flights.get(flight_key)
+        if task is not None:
+            _get_tool_stats(tool_name)['coalesced'] += 1
+        else:
+            task = asyncio.ensure_future(start())
+            task.add_done_callback(_land)
+            _flights[flight_key] = task
+    return await asyncio.shield(task)
+
+
+def get_stats() -> Dict[str, Any]:
+    """
+    Get thread pool and per-tool queue statistics.
+
+    Returns:
+        Dict[str, Any]: Pool configuration and per-tool counters
+    """
+    with _lock:
+        tools = {}
+        for name, stats in _stats.items():
+            tools[name] = dict(stats)
+            tools[name]['limit'] = tool_limits.get(name, tool_concurrency)
+        pool_queue = executor._work_queue.qsize() if executor is not None else 0
+        return {
+            'max_workers': max_workers,
+            'tool_concurrency': tool_concurrency,
+            'pool_queue_depth': pool_queue,
+            'shared_in_flight': len(_flights),
+            'tools': tools,
+        }
+
+
+def reset_stats():
+    """Clear per-tool counters for calls that are not in flight"""
+    with _lock:
+        for name in list(_stats):
+            stats = _stats[name]
+            if stats['waiting'] or stats['queued'] or stats['active']:
+                continue
+            del _stats[name]
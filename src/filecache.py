@@ -0,0 +1,267 @@
+import errno
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from cloud import logger
+
+# Environment variable names
+ENV_DOWNLOAD_CACHE_DIR = "DOWNLOAD_CACHE_DIR"
+ENV_DOWNLOAD_CACHE_SIZE = "DOWNLOAD_CACHE_SIZE"
+ENV_DOWNLOAD_CACHE_LINK = "DOWNLOAD_CACHE_LINK"
+
+# The cache is disabled unless a directory is configured
+DEFAULT_DOWNLOAD_CACHE_SIZE = 1024 * 1024 * 1024
+DEFAULT_DOWNLOAD_CACHE_LINK = 'auto'
+# How cached files are placed at a download destination. 'auto' clones the
+# file where the filesystem supports it and copies otherwise; 'hardlink'
+# shares the cached file, which is therefore made read-only.
+LINK_MODES = ('auto', 'reflink', 'hardlink', 'copy')
+# Linux ioctl that clones a file's extents (btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+TEMP_SUFFIX = '.tmp'
+
+
+def make_key(profile: str, bucket: str, name: str, etag: str) -> str:
+    """Return the cache key of one version of an object"""
+    identity = json.dumps([profile, bucket, name, etag], separators=(',', ':'))
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def detach(path: str):
+    """Unlink path if it is a hardlink to another file, so that writing it cannot change the cached copy"""
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _reflink(source: str, destination: str):
+    """Clone source to destination without copying data, raising OSError where unsupported"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform")
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+class FileCache:
+    """
+    Size-bounded LRU cache of downloaded object versions on local disk.
+
+    Files are named by make_key, so a changed object (new ETag) is a new
+    entry and stale versions age out. The recency order lives in memory
+    and is rebuilt from file modification times on start.
+    """
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_DOWNLOAD_CACHE_SIZE,
+                 link_mode: str = DEFAULT_DOWNLOAD_CACHE_LINK):
+        """
+        Args:
+            directory (str): Directory holding the cached files
+            max_size (int): Maximum total bytes; least recently used files are evicted first
+            link_mode (str): One of LINK_MODES
+        """
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"Invalid download cache link mode: {link_mode}")
+        self.directory = directory
+        self.max_size = max_size
+        self.link_mode = link_mode
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_served = 0
+        self.served_by = {'reflink': 0, 'hardlink': 0, 'copy': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._reflink_supported = link_mode in ('auto', 'reflink')
+        self._load()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _load(self):
+        """Index the files already in the cache directory, oldest first"""
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for folder, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(folder, name)
+                if name.endswith(TEMP_SUFFIX):
+                    # Left behind by an interrupted store
+                    os.remove(path)
+                    continue
+                info = os.stat(path)
+                found.append((info.st_mtime, name, info.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.size += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used files until the cache fits; the lock must be held"""
+        while self.size > self.max_size and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _place(self, source: str, destination: str, allow_hardlink: bool) -> str:
+        """Put a copy of source at destination, returning the method used"""
+        if self._reflink_supported:
+            try:
+                _reflink(source, destination)
+                return 'reflink'
+            except OSError:
+                if os.path.exists(destination):
+                    os.remove(destination)
+                if self.link_mode == 'reflink':
+                    raise
+                # Do not retry on every call once the filesystem has refused
+                self._reflink_supported = False
+        if allow_hardlink and self.link_mode == 'hardlink':
+            os.link(source, destination)
+            return 'hardlink'
+        shutil.copyfile(source, destination)
+        return 'copy'
+
+    def fetch(self, key: str, destination: str) -> Optional[str]:
+        """
+        Place the cached file for key at destination.
+
+        Returns:
+            Optional[str]: How the file was placed ('reflink', 'hardlink' or 'copy'), or None on a miss
+        """
+        with self._lock:
+            size = self._entries.get(key)
+            if size is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+
+        temp_path = f'{destination}.cache{TEMP_SUFFIX}'
+        try:
+            method = self._place(self._path(key), temp_path, allow_hardlink=True)
+            os.replace(temp_path, destination)
+        except FileNotFoundError:
+            # Evicted by another process sharing the directory
+            with self._lock:
+                if self._entries.pop(key, None) is not None:
+                    self.size -= size
+                self.misses += 1
+            return None
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._lock:
+            self.hits += 1
+            self.bytes_served += size
+            self.served_by[method] += 1
+        return method
+
+    def store(self, key: str, source: str) -> bool:
+        """Copy a downloaded file into the cache, returning False if it is too large to cache"""
+        size = os.path.getsize(source)
+        if size > self.max_size:
+            return False
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + TEMP_SUFFIX
+        try:
+            # Never hardlink the source: the caller owns it and may modify it
+            self._place(source, temp_path, allow_hardlink=False)
+            os.chmod(temp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to cache download {source}: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous
+            self._entries[key] = size
+            self.size += size
+            self.stores += 1
+            self._evict()
+        return True
+
+    def clear(self):
+        """Remove every cached file"""
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return occupancy and hit/miss counters"""
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'link_mode': self.link_mode,
+                'entries': len(self._entries),
+                'size': self.size,
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'bytes_served': self.bytes_served,
+                'served_by': dict(self.served_by)
+            }
+
+
+# Shared cache, or None while disabled
+cache = None
+_configured = False
+_lock = threading.Lock()
+
+
+def configure(in_directory: str = None, in_max_size: int = None, in_link_mode: str = None):
+    """
+    Configure the download cache from arguments or the environment.
+
+    Args:
+        in_directory (str, optional): Cache directory; an empty directory disables the cache
+        in_max_size (int, optional): Maximum total bytes of cached files
+        in_link_mode (str, optional): How hits are placed at the destination (see LINK_MODES)
+    """
+    global cache, _configured
+    if in_directory is None:
+        in_directory = os.environ.get(ENV_DOWNLOAD_CACHE_DIR, '')
+    if in_max_size is None:
+        in_max_size = int(os.environ.get(ENV_DOWNLOAD_CACHE_SIZE, DEFAULT_DOWNLOAD_CACHE_SIZE))
+    if in_link_mode is None:
+        in_link_mode = os.environ.get(ENV_DOWNLOAD_CACHE_LINK, DEFAULT_DOWNLOAD_CACHE_LINK)
+    with _lock:
+        cache = FileCache(os.path.abspath(os.path.expanduser(in_directory)), in_max_size,
+                          in_link_mode) if in_directory else None
+        _configured = True
+
+
+def get_cache() -> Optional[FileCache]:
+    """Return the download cache, or None if it is disabled"""
+    if not _configured:
+        configure()
+    return cache
@@ -0,0 +1,404 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import cloud
+import listing
+import sync
+from cloud import logger
+
+# Environment variable names
+ENV_LISTING_INDEX_PATH = "LISTING_INDEX_PATH"
+ENV_LISTING_INDEX_REFRESH = "LISTING_INDEX_REFRESH"
+
+# The index is disabled unless a database path is configured
+DEFAULT_LISTING_INDEX_REFRESH = 3600
+# Rows written per transaction while crawling; readers see progress after each batch
+CRAWL_BATCH_SIZE = 1000
+MAX_QUERY_LIMIT = 10000
+DEFAULT_QUERY_LIMIT = 100
+SORT_COLUMNS = {'name': 'name', 'size': 'size', 'last_modified': 'last_modified'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    profile TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER,
+    hash TEXT,
+    last_modified REAL,
+    seen REAL NOT NULL,
+    PRIMARY KEY (profile, bucket, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS objects_size ON objects (profile, bucket, size);
+CREATE TABLE IF NOT EXISTS crawls (
+    profile TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL,
+    completed_at REAL,
+    marker TEXT,
+    objects INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (profile, bucket, prefix)
+);
+"""
+
+# Database path, or None while the index is disabled
+path = None
+refresh_seconds = DEFAULT_LISTING_INDEX_REFRESH
+_configured = False
+_local = threading.local()
+_lock = threading.Lock()
+# (profile, bucket, prefix) of crawls running in this process
+_active = set()
+_queue = queue.Queue()
+_crawler = None
+
+
+def configure(in_path: str = None, in_refresh: float = None):
+    """
+    Configure the listing index from arguments or the environment.
+
+    Args:
+        in_path (str, optional): SQLite database path; an empty path disables the index
+        in_refresh (float, optional): Seconds after which the crawler re-lists an indexed prefix (0 disables)
+    """
+    global path, refresh_seconds, _configured
+    if in_path is None:
+        in_path = os.environ.get(ENV_LISTING_INDEX_PATH, '')
+    if in_refresh is None:
+        in_refresh = float(os.environ.get(ENV_LISTING_INDEX_REFRESH, DEFAULT_LISTING_INDEX_REFRESH))
+    with _lock:
+        path = os.path.abspath(os.path.expanduser(in_path)) if in_path else None
+        refresh_seconds = in_refresh
+        _configured = True
+
+
+def is_enabled() -> bool:
+    """Return True if a listing index database is configured"""
+    if not _configured:
+        configure()
+    return path is not None
+
+
+def _connect() -> sqlite3.Connection:
+    """Return the calling thread's connection to the index database"""
+    if not is_enabled():
+        raise RuntimeError(f"Listing index is disabled; set {ENV_LISTING_INDEX_PATH} to enable it")
+    connection = getattr(_local, 'connection', None)
+    if connection is None or _local.path != path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        connection = sqlite3.connect(path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        # WAL lets queries read while the crawler writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+        _local.path = path
+    return connection
+
+
+def _prefix_bounds(prefix: str):
+    """Return the SQL condition and arguments selecting names that start with prefix"""
+    if not prefix:
+        return '', []
+    # Names starting with prefix sort between prefix and prefix followed by the highest code point
+    return ' AND name >= ? AND name < ?', [prefix, prefix + '\U0010ffff']
+
+
+def _row_dict(row) -> Dict[str, Any]:
+    return {
+        'name': row['name'],
+        'size': row['size'],
+        'hash': row['hash'],
+        'last_modified': row['last_modified']
+    }
+
+
+def record_object(profile: str, bucket: str, name: str, size: int, hash: str = None,
+                  last_modified: float = None):
+    """Add or update an object written through the server, keeping the index current between crawls"""
+    if not is_enabled():
+        return
+    now = time.time()
+    try:
+        with _connect() as connection:
+            connection.execute(
+                "INSERT INTO objects (profile, bucket, name, size, hash, last_modified, seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (profile, bucket, name) DO UPDATE SET "
+                "size = excluded.size, hash = excluded.hash, last_modified = excluded.last_modified, "
+                "seen = excluded.seen",
+                (profile, bucket, name, size, hash, last_modified or now, now))
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to update listing index for {bucket}/{name}: {str(e)}")
+
+
+def remove_object(profile: str, bucket: str, name: str):
+    """Remove an object deleted through the server from the index"""
+    if not is_enabled():
+        return
+    try:
+        with _connect() as connection:
+            connection.execute("DELETE FROM objects WHERE profile = ? AND bucket = ? AND name = ?",
+                               (profile, bucket, name))
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to update listing index for {bucket}/{name}: {str(e)}")
+
+
+def remove_objects(profile: str, bucket: str, names: List[str]):
+    """Remove a batch of objects deleted through the server from the index"""
+    if not is_enabled() or not names:
+        return
+    try:
+        with _connect() as connection:
+            connection.executemany("DELETE FROM objects WHERE profile = ? AND bucket = ? AND name = ?",
+                                   [(profile, bucket, name) for name in names])
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to update listing index for {bucket}: {str(e)}")
+
+
+def crawl(cloud_profile, bucket: str, prefix: str = '') -> Dict[str, Any]:
+    """
+    List a bucket prefix into the index.
+
+    Rows are upserted in batches and the last committed key is saved, so an
+    interrupted crawl resumes where it stopped. Objects not seen by a
+    completed crawl are removed from the index.
+
+    Args:
+        cloud_profile: Profile whose thread driver lists the bucket
+        bucket (str): Bucket to index
+        prefix (str, optional): Only index objects under this prefix
+
+    Returns:
+        Dict[str, Any]: Crawl state, as reported in the 'index' field of query results
+    """
+    key = (cloud_profile.name, bucket, prefix)
+    with _lock:
+        if key in _active:
+            return {'status': 'crawling', 'prefix': prefix}
+        _active.add(key)
+    try:
+        _crawl(cloud_profile, bucket, prefix)
+    finally:
+        with _lock:
+            _active.discard(key)
+    return get_state(cloud_profile.name, bucket, prefix)
+
+
+def _crawl(cloud_profile, bucket: str, prefix: str):
+    connection = _connect()
+    row = connection.execute("SELECT * FROM crawls WHERE profile = ? AND bucket = ? AND prefix = ?",
+                             (cloud_profile.name, bucket, prefix)).fetchone()
+    if row is not None and row['status'] == 'crawling':
+        # Resume an interrupted crawl; rows it already wrote carry its start time
+        started_at, marker, count = row['started_at'], row['marker'], row['objects']
+    else:
+        started_at, marker, count = time.time(), None, 0
+    with connection:
+        connection.execute(
+            "INSERT INTO crawls (profile, bucket, prefix, status, started_at, marker, objects) "
+            "VALUES (?, ?, ?, 'crawling', ?, ?, ?) ON CONFLICT (profile, bucket, prefix) DO UPDATE SET "
+            "status = 'crawling', started_at = excluded.started_at, marker = excluded.marker, "
+            "objects = excluded.objects, error = NULL",
+            (cloud_profile.name, bucket, prefix, started_at, marker, count))
+    logger.info(f"Indexing {bucket}/{prefix} for profile {cloud_profile.name}"
+                f"{f' from {marker}' if marker else ''}")
+
+    def _save(batch, last_name):
+        with connection:
+            connection.executemany(
+                "INSERT INTO objects (profile, bucket, name, size, hash, last_modified, seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (profile, bucket, name) DO UPDATE SET "
+                "size = excluded.size, hash = excluded.hash, last_modified = excluded.last_modified, "
+                "seen = MAX(seen, excluded.seen)", batch)
+            connection.execute("UPDATE crawls SET marker = ?, objects = ? "
+                               "WHERE profile = ? AND bucket = ? AND prefix = ?",
+                               (last_name, count, cloud_profile.name, bucket, prefix))
+
+    try:
+        driver = cloud_profile.get_thread_driver()
+        container = driver.get_container(bucket)
+        batch = []
+        last_name = marker
+        for obj in listing.iterate_objects(driver, container, prefix=prefix or None, marker=marker):
+            batch.append((cloud_profile.name, bucket, obj.name, obj.size, obj.hash,
+                          sync.remote_mtime(obj), started_at))
+            last_name = obj.name
+            count += 1
+            if len(batch) >= CRAWL_BATCH_SIZE:
+                _save(batch, last_name)
+                batch = []
+        _save(batch, last_name)
+
+        condition, args = _prefix_bounds(prefix)
+        with connection:
+            removed = connection.execute(
+                "DELETE FROM objects WHERE profile = ? AND bucket = ? AND seen < ?" + condition,
+                [cloud_profile.name, bucket, started_at] + args).rowcount
+            connection.execute(
+                "UPDATE crawls SET status = 'complete', completed_at = ?, marker = NULL, objects = ? "
+                "WHERE profile = ? AND bucket = ? AND prefix = ?",
+                (time.time(), count, cloud_profile.name, bucket, prefix))
+        logger.info(f"Indexed {count} objects in {bucket}/{prefix} ({removed} removed)")
+    except Exception as e:
+        logger.error(f"Failed to index {bucket}/{prefix}: {str(e)}")
+        with connection:
+            connection.execute("UPDATE crawls SET status = 'failed', error = ? "
+                               "WHERE profile = ? AND bucket = ? AND prefix = ?",
+                               (str(e), cloud_profile.name, bucket, prefix))
+        raise
+
+
+def get_state(profile: str, bucket: str, prefix: str = '') -> Optional[Dict[str, Any]]:
+    """
+    Return how fresh the index is for a bucket prefix.
+
+    Uses the crawl of the longest indexed prefix that covers prefix.
+
+    Returns:
+        Optional[Dict[str, Any]]: Crawl status, completion time and age, or None if the prefix is not indexed
+    """
+    row = _connect().execute(
+        "SELECT * FROM crawls WHERE profile = ? AND bucket = ? AND substr(?, 1, length(prefix)) = prefix "
+        "ORDER BY completed_at IS NULL, length(prefix) DESC LIMIT 1",
+        (profile, bucket, prefix)).fetchone()
+    if row is None:
+        return None
+    completed_at = row['completed_at']
+    return {
+        'prefix': row['prefix'],
+        'status': 'crawling' if (profile, bucket, row['prefix']) in _active else row['status'],
+        'complete': completed_at is not None,
+        'crawled_at': completed_at,
+        'age_seconds': round(time.time() - completed_at, 3) if completed_at is not None else None,
+        'objects_indexed': row['objects'],
+        'error': row['error']
+    }
+
+
+def query(profile: str, bucket: str, prefix: str = '', min_size: int = None, max_size: int = None,
+          sort: str = 'name', descending: bool = False, limit: int = DEFAULT_QUERY_LIMIT,
+          offset: int = 0) -> List[Dict[str, Any]]:
+    """Return indexed objects under prefix, filtered by size and sorted by name, size or last_modified"""
+    condition, args = _prefix_bounds(prefix)
+    if min_size is not None:
+        condition += ' AND size >= ?'
+        args.append(min_size)
+    if max_size is not None:
+        condition += ' AND size <= ?'
+        args.append(max_size)
+    order = f"{SORT_COLUMNS[sort]} {'DESC' if descending else 'ASC'}, name"
+    limit = max(1, min(limit or DEFAULT_QUERY_LIMIT, MAX_QUERY_LIMIT))
+    rows = _connect().execute(
+        f"SELECT name, size, hash, last_modified FROM objects WHERE profile = ? AND bucket = ?{condition} "
+        f"ORDER BY {order} LIMIT ? OFFSET ?",
+        [profile, bucket] + args + [limit, max(0, offset or 0)]).fetchall()
+    return [_row_dict(row) for row in rows]
+
+
+def aggregate(profile: str, bucket: str, prefix: str = '', delimiter: str = None,
+              top: int = 10) -> Dict[str, Any]:
+    """
+    Return object count and size totals under prefix from the index.
+
+    Args:
+        profile (str): Profile name
+        bucket (str): Bucket name
+        prefix (str, optional): Only count objects under this prefix
+        delimiter (str, optional): Also total the objects of each folder directly below prefix
+        top (int, optional): Number of largest objects to include
+
+    Returns:
+        Dict[str, Any]: Count, total and largest objects, plus per-folder totals with a delimiter
+    """
+    connection = _connect()
+    condition, args = _prefix_bounds(prefix)
+    base = [profile, bucket] + args
+    row = connection.execute(
+        "SELECT count(*) AS objects, coalesce(sum(size), 0) AS total_size, max(last_modified) AS newest, "
+        f"min(last_modified) AS oldest FROM objects WHERE profile = ? AND bucket = ?{condition}", base).fetchone()
+    largest = connection.execute(
+        f"SELECT name, size, hash, last_modified FROM objects WHERE profile = ? AND bucket = ?{condition} "
+        "ORDER BY size DESC, name LIMIT ?", base + [max(0, top)]).fetchall()
+    result = {
+        'objects': row['objects'],
+        'total_size': row['total_size'],
+        'oldest_modified': row['oldest'],
+        'newest_modified': row['newest'],
+        'largest': [_row_dict(item) for item in largest]
+    }
+    if delimiter:
+        # Group by the key up to and including the first delimiter after the prefix
+        start = len(prefix) + 1
+        groups = connection.execute(
+            "SELECT CASE WHEN instr(substr(name, ?), ?) > 0 "
+            "THEN substr(name, 1, ? + instr(substr(name, ?), ?) - 1) ELSE NULL END AS folder, "
+            "count(*) AS objects, coalesce(sum(size), 0) AS total_size "
+            f"FROM objects WHERE profile = ? AND bucket = ?{condition} "
+            "GROUP BY folder ORDER BY total_size DESC",
+            [start, delimiter, start + len(delimiter) - 1, start, delimiter] + base).fetchall()
+        result['folders'] = [{'name': group['folder'], 'objects': group['objects'],
+                              'total_size': group['total_size']}
+                             for group in groups if group['folder'] is not None]
+        files = [group for group in groups if group['folder'] is None]
+        result['direct_objects'] = files[0]['objects'] if files else 0
+    return result
+
+
+def schedule(cloud_profile, bucket: str, prefix: str = '') -> bool:
+    """Queue a crawl on the background crawler, returning False if one is already running"""
+    global _crawler
+    with _lock:
+        if (cloud_profile.name, bucket, prefix) in _active:
+            return False
+        if _crawler is None or not _crawler.is_alive():
+            _crawler = threading.Thread(target=_run_crawler, name="index-crawler", daemon=True)
+            _crawler.start()
+    _queue.put((cloud_profile.name, bucket, prefix))
+    return True
+
+
+def _run_crawler():
+    """Run queued crawls, and re-crawl indexed prefixes once they are older than the refresh interval"""
+    while True:
+        try:
+            job = _queue.get(timeout=min(refresh_seconds, 60) if refresh_seconds > 0 else None)
+        except queue.Empty:
+            job = None
+        jobs = [job] if job is not None else _stale_crawls()
+        for profile, bucket, prefix in jobs:
+            cloud_profile = cloud.get_profile(profile)
+            if cloud_profile is None:
+                continue
+            try:
+                crawl(cloud_profile, bucket, prefix)
+            except Exception:
+                # Already recorded on the crawl and logged
+                pass
+
+
+def _stale_crawls() -> List[tuple]:
+    """Return (profile, bucket, prefix) of indexed prefixes due for a refresh, and interrupted crawls"""
+    if refresh_seconds <= 0:
+        return []
+    rows = _connect().execute(
+        "SELECT profile, bucket, prefix FROM crawls WHERE status = 'crawling' OR "
+        "coalesce(completed_at, started_at) < ?", (time.time() - refresh_seconds,)).fetchall()
+    with _lock:
+        return [(row['profile'], row['bucket'], row['prefix']) for row in rows
+                if (row['profile'], row['bucket'], row['prefix']) not in _active]
+
+
+def list_crawls() -> List[Dict[str, Any]]:
+    """Return the state of every indexed prefix"""
+    rows = _connect().execute("SELECT profile, bucket, prefix FROM crawls ORDER BY profile, bucket, prefix")
+    return [dict(get_state(row['profile'], row['bucket'], row['prefix']), profile=row['profile'],
+                 bucket_name=row['bucket']) for row in rows.fetchall()]
+
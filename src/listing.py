@@ -0,0 +1,201 @@
+import base64
+import itertools
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+import cloud
+import sync
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+
+def encode_token(state: Dict[str, Any]) -> str:
+    """Encode listing state into an opaque continuation token"""
+    data = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Decode a continuation token, raising ValueError if it is malformed"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid continuation token")
+    if not isinstance(state, dict):
+        raise ValueError("Invalid continuation token")
+    return state
+
+
+def clamp_page_size(page_size: Optional[int]) -> int:
+    """Return page_size limited to the supported range"""
+    if not page_size or page_size < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def _iterate_s3_objects_after(driver, container, prefix, marker):
+    """
+    Lazily list S3 objects starting after marker.
+
+    Mirrors BaseS3StorageDriver.iterate_container_objects, which does not
+    accept a start marker, so that resuming a listing costs one LIST request
+    rather than re-reading every earlier page.
+    """
+    from libcloud.common.types import LibcloudError
+    from libcloud.utils.py3 import httplib
+    from libcloud.utils.xml import fixxpath
+
+    params = {'marker': marker}
+    if prefix:
+        params['prefix'] = prefix
+
+    container_path = driver._get_container_path(container)
+    exhausted = False
+
+    while not exhausted:
+        response = driver.connection.request(container_path, params=params)
+
+        if response.status != httplib.OK:
+            raise LibcloudError("Unexpected status code: %s" % (response.status), driver=driver)
+
+        objects = driver._to_objs(obj=response.object, xpath="Contents", container=container)
+        is_truncated = response.object.findtext(
+            fixxpath(xpath="IsTruncated", namespace=driver.namespace)
+        ).lower()
+        exhausted = is_truncated == "false" or not objects
+
+        for obj in objects:
+            params['marker'] = obj.name
+            yield obj
+
+
+def iterate_objects(driver, container, prefix: str = None, marker: str = None) -> Iterator:
+    """
+    Lazily iterate objects in a container in key order.
+
+    Args:
+        driver: libcloud storage driver
+        container: libcloud Container to list
+        prefix (str, optional): Only return objects whose names begin with this prefix
+        marker (str, optional): Only return objects whose names sort after this key
+
+    Returns:
+        Iterator: libcloud Object instances
+    """
+    if marker and cloud.is_s3_driver(driver):
+        return _iterate_s3_objects_after(driver, container, prefix, marker)
+
+    objects = driver.iterate_container_objects(container, prefix=prefix)
+    if marker:
+        objects = itertools.dropwhile(lambda obj: obj.name <= marker, objects)
+    return objects
+
+
+def iterate_entries(driver, container, prefix: str = None, delimiter: str = None,
+                    marker: str = None, skip_folder: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily iterate listing entries, grouping keys into folders by delimiter.
+
+    Yields dicts with 'type' set to 'object' (with an 'object' key holding the
+    libcloud Object) or 'folder' (with a 'name' key holding the common prefix),
+    and 'container' holding the container name.
+
+    Args:
+        driver: libcloud storage driver
+        container: libcloud Container to list
+        prefix (str, optional): Only list keys beginning with this prefix
+        delimiter (str, optional): Group keys sharing a prefix up to this delimiter
+        marker (str, optional): Resume after this key
+        skip_folder (str, optional): Folder already returned by a previous page
+    """
+    last_folder = skip_folder
+    for obj in iterate_objects(driver, container, prefix=prefix, marker=marker):
+        if delimiter:
+            rest = obj.name[len(prefix or ''):]
+            index = rest.find(delimiter)
+            if index >= 0:
+                folder = (prefix or '') + rest[:index + len(delimiter)]
+                if folder != last_folder:
+                    last_folder = folder
+                    yield {'type': 'folder', 'name': folder, 'container': container.name}
+                continue
+        yield {'type': 'object', 'object': obj, 'container': container.name}
+
+
+# Returned by a field getter for fields that do not apply to an item (e.g. the size of a folder);
+# omitted from dict rows and None in compact rows
+NOT_APPLICABLE = object()
+
+
+def _object_field(getter):
+    return lambda entry: getter(entry['object']) if entry['type'] == 'object' else NOT_APPLICABLE
+
+
+# Field getters for listing entries; only the fields a caller asks for are computed
+ENTRY_FIELDS = {
+    'name': lambda entry: entry['object'].name if entry['type'] == 'object' else entry['name'],
+    'type': lambda entry: entry['type'],
+    'size': _object_field(lambda obj: obj.size),
+    'hash': _object_field(lambda obj: obj.hash),
+    'last_modified': _object_field(sync.remote_mtime),
+    'container': lambda entry: entry['container'],
+    'extra': _object_field(lambda obj: obj.extra),
+}
+OBJECT_FIELDS = [field for field in ENTRY_FIELDS if field != 'type']
+DEFAULT_OBJECT_FIELDS = ['name', 'size', 'hash', 'container', 'extra']
+
+
+def parse_fields(fields, allowed, default: List[str]) -> List[str]:
+    """
+    Validate a field projection.
+
+    Args:
+        fields: List of field names or a comma-separated string; None selects the defaults
+        allowed: Names of the fields that can be selected
+        default (List[str]): Fields returned when none are requested
+
+    Returns:
+        List[str]: Selected field names, without duplicates
+
+    Raises:
+        ValueError: If a field is unknown or none are given
+    """
+    if fields is None:
+        return list(default)
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    selected = []
+    for field in fields:
+        field = field.strip()
+        if field not in allowed:
+            raise ValueError(f"Unknown field: {field} (expected one of {', '.join(allowed)})")
+        if field not in selected:
+            selected.append(field)
+    if not selected:
+        raise ValueError("At least one field is required")
+    return selected
+
+
+def project(items, fields: List[str], getters, compact: bool = False):
+    """
+    Convert items to response rows holding only the selected fields.
+
+    Args:
+        items: Iterable of items understood by getters
+        fields (List[str]): Selected field names
+        getters: Mapping of field name to a function computing it from an item
+        compact (bool, optional): Return one list of values per item (in fields order) instead of a dict
+
+    Returns:
+        List: Dicts, or lists of values in compact mode
+    """
+    selected = list(zip(fields, [getters[field] for field in fields]))
+    rows = []
+    for item in items:
+        values = [(field, getter(item)) for field, getter in selected]
+        if compact:
+            rows.append([None if value is NOT_APPLICABLE else value for _, value in values])
+        else:
+            rows.append({field: value for field, value in values if value is not NOT_APPLICABLE})
+    return rows
@@ -4,16 +4,21 @@ import sys
 
 # Import modules - order is important
 import cloud
+import serve
 import storage
 from cloud import logger
 
-# Initialize cloud driver before starting the server
-driver = cloud.initialize_cloud_driver_from_env()
-if driver is None:
+# Validate the cloud configuration before starting the server; the driver
+# itself is built on the first tool call so the server starts answering sooner
+profile = cloud.initialize_cloud_driver_from_env(lazy=True)
+if profile is None:
     logger.error("ERROR: Failed to initialize cloud driver. Exiting.")
     sys.exit(1)
 else:
-    logger.info("Successfully initialized cloud driver")
+    logger.info("Configured cloud driver")
+
+# Register any additional named profiles (CLOUD_PROFILES)
+cloud.load_profiles_from_env()
 
 # Initialize FastMCP server
 mcp = FastMCP("mcp-cloud")
@@ -27,7 +32,8 @@ logger.info("Registered all storage tools and functions")
 if __name__ == "__main__":
     logger.info("Starting MCP server")
     try:
-        mcp.run()
+        # stdio by default; MCP_TRANSPORT=sse serves HTTP from MCP_WORKERS processes
+        serve.run(mcp)
     except Exception as e:
         logger.error(f"Error running MCP server: {str(e)}")
         sys.exit(1)
@@ -0,0 +1,339 @@
+import contextvars
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import cloud
+from cloud import logger
+
+# Environment variable names
+ENV_METRICS_SLOW_CALL_SECONDS = "METRICS_SLOW_CALL_SECONDS"
+ENV_METRICS_PROFILE_SLOW_CALLS = "METRICS_PROFILE_SLOW_CALLS"
+ENV_METRICS_MAX_SERIES = "METRICS_MAX_SERIES"
+DEFAULT_METRICS_SLOW_CALL_SECONDS = 5.0
+DEFAULT_METRICS_MAX_SERIES = 1000
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Label used for buckets once METRICS_MAX_SERIES label sets exist
+OVERFLOW_BUCKET = "__other__"
+PROFILE_TOP_FUNCTIONS = 25
+
+slow_call_seconds = float(os.environ.get(ENV_METRICS_SLOW_CALL_SECONDS, DEFAULT_METRICS_SLOW_CALL_SECONDS))
+profile_slow_calls = os.environ.get(ENV_METRICS_PROFILE_SLOW_CALLS, '').lower() in ('1', 'true', 'yes')
+max_series = int(os.environ.get(ENV_METRICS_MAX_SERIES, DEFAULT_METRICS_MAX_SERIES))
+
+_lock = threading.Lock()
+# (tool, provider, bucket) -> counters
+_series = {}
+# provider -> requests made outside any instrumented call
+_unattributed_requests = {}
+_slow_call_hooks = []
+
+# The record of the tool call running in this context; dispatch and the
+# transfer pool copy the context into worker threads so that provider
+# requests made there are attributed to the calling tool
+_current_call = contextvars.ContextVar('metrics_current_call', default=None)
+
+
+def _new_series():
+    return {
+        'calls': 0,
+        'errors': 0,
+        'bytes': 0,
+        'provider_requests': 0,
+        'slow_calls': 0,
+        'latency_sum': 0.0,
+        'latency_max': 0.0,
+        'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+    }
+
+
+def _get_series(tool, provider, bucket):
+    """Return the (mutable) counters for a label set; caller must hold _lock"""
+    key = (tool, provider, bucket)
+    series = _series.get(key)
+    if series is None:
+        if len(_series) >= max_series:
+            # Keep per-bucket labels from growing without bound
+            key = (tool, provider, OVERFLOW_BUCKET)
+            series = _series.get(key)
+        if series is None:
+            series = _new_series()
+            _series[key] = series
+    return series
+
+
+def record_provider_request(provider: str) -> None:
+    """Count one HTTP request to a provider, attributed to the current tool call if any"""
+    call = _current_call.get()
+    with _lock:
+        if call is None:
+            _unattributed_requests[provider] = _unattributed_requests.get(provider, 0) + 1
+        else:
+            call['provider_requests'] += 1
+
+
+def _count_driver_requests(profile, driver):
+    """Driver hook: count every request made through the driver's connection"""
+    connection = getattr(driver, 'connection', None)
+    if connection is None:
+        return
+    request = connection.request
+
+    def _counted_request(*args, **kwargs):
+        record_provider_request(profile.provider)
+        return request(*args, **kwargs)
+
+    connection.request = _counted_request
+
+
+cloud.driver_hooks.append(_count_driver_requests)
+
+
+def add_slow_call_hook(hook: Callable[[Dict[str, Any]], None]) -> None:
+    """
+    Register a function called with the details of every call slower than the threshold.
+
+    The details include tool, provider, bucket, seconds, provider_requests,
+    error and, when METRICS_PROFILE_SLOW_CALLS is enabled, the profile of
+    the call's worker thread as text.
+    """
+    _slow_call_hooks.append(hook)
+
+
+def remove_slow_call_hook(hook: Callable[[Dict[str, Any]], None]) -> None:
+    """Unregister a slow call hook"""
+    if hook in _slow_call_hooks:
+        _slow_call_hooks.remove(hook)
+
+
+def _log_slow_call(details):
+    logger.warning(f"Slow call: {details['tool']} on {details['provider']}/{details['bucket']} took "
+                   f"{details['seconds']:.3f}s with {details['provider_requests']} provider requests")
+
+
+_slow_call_hooks.append(_log_slow_call)
+
+
+def run_profiled(func: Callable, *args, **kwargs) -> Any:
+    """Run func, profiling it if slow call profiling is enabled for the current tool call"""
+    call = _current_call.get()
+    if call is None or not profile_slow_calls:
+        return func(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        call['profiler'] = profiler
+
+
+def _format_profile(profiler):
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    return output.getvalue()
+
+
+def _is_error(result):
+    if isinstance(result, dict):
+        return 'error' in result or result.get('status') == 'error'
+    if isinstance(result, list):
+        return any(isinstance(item, dict) and 'error' in item for item in result)
+    return False
+
+
+def _bytes_transferred(result):
+    if not isinstance(result, dict):
+        return 0
+    if isinstance(result.get('bytes'), int):
+        return result['bytes']
+    # Single-object transfers report the object size on success; cache hits transfer nothing
+    if result.get('status') == 'success' and result.get('cache') != 'hit' and isinstance(result.get('size'), int):
+        return result['size']
+    return 0
+
+
+def instrument(tool_name: str, func: Callable) -> Callable:
+    """
+    Wrap an async tool so that every call is recorded.
+
+    Calls are labeled by tool, the provider of the selected profile and the
+    bucket_name argument. The wrapper keeps the tool's signature and
+    docstring so that MCP sees the same schema.
+
+    Args:
+        tool_name (str): Name the tool is registered under
+        func (Callable): Async tool function
+
+    Returns:
+        Callable: Instrumented async function
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def _instrumented(*args, **kwargs):
+        try:
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+        except TypeError:
+            arguments = kwargs
+        profile = cloud.get_profile(arguments.get('profile'))
+        provider = profile.provider if profile is not None else 'none'
+        bucket = arguments.get('bucket_name') or ''
+
+        call = {'provider_requests': 0, 'profiler': None}
+        token = _current_call.set(call)
+        started_at = time.monotonic()
+        result = None
+        failed = True
+        try:
+            result = await func(*args, **kwargs)
+            failed = _is_error(result)
+            return result
+        finally:
+            _current_call.reset(token)
+            elapsed = time.monotonic() - started_at
+            slow = slow_call_seconds > 0 and elapsed >= slow_call_seconds
+            with _lock:
+                series = _get_series(tool_name, provider, bucket)
+                series['calls'] += 1
+                series['errors'] += failed
+                series['bytes'] += _bytes_transferred(result)
+                series['provider_requests'] += call['provider_requests']
+                series['slow_calls'] += slow
+                series['latency_sum'] += elapsed
+                series['latency_max'] = max(series['latency_max'], elapsed)
+                index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound),
+                             len(LATENCY_BUCKETS))
+                series['latency_buckets'][index] += 1
+            if slow:
+                _notify_slow_call(tool_name, provider, bucket, elapsed, call, failed)
+
+    return _instrumented
+
+
+def _notify_slow_call(tool, provider, bucket, elapsed, call, failed):
+    details = {
+        'tool': tool,
+        'provider': provider,
+        'bucket': bucket,
+        'seconds': round(elapsed, 4),
+        'provider_requests': call['provider_requests'],
+        'error': failed,
+        'profile': _format_profile(call['profiler']) if call['profiler'] is not None else None,
+    }
+    for hook in list(_slow_call_hooks):
+        try:
+            hook(details)
+        except Exception as e:
+            logger.error(f"Slow call hook failed: {str(e)}")
+
+
+def get_metrics() -> Dict[str, Any]:
+    """
+    Get per-tool call metrics.
+
+    Returns:
+        Dict[str, Any]: One entry per (tool, provider, bucket) with counts, error rate,
+        bytes, provider requests and latency histogram, plus unattributed provider requests
+        and each profile's retry, rate limiting and circuit breaker counters
+    """
+    resilience = cloud.get_resilience_stats()
+    with _lock:
+        series = []
+        for (tool, provider, bucket), stats in sorted(_series.items()):
+            calls = stats['calls']
+            cumulative = 0
+            histogram = {}
+            for bound, count in zip(list(LATENCY_BUCKETS) + ['+Inf'], stats['latency_buckets']):
+                cumulative += count
+                histogram[str(bound)] = cumulative
+            series.append({
+                'tool': tool,
+                'provider': provider,
+                'bucket': bucket,
+                'calls': calls,
+                'errors': stats['errors'],
+                'error_rate': round(stats['errors'] / calls, 4) if calls else 0.0,
+                'bytes': stats['bytes'],
+                'provider_requests': stats['provider_requests'],
+                'slow_calls': stats['slow_calls'],
+                'latency_mean_seconds': round(stats['latency_sum'] / calls, 6) if calls else 0.0,
+                'latency_max_seconds': round(stats['latency_max'], 6),
+                'latency_histogram': histogram,
+            })
+        return {
+            'slow_call_seconds': slow_call_seconds,
+            'series': series,
+            'unattributed_provider_requests': dict(_unattributed_requests),
+            'profiles': resilience,
+        }
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def export_prometheus() -> str:
+    """Render the metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+
+    def _family(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    with _lock:
+        items = sorted(_series.items())
+        unattributed = dict(_unattributed_requests)
+
+    labels = {key: f'tool="{_escape_label(key[0])}",provider="{_escape_label(key[1])}",'
+                   f'bucket="{_escape_label(key[2])}"' for key, _ in items}
+
+    for name, field, help_text in (
+            ('mcp_cloud_tool_calls_total', 'calls', 'Tool calls'),
+            ('mcp_cloud_tool_errors_total', 'errors', 'Tool calls that returned or raised an error'),
+            ('mcp_cloud_tool_bytes_total', 'bytes', 'Bytes transferred by tool calls'),
+            ('mcp_cloud_tool_provider_requests_total', 'provider_requests', 'Provider HTTP requests made by tool calls'),
+            ('mcp_cloud_tool_slow_calls_total', 'slow_calls', 'Tool calls slower than the slow call threshold')):
+        _family(name, 'counter', help_text)
+        for key, stats in items:
+            lines.append(f"{name}{{{labels[key]}}} {stats[field]}")
+
+    _family('mcp_cloud_tool_latency_seconds', 'histogram', 'Tool call latency')
+    for key, stats in items:
+        cumulative = 0
+        for bound, count in zip(list(LATENCY_BUCKETS) + ['+Inf'], stats['latency_buckets']):
+            cumulative += count
+            lines.append(f'mcp_cloud_tool_latency_seconds_bucket{{{labels[key]},le="{bound}"}} {cumulative}')
+        lines.append(f"mcp_cloud_tool_latency_seconds_sum{{{labels[key]}}} {stats['latency_sum']:.6f}")
+        lines.append(f"mcp_cloud_tool_latency_seconds_count{{{labels[key]}}} {stats['calls']}")
+
+    _family('mcp_cloud_unattributed_provider_requests_total', 'counter',
+            'Provider HTTP requests made outside tool calls')
+    for provider, count in sorted(unattributed.items()):
+        lines.append(f'mcp_cloud_unattributed_provider_requests_total{{provider="{_escape_label(provider)}"}} {count}')
+
+    resilience = sorted(cloud.get_resilience_stats().items())
+    for name, field, kind, help_text in (
+            ('mcp_cloud_provider_retries_total', 'retries', 'counter', 'Provider requests retried'),
+            ('mcp_cloud_provider_throttles_total', 'throttles', 'counter', 'Provider requests throttled'),
+            ('mcp_cloud_provider_gave_up_total', 'gave_up', 'counter', 'Retryable provider failures not retried further'),
+            ('mcp_cloud_circuit_rejected_total', 'circuit_rejected', 'counter', 'Requests rejected by an open circuit'),
+            ('mcp_cloud_circuit_open', 'circuit_state', 'gauge', 'Whether the circuit breaker is open (1) or not (0)')):
+        _family(name, kind, help_text)
+        for profile, stats in resilience:
+            value = int(stats[field] == 'open') if field == 'circuit_state' else stats[field]
+            lines.append(f'{name}{{profile="{_escape_label(profile)}",provider="{_escape_label(stats["provider"])}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset() -> None:
+    """Clear all recorded metrics"""
+    with _lock:
+        _series.clear()
+        _unattributed_requests.clear()
@@ -0,0 +1,604 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+import struct
+import tarfile
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import content
+
+FORMAT_ZIP = 'zip'
+FORMAT_TAR = 'tar'
+FORMAT_PARQUET = 'parquet'
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+FORMAT_TEXT = 'text'
+FORMATS = (FORMAT_ZIP, FORMAT_TAR, FORMAT_PARQUET, FORMAT_CSV, FORMAT_JSONL, FORMAT_TEXT)
+ARCHIVE_FORMATS = (FORMAT_ZIP, FORMAT_TAR)
+# Formats previewed as rows or lines of text
+ROW_FORMATS = (FORMAT_CSV, FORMAT_JSONL, FORMAT_TEXT)
+GZIP = 'gzip'
+
+DEFAULT_PREVIEW_ROWS = 20
+MAX_PREVIEW_ROWS = 1000
+DEFAULT_ARCHIVE_MEMBERS = 1000
+MAX_ARCHIVE_MEMBERS = 10000
+# Row groups listed in a Parquet preview; the count and row totals cover all of them
+MAX_ROW_GROUPS = 100
+# Smallest ranged request; scattered reads (archive headers, footers) fetch this much
+READ_BLOCK_SIZE = 64 * 1024
+# Sequential reads double the request size up to this many bytes
+MAX_READ_AHEAD = 8 * 1024 * 1024
+# Fetched bytes kept for re-reads, e.g. zipfile re-reading the end of central directory
+MAX_CACHED_BYTES = 2 * MAX_READ_AHEAD
+CHUNK_SIZE = 64 * 1024
+
+EXTENSIONS = {
+    '.zip': FORMAT_ZIP, '.jar': FORMAT_ZIP, '.whl': FORMAT_ZIP,
+    '.tar': FORMAT_TAR,
+    '.parquet': FORMAT_PARQUET, '.pq': FORMAT_PARQUET,
+    '.csv': FORMAT_CSV, '.tsv': FORMAT_CSV,
+    '.jsonl': FORMAT_JSONL, '.ndjson': FORMAT_JSONL,
+}
+ZIP_MAGIC = (b'PK\x03\x04', b'PK\x05\x06')
+GZIP_MAGIC = b'\x1f\x8b'
+PARQUET_MAGIC = b'PAR1'
+# Offset of the "ustar" magic in a POSIX tar header
+TAR_MAGIC_OFFSET = 257
+
+ZIP_METHODS = {0: 'stored', 8: 'deflate', 9: 'deflate64', 12: 'bzip2', 14: 'lzma', 93: 'zstd'}
+PARQUET_TYPES = ['BOOLEAN', 'INT32', 'INT64', 'INT96', 'FLOAT', 'DOUBLE', 'BYTE_ARRAY', 'FIXED_LEN_BYTE_ARRAY']
+PARQUET_REPETITIONS = ['REQUIRED', 'OPTIONAL', 'REPEATED']
+PARQUET_CONVERTED_TYPES = ['UTF8', 'MAP', 'MAP_KEY_VALUE', 'LIST', 'ENUM', 'DECIMAL', 'DATE', 'TIME_MILLIS',
+                           'TIME_MICROS', 'TIMESTAMP_MILLIS', 'TIMESTAMP_MICROS', 'UINT_8', 'UINT_16', 'UINT_32',
+                           'UINT_64', 'INT_8', 'INT_16', 'INT_32', 'INT_64', 'JSON', 'BSON', 'INTERVAL']
+# LogicalType union members by Thrift field id
+PARQUET_LOGICAL_TYPES = {1: 'STRING', 2: 'MAP', 3: 'LIST', 4: 'ENUM', 5: 'DECIMAL', 6: 'DATE', 7: 'TIME',
+                         8: 'TIMESTAMP', 10: 'INTEGER', 11: 'NULL', 12: 'JSON', 13: 'BSON', 14: 'UUID',
+                         15: 'FLOAT16', 16: 'VARIANT', 17: 'GEOMETRY', 18: 'GEOGRAPHY'}
+PARQUET_CODECS = ['UNCOMPRESSED', 'SNAPPY', 'GZIP', 'LZO', 'BROTLI', 'LZ4', 'ZSTD', 'LZ4_RAW']
+
+
+class RangeFile(io.RawIOBase):
+    """
+    Read-only, seekable file over a remote object, fetched with ranged reads.
+
+    Scattered reads fetch READ_BLOCK_SIZE bytes, so parsers that seek between
+    headers (zipfile, tarfile) issue a few small requests. Consecutive reads
+    double the request size up to MAX_READ_AHEAD, so streaming a large
+    member does not cost one request per block.
+    """
+
+    def __init__(self, read: Callable[[int, int], bytes], size: int):
+        """
+        Args:
+            read (Callable[[int, int], bytes]): Returns the given number of bytes from an offset
+            size (int): Object size in bytes
+        """
+        self._read = read
+        self.size = size
+        self.position = 0
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._blocks = OrderedDict()
+        self._cached_bytes = 0
+        self._next_start = None
+        self._read_ahead = READ_BLOCK_SIZE
+        # Where the data being read is known to end; read-ahead stops there
+        self.read_limit = None
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position")
+        self.position = offset
+        return offset
+
+    def _cached(self, position: int) -> Optional[Tuple[int, bytes]]:
+        for start, data in self._blocks.items():
+            if start <= position < start + len(data):
+                self._blocks.move_to_end(start)
+                return start, data
+        return None
+
+    def _fetch(self, position: int, wanted: int) -> Tuple[int, bytes]:
+        if position == self._next_start:
+            self._read_ahead = min(self._read_ahead * 2, MAX_READ_AHEAD)
+        else:
+            self._read_ahead = READ_BLOCK_SIZE
+        wanted = min(wanted, MAX_READ_AHEAD, self.size - position)
+        end = self.size
+        if self.read_limit is not None and position < self.read_limit:
+            end = min(end, self.read_limit)
+        length = max(min(self._read_ahead, end - position), wanted)
+        data = self._read(position, length)
+        if len(data) != length:
+            raise IOError(f"Short read at offset {position}: expected {length} bytes, got {len(data)}")
+        self.requests += 1
+        self.bytes_fetched += length
+        self._next_start = position + length
+
+        self._blocks[position] = data
+        self._cached_bytes += length
+        while self._cached_bytes > MAX_CACHED_BYTES and len(self._blocks) > 1:
+            _, evicted = self._blocks.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+        return position, data
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        # Fill the whole buffer so that callers never see short reads before the end
+        while filled < len(view) and self.position < self.size:
+            start, data = self._cached(self.position) or self._fetch(self.position, len(view) - filled)
+            offset = self.position - start
+            count = min(len(view) - filled, len(data) - offset)
+            view[filled:filled + count] = data[offset:offset + count]
+            filled += count
+            self.position += count
+        return filled
+
+
+class _CappedReader(io.RawIOBase):
+    """Stream wrapper that stops after a byte budget and records whether data was left unread"""
+
+    def __init__(self, stream, limit: int):
+        self._stream = stream
+        self._remaining = limit
+        self.capped = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._remaining:
+            if not self.capped and self._stream.read(1):
+                self.capped = True
+            return 0
+        data = self._stream.read(min(len(buffer), self._remaining))
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+def detect_format(name: str, sniff: Callable[[], bytes] = None) -> Tuple[str, Optional[str]]:
+    """
+    Guess the format of an object from its name, falling back to its leading bytes.
+
+    Args:
+        name (str): Object or archive member name
+        sniff (Callable[[], bytes], optional): Returns the first bytes of the content; only called if the
+            name has no known extension
+
+    Returns:
+        Tuple[str, Optional[str]]: One of FORMATS and the compression ('gzip' or None)
+    """
+    lowered = name.lower()
+    compression = None
+    if lowered.endswith('.tgz'):
+        return FORMAT_TAR, GZIP
+    if lowered.endswith('.gz'):
+        lowered = lowered[:-len('.gz')]
+        compression = GZIP
+    for extension, fmt in EXTENSIONS.items():
+        if lowered.endswith(extension):
+            return fmt, compression
+
+    head = sniff() if sniff is not None else b''
+    if compression is None and head.startswith(GZIP_MAGIC):
+        compression = GZIP
+    elif head.startswith(ZIP_MAGIC):
+        return FORMAT_ZIP, None
+    elif head.startswith(PARQUET_MAGIC):
+        return FORMAT_PARQUET, None
+    elif head[TAR_MAGIC_OFFSET:TAR_MAGIC_OFFSET + 5] == b'ustar':
+        return FORMAT_TAR, None
+    return FORMAT_TEXT, compression
+
+
+def default_delimiter(name: str) -> str:
+    """Return the CSV delimiter implied by a name: tab for .tsv files, otherwise a comma"""
+    lowered = name.lower()
+    return '\t' if lowered.endswith('.tsv') or lowered.endswith('.tsv.gz') else ','
+
+
+@contextmanager
+def _archive_errors(name: str = None) -> Iterator[None]:
+    """Report corrupt archives and missing members as ValueError"""
+    try:
+        yield
+    except KeyError:
+        raise ValueError(f"Archive has no member {name}")
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, gzip.BadGzipFile) as e:
+        raise ValueError(f"Invalid archive: {str(e)}")
+
+
+def _iso_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+def _zip_member(info: zipfile.ZipInfo) -> Dict[str, Any]:
+    try:
+        modified = datetime(*info.date_time).isoformat()
+    except ValueError:
+        modified = None
+    return {
+        'name': info.filename,
+        'type': 'dir' if info.is_dir() else 'file',
+        'size': info.file_size,
+        'compressed_size': info.compress_size,
+        'compression': ZIP_METHODS.get(info.compress_type, str(info.compress_type)),
+        'modified': modified
+    }
+
+
+def _tar_member(info: tarfile.TarInfo) -> Dict[str, Any]:
+    if info.isdir():
+        kind = 'dir'
+    elif info.issym():
+        kind = 'symlink'
+    elif info.islnk():
+        kind = 'hardlink'
+    elif info.isfile():
+        kind = 'file'
+    else:
+        kind = 'other'
+    member = {'name': info.name, 'type': kind, 'size': info.size, 'modified': _iso_time(info.mtime)}
+    if info.issym() or info.islnk():
+        member['target'] = info.linkname
+    return member
+
+
+def _open_tar(file, compression: Optional[str]) -> tarfile.TarFile:
+    # A gzipped tarball has no index, so reaching a member means decompressing everything before it
+    file.seek(0)
+    return tarfile.open(fileobj=file, mode='r:gz' if compression == GZIP else 'r:')
+
+
+def list_members(file, fmt: str, compression: Optional[str], prefix: str = None, offset: int = 0,
+                 max_members: int = DEFAULT_ARCHIVE_MEMBERS) -> Dict[str, Any]:
+    """
+    List one page of the members of a zip or tar archive.
+
+    Zip archives are listed from the central directory at the end of the
+    file; tar archives are listed by hopping from header to header.
+
+    Args:
+        file: Seekable binary file over the archive
+        fmt (str): FORMAT_ZIP or FORMAT_TAR
+        compression (Optional[str]): 'gzip' for a compressed tarball
+        prefix (str, optional): Only list members whose names start with this prefix
+        offset (int, optional): Number of matching members to skip
+        max_members (int, optional): Maximum members to return
+
+    Returns:
+        Dict[str, Any]: Members, their count, the total where known and next_offset (None on the last page)
+    """
+    limit = max(1, min(max_members or DEFAULT_ARCHIVE_MEMBERS, MAX_ARCHIVE_MEMBERS))
+    offset = max(0, offset or 0)
+    total = None
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"Not an archive format: {fmt}")
+    with _archive_errors():
+        if fmt == FORMAT_ZIP:
+            with zipfile.ZipFile(file) as archive:
+                infos = [info for info in archive.infolist() if not prefix or info.filename.startswith(prefix)]
+            total = len(infos)
+            members = [_zip_member(info) for info in infos[offset:offset + limit + 1]]
+        else:
+            with _open_tar(file, compression) as archive:
+                matching = (info for info in archive if not prefix or info.name.startswith(prefix))
+                members = [_tar_member(info) for info in itertools.islice(matching, offset, offset + limit + 1)]
+
+    more = len(members) > limit
+    members = members[:limit]
+    return {
+        'members': members,
+        'count': len(members),
+        'total': total,
+        'next_offset': offset + limit if more else None
+    }
+
+
+@contextmanager
+def open_member(file, fmt: str, compression: Optional[str], name: str) -> Iterator[Any]:
+    """
+    Open one archive member for reading, fetching only the data it needs.
+
+    Raises:
+        ValueError: If the archive is invalid, has no such member or the member is not a regular file
+    """
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"Not an archive format: {fmt}")
+    with _archive_errors(name):
+        if fmt == FORMAT_ZIP:
+            with zipfile.ZipFile(file) as archive:
+                info = archive.getinfo(name)
+                if info.is_dir():
+                    raise ValueError(f"Archive member {name} is a directory")
+                if isinstance(file, RangeFile):
+                    # The local header's extra field may differ from the central one; this is only a hint
+                    file.read_limit = (info.header_offset + zipfile.sizeFileHeader + len(info.filename.encode())
+                                       + len(info.extra) + info.compress_size)
+                # ZipExtFile checks the CRC once the member has been read
+                with archive.open(info) as stream:
+                    yield stream
+        else:
+            with _open_tar(file, compression) as archive:
+                # getmember() would read every header; stop at the first match instead
+                info = next((info for info in archive if info.name == name), None)
+                if info is None:
+                    raise KeyError(name)
+                stream = archive.extractfile(info)
+                if stream is None:
+                    raise ValueError(f"Archive member {name} is not a regular file")
+                if isinstance(file, RangeFile) and compression is None:
+                    file.read_limit = info.offset_data + info.size
+                with stream:
+                    yield stream
+
+
+class _CompactReader:
+    """Decoder for the Thrift compact protocol used by Parquet metadata"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    def _byte(self) -> int:
+        value = self.data[self.position]
+        self.position += 1
+        return value
+
+    def _varint(self) -> int:
+        result = 0
+        shift = 0
+        while True:
+            value = self._byte()
+            result |= (value & 0x7f) << shift
+            if not value & 0x80:
+                return result
+            shift += 7
+
+    def _zigzag(self) -> int:
+        value = self._varint()
+        return (value >> 1) ^ -(value & 1)
+
+    def _value(self, kind: int) -> Any:
+        if kind in (1, 2):
+            return kind == 1
+        if kind == 3:
+            return struct.unpack('b', bytes([self._byte()]))[0]
+        if kind in (4, 5, 6):
+            return self._zigzag()
+        if kind == 7:
+            value = struct.unpack_from('<d', self.data, self.position)[0]
+            self.position += 8
+            return value
+        if kind == 8:
+            length = self._varint()
+            value = bytes(self.data[self.position:self.position + length])
+            self.position += length
+            return value
+        if kind in (9, 10):
+            return self._list()
+        if kind == 11:
+            return self._map()
+        if kind == 12:
+            return self.read_struct()
+        raise ValueError(f"Unknown Thrift type {kind}")
+
+    def _list(self) -> List[Any]:
+        header = self._byte()
+        size, kind = header >> 4, header & 0x0f
+        if size == 15:
+            size = self._varint()
+        if kind in (1, 2):
+            # Booleans in collections take a byte each
+            return [self._byte() == 1 for _ in range(size)]
+        return [self._value(kind) for _ in range(size)]
+
+    def _map(self) -> Dict[Any, Any]:
+        size = self._varint()
+        if not size:
+            return {}
+        kinds = self._byte()
+        return {self._value(kinds >> 4): self._value(kinds & 0x0f) for _ in range(size)}
+
+    def read_struct(self) -> Dict[int, Any]:
+        """Read a struct as a dict of field id to value"""
+        fields = {}
+        last = 0
+        while True:
+            header = self._byte()
+            if not header:
+                return fields
+            delta, kind = header >> 4, header & 0x0f
+            field_id = last + delta if delta else self._zigzag()
+            fields[field_id] = self._value(kind)
+            last = field_id
+
+
+def _text(value) -> Optional[str]:
+    return value.decode('utf-8', errors='replace') if isinstance(value, bytes) else value
+
+
+def _enum(names: List[str], value: Optional[int]) -> Optional[str]:
+    if value is None:
+        return None
+    return names[value] if 0 <= value < len(names) else str(value)
+
+
+def _parquet_columns(elements: List[Dict[int, Any]]) -> List[Dict[str, Any]]:
+    """Flatten the depth-first schema element list into leaf columns with dotted names"""
+    columns = []
+
+    def _walk(position: int, path: List[str]) -> int:
+        element = elements[position]
+        name = path + [_text(element.get(4))]
+        children = element.get(5)
+        if children:
+            position += 1
+            for _ in range(children):
+                position = _walk(position, name)
+            return position
+
+        logical = element.get(10)
+        if logical:
+            logical_type = PARQUET_LOGICAL_TYPES.get(next(iter(logical)), 'UNKNOWN')
+        else:
+            logical_type = _enum(PARQUET_CONVERTED_TYPES, element.get(6))
+        if logical_type == 'DECIMAL' and element.get(8) is not None:
+            logical_type = f"DECIMAL({element.get(8)},{element.get(7) or 0})"
+        columns.append({
+            'name': '.'.join(name),
+            'type': _enum(PARQUET_TYPES, element.get(1)),
+            'logical_type': logical_type,
+            'repetition': _enum(PARQUET_REPETITIONS, element.get(3))
+        })
+        return position + 1
+
+    if not elements:
+        return columns
+    # The first element is the root group
+    position = 1
+    for _ in range(elements[0].get(5) or 0):
+        position = _walk(position, [])
+    return columns
+
+
+def preview_parquet(file) -> Dict[str, Any]:
+    """
+    Describe a Parquet file from its footer alone: schema, row count and row groups.
+
+    Args:
+        file: Seekable binary file over the Parquet object
+
+    Returns:
+        Dict[str, Any]: Columns, row totals, row groups, codecs and writer
+    """
+    size = file.seek(0, io.SEEK_END)
+    if size < 12:
+        raise ValueError("Not a Parquet file: too small")
+    file.seek(size - 8)
+    tail = file.read(8)
+    footer_length = struct.unpack('<I', tail[:4])[0]
+    if tail[4:] != PARQUET_MAGIC or footer_length > size - 12:
+        raise ValueError("Not a Parquet file: missing footer")
+    file.seek(size - 8 - footer_length)
+    metadata = _CompactReader(file.read(footer_length)).read_struct()
+
+    row_groups = metadata.get(4) or []
+    codecs = set()
+    for row_group in row_groups:
+        for column in row_group.get(1) or []:
+            codec = (column.get(3) or {}).get(4)
+            if codec is not None:
+                codecs.add(_enum(PARQUET_CODECS, codec))
+    return {
+        'num_rows': metadata.get(3),
+        'columns': _parquet_columns(metadata.get(2) or []),
+        'row_group_count': len(row_groups),
+        'row_groups': [{'num_rows': row_group.get(3), 'total_byte_size': row_group.get(2)}
+                       for row_group in row_groups[:MAX_ROW_GROUPS]],
+        'compression': sorted(codecs),
+        'created_by': _text(metadata.get(6)),
+        'metadata_keys': [_text(entry.get(1)) for entry in metadata.get(5) or []]
+    }
+
+
+def preview_rows(stream, fmt: str, max_rows: int = DEFAULT_PREVIEW_ROWS, encoding: str = content.DEFAULT_ENCODING,
+                 delimiter: str = None) -> Dict[str, Any]:
+    """
+    Parse the first rows of CSV, JSON Lines or plain text from a stream.
+
+    At most READ_MAX_BYTES of (decompressed) content are read; a row cut off
+    by that limit is dropped.
+
+    Args:
+        stream: Binary stream positioned at the start of the content
+        fmt (str): FORMAT_CSV, FORMAT_JSONL or FORMAT_TEXT
+        max_rows (int, optional): Maximum data rows (or lines) to return
+        encoding (str, optional): Text encoding of the content
+        delimiter (str, optional): CSV field delimiter (',' by default)
+
+    Returns:
+        Dict[str, Any]: Columns where known, rows (or lines), their count and whether more follow
+    """
+    limit = max(1, min(max_rows or DEFAULT_PREVIEW_ROWS, MAX_PREVIEW_ROWS))
+    capped = _CappedReader(stream, content.get_max_bytes())
+    buffered = io.BufferedReader(capped, CHUNK_SIZE)
+    if content.is_binary(buffered.peek(content.SNIFF_BYTES)):
+        raise ValueError("Content is binary; use read_object with encoding='base64' instead")
+    text = io.TextIOWrapper(buffered, encoding=encoding, errors='replace', newline='')
+
+    if fmt == FORMAT_CSV:
+        reader = csv.reader(text, delimiter=delimiter or ',')
+        try:
+            columns = next(reader, [])
+            rows = list(itertools.islice(reader, limit + 1))
+        except csv.Error:
+            if not capped.capped:
+                raise
+            rows = []
+    else:
+        columns = None
+        rows = [line.rstrip('\r\n') for line in itertools.islice(text, limit + 1)]
+
+    # The last row read before the byte limit may be incomplete
+    if capped.capped and rows:
+        rows.pop()
+    more = len(rows) > limit or capped.capped
+    rows = rows[:limit]
+
+    errors = []
+    if fmt == FORMAT_JSONL:
+        parsed = []
+        columns = []
+        for line_number, line in enumerate(rows, start=1):
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError as e:
+                errors.append({'line': line_number, 'error': str(e)})
+                continue
+            if isinstance(value, dict):
+                columns.extend(key for key in value if key not in columns)
+            parsed.append(value)
+        rows = parsed
+
+    result = {'rows' if fmt != FORMAT_TEXT else 'lines': rows, 'count': len(rows), 'truncated': more}
+    if columns is not None:
+        result['columns'] = columns
+    if errors:
+        result['errors'] = errors
+    return result
+
+
+@contextmanager
+def decompressed(file, compression: Optional[str]) -> Iterator[Any]:
+    """Yield a stream of the decompressed content of file"""
+    if compression == GZIP:
+        with gzip.GzipFile(fileobj=file, mode='rb') as stream:
+            yield stream
+    else:
+        yield file
@@ -0,0 +1,415 @@
+import asyncio
+import hashlib
+import hmac
+import os
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote
+from xml.etree import ElementTree
+
+import httpx
+
+import cloud
+import metrics
+from cloud import logger
+
+# Environment variable names
+ENV_CLOUD_ASYNC_MAX_CONNECTIONS = "CLOUD_ASYNC_MAX_CONNECTIONS"
+
+# One event loop can keep thousands of requests in flight; the pool bounds open sockets
+DEFAULT_CLOUD_ASYNC_MAX_CONNECTIONS = 1000
+CHUNK_SIZE = 64 * 1024
+# Local writes are batched so that each hop to a worker thread moves a useful amount
+WRITE_BUFFER_SIZE = 1024 * 1024
+S3_NAMESPACE = 'http://s3.amazonaws.com/doc/2006-03-01/'
+EMPTY_SHA256 = hashlib.sha256(b'').hexdigest()
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+META_PREFIX = 'x-amz-meta-'
+
+
+class S3Error(Exception):
+    """An error response from an S3-compatible endpoint"""
+
+    def __init__(self, status: int, error_code: str, message: str, headers=None):
+        super().__init__(f"{message} ({error_code}, status {status})")
+        # classify_error reads the HTTP status from code and Retry-After from headers
+        self.code = status
+        self.error_code = error_code
+        self.headers = headers or {}
+
+
+def _child(element, tag):
+    """Return a direct child, with or without the S3 namespace"""
+    child = element.find(f'{{{S3_NAMESPACE}}}{tag}')
+    return child if child is not None else element.find(tag)
+
+
+def _find(element, tag):
+    """Return the text of a direct child, with or without the S3 namespace"""
+    child = _child(element, tag)
+    return child.text if child is not None else None
+
+
+def _findall(element, tag):
+    return element.findall(f'{{{S3_NAMESPACE}}}{tag}') or element.findall(tag)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode('utf-8'), hashlib.sha256).digest()
+
+
+def _quote(value: str, safe: str = '~') -> str:
+    """Percent-encode everything but RFC 3986 unreserved characters (and safe)"""
+    return quote(value, safe=safe)
+
+
+class AsyncS3Client:
+    """
+    S3 client for one profile, built on a pooled httpx.AsyncClient.
+
+    Requests are signed with AWS Signature Version 4 and sent through the
+    profile's resilience policy, so retries, rate limiting and the circuit
+    breaker behave as they do for libcloud drivers. Results use libcloud's
+    Container and Object classes so that callers can share formatting code
+    with the libcloud path. A client belongs to the event loop it was
+    created on.
+    """
+
+    # Stands in for the driver name of the Containers and Objects it returns
+    name = 'Amazon S3 (asyncio)'
+
+    def __init__(self, profile, max_connections: int = None):
+        """
+        Args:
+            profile: DriverProfile of an S3-compatible provider
+            max_connections (int, optional): Maximum open connections to the endpoint
+        """
+        if max_connections is None:
+            max_connections = int(os.environ.get(ENV_CLOUD_ASYNC_MAX_CONNECTIONS,
+                                                 DEFAULT_CLOUD_ASYNC_MAX_CONNECTIONS))
+        options = profile.driver_kwargs
+        self.profile = profile
+        self.access_key = options.get('key') or ''
+        self.secret_key = options.get('secret') or ''
+        self.region = profile.region or cloud.DEFAULT_CLOUD_REGION
+        self.scheme = 'https' if options.get('secure', True) else 'http'
+        self.port = options.get('port')
+        # Custom endpoints (S3-compatible stores, local stand-ins) are addressed path-style
+        self.path_style = options.get('host') is not None
+        self.endpoint = options.get('host') or f's3.{self.region}.amazonaws.com'
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max(1, max_connections),
+                                max_keepalive_connections=max(1, max_connections)),
+            timeout=profile.timeout)
+        self._signing_key = (None, None)
+
+    async def close(self):
+        """Close the connection pool"""
+        await self.http.aclose()
+
+    def _location(self, bucket: Optional[str], key: Optional[str]) -> Tuple[str, str]:
+        """Return the host and URL path addressing a bucket or object"""
+        path_style = self.path_style or bucket is None or '.' in bucket
+        host = self.endpoint if path_style else f'{bucket}.{self.endpoint}'
+        if self.port and self.port != (443 if self.scheme == 'https' else 80):
+            host = f'{host}:{self.port}'
+        path = '/'
+        if bucket is not None and path_style:
+            path += bucket + ('/' if key is not None else '')
+        if key is not None:
+            path += key
+        return host, _quote(path, safe='/~')
+
+    def _get_signing_key(self, date: str) -> bytes:
+        cached_date, cached_key = self._signing_key
+        if cached_date != date:
+            key = _hmac(('AWS4' + self.secret_key).encode('utf-8'), date)
+            for part in (self.region, 's3', 'aws4_request'):
+                key = _hmac(key, part)
+            self._signing_key = (date, key)
+            cached_key = key
+        return cached_key
+
+    def _sign(self, method: str, host: str, path: str, query: str, headers: Dict[str, str],
+              payload_hash: str) -> Dict[str, str]:
+        """Return headers with the Signature Version 4 Authorization header added"""
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date = amz_date[:8]
+        headers = dict({k.lower(): str(v) for k, v in headers.items()},
+                       **{'host': host, 'x-amz-date': amz_date, 'x-amz-content-sha256': payload_hash})
+        signed_headers = ';'.join(sorted(headers))
+        canonical_headers = ''.join(f'{name}:{" ".join(headers[name].split())}\n' for name in sorted(headers))
+        canonical_request = '\n'.join([method, path, query, canonical_headers, signed_headers, payload_hash])
+        scope = f'{date}/{self.region}/s3/aws4_request'
+        string_to_sign = '\n'.join(['AWS4-HMAC-SHA256', amz_date, scope,
+                                    _sha256(canonical_request.encode('utf-8'))])
+        signature = hmac.new(self._get_signing_key(date), string_to_sign.encode('utf-8'),
+                             hashlib.sha256).hexdigest()
+        headers['authorization'] = (f'AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, '
+                                    f'SignedHeaders={signed_headers}, Signature={signature}')
+        return headers
+
+    async def _request(self, method: str, bucket: str = None, key: str = None, params: Dict[str, Any] = None,
+                       headers: Dict[str, str] = None, body: bytes = b'', body_path: str = None,
+                       stream: bool = False) -> httpx.Response:
+        """
+        Send one signed request under the profile's resilience policy.
+
+        Args:
+            method (str): HTTP method
+            bucket (str, optional): Bucket addressed (None for the service)
+            key (str, optional): Object key addressed
+            params (Dict[str, Any], optional): Query parameters
+            headers (Dict[str, str], optional): Extra headers to send and sign
+            body (bytes, optional): Request body
+            body_path (str, optional): Local file streamed as the body instead; it is reopened for retries
+            stream (bool, optional): Return before reading the response body; the caller must close it
+
+        Returns:
+            httpx.Response: A successful response
+
+        Raises:
+            S3Error: If the endpoint returns an error status
+        """
+        host, path = self._location(bucket, key)
+        query = '&'.join(f'{_quote(str(name))}={_quote(str(value))}'
+                         for name, value in sorted((params or {}).items()))
+        url = httpx.URL(scheme=self.scheme, host=host.split(':')[0], port=self.port,
+                        raw_path=(path + ('?' + query if query else '')).encode('ascii'))
+        headers = dict(headers or {})
+        if body_path is not None:
+            headers['content-length'] = str(os.path.getsize(body_path))
+            payload_hash = UNSIGNED_PAYLOAD
+        else:
+            if body:
+                headers['content-length'] = str(len(body))
+            payload_hash = _sha256(body) if body else EMPTY_SHA256
+
+        async def _attempt():
+            metrics.record_provider_request(self.profile.provider)
+            content = _read_file(body_path) if body_path is not None else body
+            request = self.http.build_request(method, url, content=content,
+                                              headers=self._sign(method, host, path, query, headers, payload_hash))
+            try:
+                response = await self.http.send(request, stream=stream)
+            except httpx.TimeoutException as e:
+                raise TimeoutError(f"S3 request timed out: {str(e)}") from e
+            except httpx.TransportError as e:
+                raise ConnectionError(f"S3 request failed: {str(e)}") from e
+            if response.status_code >= 300:
+                data = await response.aread()
+                await response.aclose()
+                raise _to_error(response, data, key)
+            return response
+
+        return await self.profile.resilience.call_async(_attempt, True)
+
+    async def list_buckets(self) -> List[Any]:
+        """Return a Container for every bucket"""
+        response = await self._request('GET')
+        root = ElementTree.fromstring(response.content)
+        buckets = _child(root, 'Buckets')
+        return [cloud.Container(name=_find(node, 'Name'), extra={'creation_date': _find(node, 'CreationDate')},
+                                driver=self)
+                for node in (_findall(buckets, 'Bucket') if buckets is not None else [])]
+
+    async def head_bucket(self, bucket: str):
+        """Return a Container for a bucket, raising S3Error if it does not exist"""
+        await self._request('HEAD', bucket)
+        return cloud.Container(name=bucket, extra={}, driver=self)
+
+    async def head_object(self, bucket: str, key: str):
+        """Return an Object with the metadata of one object"""
+        response = await self._request('HEAD', bucket, key)
+        return _headers_to_object(self, bucket, key, response.headers)
+
+    async def list_page(self, bucket: str, prefix: str = None, delimiter: str = None, start_after: str = None,
+                        max_keys: int = 1000, continuation_token: str = None):
+        """
+        Fetch one ListObjectsV2 page.
+
+        Returns:
+            Tuple: Objects, common prefixes and the continuation token of the next page (None on the last page)
+        """
+        params = {'list-type': 2, 'max-keys': max_keys}
+        for name, value in (('prefix', prefix), ('delimiter', delimiter), ('start-after', start_after),
+                            ('continuation-token', continuation_token)):
+            if value:
+                params[name] = value
+        response = await self._request('GET', bucket, params=params)
+        root = ElementTree.fromstring(response.content)
+        container = cloud.Container(name=bucket, extra={}, driver=self)
+        objects = [cloud.Object(name=_find(node, 'Key'), size=int(_find(node, 'Size')),
+                                hash=(_find(node, 'ETag') or '').replace('"', '') or None,
+                                extra={'last_modified': _find(node, 'LastModified')}, meta_data={},
+                                container=container, driver=self)
+                   for node in _findall(root, 'Contents')]
+        prefixes = [_find(node, 'Prefix') for node in _findall(root, 'CommonPrefixes')]
+        truncated = (_find(root, 'IsTruncated') or 'false').lower() == 'true'
+        return objects, prefixes, _find(root, 'NextContinuationToken') if truncated else None
+
+    async def iterate_entries(self, bucket: str, prefix: str = None, delimiter: str = None,
+                              marker: str = None, skip_folder: str = None,
+                              page_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate listing entries in the format of listing.iterate_entries.
+
+        The endpoint groups keys into folders itself, so a folder holding
+        many keys costs no more than one entry.
+        """
+        token = None
+        while True:
+            objects, prefixes, token = await self.list_page(bucket, prefix, delimiter, None if token else marker,
+                                                            page_size, token)
+            entries = [{'type': 'object', 'object': obj, 'container': bucket} for obj in objects]
+            entries += [{'type': 'folder', 'name': folder, 'container': bucket}
+                        for folder in prefixes if folder != skip_folder]
+            entries.sort(key=lambda entry: entry['object'].name if entry['type'] == 'object' else entry['name'])
+            for entry in entries:
+                yield entry
+            if token is None:
+                return
+
+    async def iterate_object(self, bucket: str, key: str, start: int = None,
+                             end: int = None) -> AsyncIterator[bytes]:
+        """
+        Stream an object's content, or the byte range [start, end).
+
+        The response is closed when iteration finishes or stops early.
+        """
+        headers = {}
+        if start is not None:
+            headers['range'] = f'bytes={start}-' + (str(end - 1) if end is not None else '')
+        response = await self._request('GET', bucket, key, headers=headers, stream=True)
+        try:
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def download_file(self, bucket: str, key: str, destination_path: str) -> int:
+        """Write an object to destination_path via a temporary file, returning the bytes written"""
+        temp_path = f'{destination_path}.part'
+        size = 0
+        buffer = bytearray()
+        try:
+            with open(temp_path, 'wb') as f:
+                async for chunk in self.iterate_object(bucket, key):
+                    buffer += chunk
+                    size += len(chunk)
+                    if len(buffer) >= WRITE_BUFFER_SIZE:
+                        await asyncio.to_thread(f.write, bytes(buffer))
+                        buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(f.write, bytes(buffer))
+            os.replace(temp_path, destination_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return size
+
+    async def upload_file(self, bucket: str, key: str, file_path: str, content_type: str = None) -> Dict[str, Any]:
+        """Upload a local file with a single PUT, returning the new object's name, size and hash"""
+        headers = {'content-type': content_type or 'application/octet-stream'}
+        response = await self._request('PUT', bucket, key, headers=headers, body_path=file_path)
+        return {
+            'name': key,
+            'size': os.path.getsize(file_path),
+            'hash': response.headers.get('etag', '').replace('"', '') or None,
+            'container': bucket,
+            'mode': 'single',
+            'parts': 1
+        }
+
+    async def upload_bytes(self, bucket: str, key: str, body: bytes, content_type: str = None,
+                           meta_data: Dict[str, str] = None) -> Dict[str, Any]:
+        """Upload content held in memory with a single PUT, returning the new object's name, size and hash"""
+        headers = {'content-type': content_type or 'application/octet-stream'}
+        headers.update({META_PREFIX + name: value for name, value in (meta_data or {}).items()})
+        response = await self._request('PUT', bucket, key, headers=headers, body=body)
+        return {
+            'name': key,
+            'size': len(body),
+            'hash': response.headers.get('etag', '').replace('"', '') or None,
+            'container': bucket,
+            'mode': 'single',
+            'parts': 1
+        }
+
+    async def delete_object(self, bucket: str, key: str):
+        """Delete an object; S3 does not report whether it existed"""
+        await self._request('DELETE', bucket, key)
+
+
+async def _read_file(path: str) -> AsyncIterator[bytes]:
+    """Stream a local file, reading on worker threads"""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, WRITE_BUFFER_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _to_error(response: httpx.Response, data: bytes, key: Optional[str]) -> S3Error:
+    """Build an S3Error from an error response"""
+    error_code, message = None, None
+    if data:
+        try:
+            root = ElementTree.fromstring(data)
+            error_code, message = _find(root, 'Code'), _find(root, 'Message')
+        except ElementTree.ParseError:
+            pass
+    if response.status_code == 404 and not error_code:
+        # HEAD responses have no body
+        error_code = 'NoSuchKey' if key is not None else 'NoSuchBucket'
+    if error_code in ('NoSuchKey', 'NoSuchBucket'):
+        message = f"Object {key} does not exist" if error_code == 'NoSuchKey' else "Bucket does not exist"
+    return S3Error(response.status_code, error_code or 'Unknown', message or response.reason_phrase,
+                   response.headers)
+
+
+def _headers_to_object(client, bucket: str, key: str, headers) -> Any:
+    """Build an Object from HEAD/GET response headers, as libcloud's S3 driver does"""
+    extra = {}
+    for header, name in (('content-type', 'content_type'), ('etag', 'etag'),
+                         ('content-encoding', 'content_encoding'), ('last-modified', 'last_modified')):
+        if header in headers:
+            extra[name] = headers[header]
+    meta_data = {name[len(META_PREFIX):]: value for name, value in headers.items()
+                 if name.lower().startswith(META_PREFIX)}
+    return cloud.Object(name=key, size=int(headers.get('content-length', 0)),
+                        hash=headers.get('etag', '').replace('"', '') or None, extra=extra, meta_data=meta_data,
+                        container=cloud.Container(name=bucket, extra={}, driver=client), driver=client)
+
+
+# Clients by (profile name, profile generation, event loop)
+_clients = {}
+
+
+def get_client(profile) -> AsyncS3Client:
+    """Return the profile's client for the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    key = (profile.name, profile.generation, loop)
+    client = _clients.get(key)
+    if client is None:
+        # Drop clients of loops that have been closed
+        for stale in [stale for stale in _clients if stale[2].is_closed()]:
+            del _clients[stale]
+        client = AsyncS3Client(profile)
+        _clients[key] = client
+        logger.info(f"Initialized async S3 client for profile {profile.name}")
+    return client
+
+
+async def close_clients():
+    """Close the clients of the running event loop"""
+    loop = asyncio.get_running_loop()
+    for key in [key for key in _clients if key[2] is loop]:
+        await _clients.pop(key).close()
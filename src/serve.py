@@ -0,0 +1,371 @@
+import logging
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import anyio
+import httpx
+import uvicorn
+from mcp.server.sse import SseServerTransport
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+import storage
+from cloud import logger
+
+# Environment variable names
+ENV_MCP_TRANSPORT = "MCP_TRANSPORT"
+ENV_MCP_HOST = "MCP_HOST"
+ENV_MCP_PORT = "MCP_PORT"
+ENV_MCP_WORKERS = "MCP_WORKERS"
+ENV_MCP_GRACEFUL_TIMEOUT = "MCP_GRACEFUL_TIMEOUT"
+DEFAULT_MCP_HOST = "127.0.0.1"
+DEFAULT_MCP_PORT = 8000
+DEFAULT_MCP_WORKERS = 1
+DEFAULT_MCP_GRACEFUL_TIMEOUT = 30
+# Set by the supervisor for its worker processes
+ENV_WORKER_FD = "MCP_WORKER_FD"
+ENV_RUNTIME_DIR = "MCP_RUNTIME_DIR"
+
+TRANSPORT_STDIO = 'stdio'
+TRANSPORT_SSE = 'sse'
+SSE_PATH = '/sse'
+MESSAGE_PATH = '/messages/'
+# Seconds a new worker has to start before a reload gives up on it and keeps the old one
+WORKER_START_TIMEOUT = 60
+# Workers that exit sooner than this after starting are restarted after RESTART_DELAY seconds
+WORKER_MIN_LIFETIME = 5
+RESTART_DELAY = 1
+# Seconds a drained worker gives remaining requests once its sessions have closed
+SHUTDOWN_TIMEOUT = 5
+# Seconds a relayed message may wait for the worker holding its session
+RELAY_TIMEOUT = 30
+# Seconds between supervisor checks on its workers
+POLL_INTERVAL = 0.2
+
+
+def _socket_path(runtime_dir: str, worker_id) -> str:
+    """Return the path of a worker's private socket, which other workers relay session messages to"""
+    return os.path.join(runtime_dir, f'worker-{worker_id}.sock')
+
+
+class Worker:
+    """
+    SSE app of one worker process.
+
+    An SSE session lives in the worker that accepted its stream, but the
+    client posts its messages as separate requests that the shared listener
+    may hand to any worker. Each worker therefore advertises a message path
+    carrying its id, and relays messages for other workers' sessions to
+    their private sockets.
+    """
+
+    def __init__(self, mcp, worker_id: str, runtime_dir: str):
+        """
+        Args:
+            mcp: FastMCP server whose tools the sessions use
+            worker_id (str): Id of this worker (its process id)
+            runtime_dir (str): Directory holding the workers' private sockets
+        """
+        self.mcp = mcp
+        self.worker_id = worker_id
+        self.runtime_dir = runtime_dir
+        self.sse = SseServerTransport(f'{MESSAGE_PATH}{worker_id}/')
+        self._sessions = set()
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    @property
+    def sessions(self) -> int:
+        return len(self._sessions)
+
+    async def __call__(self, scope, receive, send):
+        """ASGI endpoint of the SSE stream; a session runs for as long as its stream"""
+        with anyio.CancelScope() as session:
+            self._sessions.add(session)
+            try:
+                async with self.sse.connect_sse(scope, receive, send) as streams:
+                    server = self.mcp._mcp_server
+                    await server.run(streams[0], streams[1], server.create_initialization_options())
+            finally:
+                self._sessions.discard(session)
+
+    def close_sessions(self):
+        """End the open sessions; their clients reconnect through the shared listener"""
+        for session in list(self._sessions):
+            session.cancel()
+
+    async def relay(self, request: Request) -> Response:
+        """Forward a message for a session of another worker to that worker"""
+        target = request.path_params['worker']
+        client = self._clients.get(target)
+        if client is None:
+            path = _socket_path(self.runtime_dir, target)
+            # Worker ids are process ids; anything else cannot name a socket
+            if not target.isdigit() or not os.path.exists(path):
+                return Response("Could not find session", status_code=404)
+            client = httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(uds=path), base_url='http://worker',
+                                         timeout=RELAY_TIMEOUT)
+            self._clients[target] = client
+
+        try:
+            response = await client.post(request.url.path, params=request.query_params, content=await request.body(),
+                                         headers={'content-type': request.headers.get('content-type', '')})
+        except httpx.TransportError as e:
+            # The worker has exited; its sessions are gone and the client has to reconnect
+            self._clients.pop(target, None)
+            await client.aclose()
+            logger.warning(f"Could not relay message to worker {target}: {str(e)}")
+            return Response("Could not find session", status_code=404)
+        return Response(response.content, status_code=response.status_code,
+                        media_type=response.headers.get('content-type'))
+
+    def app(self) -> Starlette:
+        return Starlette(debug=self.mcp.settings.debug, routes=[
+            # A Worker is an ASGI app, so the stream gets the raw connection rather than a request/response
+            Route(SSE_PATH, endpoint=self),
+            Mount(f'{MESSAGE_PATH}{self.worker_id}/', app=self.sse.handle_post_message),
+            Route(MESSAGE_PATH + '{worker}/', endpoint=self.relay, methods=['POST']),
+        ])
+
+
+class WorkerServer(uvicorn.Server):
+    """
+    uvicorn server that drains on SIGTERM.
+
+    It stops accepting connections on the shared listener but keeps its
+    private socket, so open sessions keep working until they close or the
+    graceful timeout passes. It also drains if the supervisor goes away.
+    """
+
+    def __init__(self, config: uvicorn.Config, worker: Worker, graceful_timeout: float):
+        super().__init__(config)
+        self.worker = worker
+        self.graceful_timeout = graceful_timeout
+        self._parent = os.getppid()
+        self._drain_started = None
+
+    def handle_exit(self, sig, frame):
+        if sig == signal.SIGTERM and self._drain_started is None:
+            self._drain_started = time.monotonic()
+            return
+        super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter: int) -> bool:
+        if self._drain_started is None and os.getppid() != self._parent:
+            logger.warning("Supervisor exited; draining worker")
+            self._drain_started = time.monotonic()
+        if self._drain_started is not None:
+            # The shared listener is the first socket passed to serve()
+            if self.servers and self.servers[0].is_serving():
+                self.servers[0].close()
+                logger.info(f"Worker {self.worker.worker_id} draining {self.worker.sessions} session(s)")
+            if self.worker.sessions == 0 or time.monotonic() - self._drain_started >= self.graceful_timeout:
+                self.worker.close_sessions()
+                return True
+        return await super().on_tick(counter)
+
+
+def run_worker(mcp, fd: int, runtime_dir: str, graceful_timeout: float):
+    """
+    Serve SSE sessions on the listening socket inherited from the supervisor.
+
+    Args:
+        mcp: FastMCP server to serve
+        fd (int): File descriptor of the shared listening socket
+        runtime_dir (str): Directory for this worker's private socket
+        graceful_timeout (float): Seconds open sessions may keep running once the worker is asked to stop
+    """
+    worker = Worker(mcp, str(os.getpid()), runtime_dir)
+    # Relays would otherwise log every message
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    listener = socket.socket(fileno=fd)
+    path = _socket_path(runtime_dir, worker.worker_id)
+    private = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # The socket only appears under its final name once it accepts connections, which tells
+    # the supervisor that the worker is ready
+    private.bind(f'{path}.tmp')
+    private.listen(socket.SOMAXCONN)
+    os.rename(f'{path}.tmp', path)
+
+    config = uvicorn.Config(worker.app(), log_level=mcp.settings.log_level.lower(), lifespan='off',
+                            timeout_graceful_shutdown=SHUTDOWN_TIMEOUT)
+    try:
+        WorkerServer(config, worker, graceful_timeout).run(sockets=[listener, private])
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class Supervisor:
+    """Runs worker processes behind one listening socket and replaces them one by one on SIGHUP"""
+
+    def __init__(self, host: str, port: int, workers: int, graceful_timeout: float):
+        """
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on
+            workers (int): Number of worker processes
+            graceful_timeout (float): Seconds a stopping worker's open sessions may keep running
+        """
+        self.host = host
+        self.port = port
+        self.size = max(1, workers)
+        self.graceful_timeout = graceful_timeout
+        self.workers: List[subprocess.Popen] = []
+        # Replaced workers still finishing their sessions, with the time by which they must exit
+        self.draining: Dict[subprocess.Popen, float] = {}
+        self._started: Dict[int, float] = {}
+        self._reload = False
+        self._stopping = False
+        self._force = False
+
+    def _handle_reload(self, sig, frame):
+        self._reload = True
+
+    def _handle_stop(self, sig, frame):
+        # A second signal stops the workers without waiting for their sessions
+        if self._stopping:
+            self._force = True
+        self._stopping = True
+
+    def _spawn(self) -> subprocess.Popen:
+        """Start a worker running this same command, so it picks up the current code and configuration"""
+        fd = self.listener.fileno()
+        env = dict(os.environ, **{ENV_WORKER_FD: str(fd), ENV_RUNTIME_DIR: self.runtime_dir,
+                                  storage.ENV_SHARED_CACHE_PATH: self.shared_cache_path})
+        # Own session: a terminal's Ctrl+C reaches the supervisor only, which then drains the workers
+        process = subprocess.Popen([sys.executable] + sys.orig_argv[1:], env=env, pass_fds=(fd,),
+                                   start_new_session=True)
+        self._started[process.pid] = time.monotonic()
+        return process
+
+    def _wait_ready(self, process: subprocess.Popen) -> bool:
+        """Wait until a new worker listens on its private socket, returning False if it exits or times out"""
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        path = _socket_path(self.runtime_dir, process.pid)
+        while time.monotonic() < deadline and not self._stopping:
+            if process.poll() is not None:
+                return False
+            if os.path.exists(path):
+                return True
+            time.sleep(0.05)
+        return False
+
+    def _drain(self, process: subprocess.Popen):
+        process.send_signal(signal.SIGTERM)
+        self.draining[process] = time.monotonic() + self.graceful_timeout + SHUTDOWN_TIMEOUT + RESTART_DELAY
+
+    def reload(self):
+        """Replace the workers one at a time, keeping the old ones if a new worker fails to start"""
+        logger.info(f"Reloading {len(self.workers)} worker(s)")
+        for index, old in enumerate(list(self.workers)):
+            new = self._spawn()
+            if not self._wait_ready(new):
+                logger.error(f"Reload stopped: new worker exited or did not start in {WORKER_START_TIMEOUT}s; "
+                             "keeping the running workers")
+                new.kill()
+                new.wait()
+                return
+            self.workers[index] = new
+            self._drain(old)
+        logger.info("Reload complete")
+
+    def _check_workers(self):
+        """Restart workers that exited and reap or kill drained ones"""
+        for index, process in enumerate(self.workers):
+            if process.poll() is None:
+                continue
+            logger.warning(f"Worker {process.pid} exited with code {process.returncode}; restarting it")
+            # A killed worker leaves its socket behind; relays to it must fail fast
+            path = _socket_path(self.runtime_dir, process.pid)
+            if os.path.exists(path):
+                os.remove(path)
+            if time.monotonic() - self._started.pop(process.pid, 0) < WORKER_MIN_LIFETIME:
+                time.sleep(RESTART_DELAY)
+            self.workers[index] = self._spawn()
+        for process, deadline in list(self.draining.items()):
+            if process.poll() is not None:
+                self._started.pop(process.pid, None)
+                del self.draining[process]
+            elif time.monotonic() > deadline:
+                process.kill()
+
+    def stop(self):
+        """Drain all workers, killing any still running after the graceful timeout or a second signal"""
+        for process in self.workers:
+            self._drain(process)
+        self.workers = []
+        while self.draining:
+            if self._force:
+                for process in self.draining:
+                    process.kill()
+            self._check_workers()
+            time.sleep(POLL_INTERVAL)
+
+    def run(self):
+        """Listen, start the workers and supervise them until SIGINT or SIGTERM"""
+        self.listener = socket.create_server((self.host, self.port), backlog=socket.SOMAXCONN)
+        self.runtime_dir = tempfile.mkdtemp(prefix='mcp-cloud-')
+        shared_cache_path = os.environ.get(storage.ENV_SHARED_CACHE_PATH)
+        self.shared_cache_path = shared_cache_path or os.path.join(self.runtime_dir, 'cache.db')
+        signal.signal(signal.SIGHUP, self._handle_reload)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        try:
+            self.workers = [self._spawn() for _ in range(self.size)]
+            logger.info(f"Serving SSE on http://{self.host}:{self.port}{SSE_PATH} with {self.size} worker(s)")
+            while not self._stopping:
+                if self._reload:
+                    self._reload = False
+                    self.reload()
+                self._check_workers()
+                time.sleep(POLL_INTERVAL)
+            logger.info("Stopping workers")
+            self.stop()
+        finally:
+            for process in self.workers + list(self.draining):
+                process.kill()
+            self.listener.close()
+            shutil.rmtree(self.runtime_dir, ignore_errors=True)
+
+
+def run(mcp):
+    """
+    Run the server on the transport selected by MCP_TRANSPORT.
+
+    stdio (the default) serves a single client over standard input/output.
+    sse serves HTTP clients from MCP_WORKERS worker processes.
+
+    Args:
+        mcp: FastMCP server to run
+    """
+    transport = os.environ.get(ENV_MCP_TRANSPORT, TRANSPORT_STDIO).lower()
+    if transport == TRANSPORT_STDIO:
+        mcp.run()
+        return
+    if transport != TRANSPORT_SSE:
+        raise ValueError(f"Unknown {ENV_MCP_TRANSPORT}: {transport} (expected {TRANSPORT_STDIO} or {TRANSPORT_SSE})")
+
+    graceful_timeout = float(os.environ.get(ENV_MCP_GRACEFUL_TIMEOUT, DEFAULT_MCP_GRACEFUL_TIMEOUT))
+    if ENV_WORKER_FD in os.environ:
+        run_worker(mcp, int(os.environ[ENV_WORKER_FD]), os.environ[ENV_RUNTIME_DIR], graceful_timeout)
+        return
+
+    host = os.environ.get(ENV_MCP_HOST, DEFAULT_MCP_HOST)
+    port = int(os.environ.get(ENV_MCP_PORT, DEFAULT_MCP_PORT))
+    if os.name == 'nt':
+        # Worker processes share the listener through POSIX file descriptor inheritance
+        logger.warning(f"{ENV_MCP_WORKERS} and reload need a POSIX system; serving from a single process")
+        mcp.settings.host = host
+        mcp.settings.port = port
+        mcp.run(transport=TRANSPORT_SSE)
+        return
+    Supervisor(host, port, int(os.environ.get(ENV_MCP_WORKERS, DEFAULT_MCP_WORKERS)), graceful_timeout).run()
@@ -1,32 +1,200 @@
+import asyncio
+import base64
+import binascii
+import codecs
+import itertools
+import json
+import mimetypes
 import os
+import re
+import threading
+import time
 from typing import Any, List, Dict
+from mcp.server.fastmcp import Context
+import bulk
 import cloud
-from mcp.server.fastmcp import FastMCP
-from libcloud.common.types import LibcloudError
+import compress
+import content
+import dispatch
+import filecache
+import index
+import listing
+import metrics
+import preview
+import s3async
+import sync
+import transfer
+import cache
+from cache import MISSING
+from cloud import logger
+
+# Environment variable names
+ENV_CONTAINER_CACHE_TTL = "CONTAINER_CACHE_TTL"
+ENV_CONTAINER_CACHE_SIZE = "CONTAINER_CACHE_SIZE"
+DEFAULT_CONTAINER_CACHE_TTL = 300
+DEFAULT_CONTAINER_CACHE_SIZE = 256
+ENV_OBJECT_CACHE_TTL = "OBJECT_CACHE_TTL"
+ENV_OBJECT_CACHE_SIZE = "OBJECT_CACHE_SIZE"
+DEFAULT_OBJECT_CACHE_TTL = 60
+DEFAULT_OBJECT_CACHE_SIZE = 1024
+ENV_SHARED_CACHE_PATH = "SHARED_CACHE_PATH"
+MAX_BATCH_ITEMS = 10000
+MAX_SYNC_REPORT_ITEMS = 1000
+DEFAULT_SEARCH_RESULTS = 100
+MAX_SEARCH_RESULTS = 1000
+BUCKET_FIELDS = ['name', 'provider', 'region', 'extra']
+DEFAULT_BUCKET_FIELDS = ['name', 'provider', 'region']
+DEFAULT_INVENTORY_TIMEOUT = 30
+# Extra seconds to wait for a bucket that overran its listing deadline on a slow provider request
+INVENTORY_TIMEOUT_GRACE = 5
+# Matching lines are truncated to this many characters in search results
+MAX_MATCH_TEXT = 500
 
 # Reference to the MCP server instance from main.py
 mcp = None
 
+# Container name/extra keyed by (provider, driver generation, bucket name)
+# Both caches live in a SQLite file shared by the server processes when SHARED_CACHE_PATH is set
+container_cache = cache.create(
+    'containers',
+    max_size=int(os.environ.get(ENV_CONTAINER_CACHE_SIZE, DEFAULT_CONTAINER_CACHE_SIZE)),
+    ttl=float(os.environ.get(ENV_CONTAINER_CACHE_TTL, DEFAULT_CONTAINER_CACHE_TTL)),
+    shared_path=os.environ.get(ENV_SHARED_CACHE_PATH)
+)
+
+# get_object results keyed by (provider, driver generation, bucket name, object name)
+object_cache = cache.create(
+    'objects',
+    max_size=int(os.environ.get(ENV_OBJECT_CACHE_SIZE, DEFAULT_OBJECT_CACHE_SIZE)),
+    ttl=float(os.environ.get(ENV_OBJECT_CACHE_TTL, DEFAULT_OBJECT_CACHE_TTL)),
+    shared_path=os.environ.get(ENV_SHARED_CACHE_PATH)
+)
+
+# Outcomes of get_object(revalidate=True) against a cached entry
+_revalidation_lock = threading.Lock()
+revalidation_stats = {'unchanged': 0, 'changed': 0}
+
 def register_storage(mcp_instance):
     """Register all storage-related tools and functions with the MCP instance"""
     global mcp
     mcp = mcp_instance
     
-    # Register all tool functions
-    mcp.tool(name="list_buckets")(list_buckets)
-    mcp.tool(name="get_bucket_details")(get_bucket_details)
-    mcp.tool(name="list_objects")(list_objects)
-    mcp.tool(name="list_all_objects")(list_all_objects)
-    mcp.tool(name="get_object")(get_object)
-    mcp.tool(name="download_object")(download_object)
-    mcp.tool(name="upload_object")(upload_object)
-    #mcp.tool(name="delete_object")(delete_object)
+    def _tool(name, func):
+        mcp.tool(name=name)(metrics.instrument(name, func))
+    
+    def _resource(uri, func):
+        mcp.resource(uri)(metrics.instrument(func.__name__, func))
+    
+    # Register all tool functions, each wrapped to record per-call metrics
+    _tool("list_profiles", list_profiles)
+    _tool("list_buckets", list_buckets)
+    _tool("get_bucket_details", get_bucket_details)
+    _tool("bucket_inventory", bucket_inventory)
+    _tool("list_objects", list_objects)
+    _tool("list_all_objects", list_all_objects)
+    _tool("get_object", get_object)
+    _tool("read_object", read_object)
+    _tool("preview_object", preview_object)
+    _tool("list_archive_members", list_archive_members)
+    _tool("extract_archive_member", extract_archive_member)
+    _tool("download_object", download_object)
+    _tool("upload_object", upload_object)
+    _tool("delete_object", delete_object)
+    _tool("delete_objects", delete_objects)
+    _tool("copy_objects", copy_objects)
+    _tool("download_objects", download_objects)
+    _tool("upload_objects", upload_objects)
+    _tool("sync_prefix", sync_prefix)
+    _tool("search_objects", search_objects)
+    _tool("index_bucket", index_bucket)
+    _tool("query_index", query_index)
+    _tool("get_bucket_stats", get_bucket_stats)
+    _tool("get_dispatch_stats", get_dispatch_stats)
+    _tool("get_cache_stats", get_cache_stats)
+    _tool("get_metrics", get_metrics)
     
     # Register resource endpoints
-    mcp.resource("/storage/objects/{bucket_name}/{object_name}")(get_object_resource)
-    mcp.resource("/storage/download/{bucket_name}/{object_name}")(download_object_resource)
+    _resource("/storage/objects/{bucket_name}/{object_name}", get_object_resource)
+    _resource("/storage/download/{bucket_name}/{object_name}", download_object_resource)
+    _resource("/storage/content/{bucket_name}/{object_name}", read_object_resource)
+    _resource("storage://metrics", get_metrics_resource)
     return True
 
+def _get_container(cloud_profile, driver, bucket_name: str):
+    """Return a container handle, using the container cache to skip the provider lookup"""
+    key = (cloud_profile.name, cloud_profile.generation, bucket_name)
+    cached = container_cache.get(key)
+    if cached is MISSING:
+        container = driver.get_container(bucket_name)
+        container_cache.set(key, (container.name, container.extra))
+        return container
+    
+    # Rebind to the calling thread's driver; handles must not be shared across threads
+    name, extra = cached
+    return cloud.Container(name=name, extra=extra, driver=driver)
+
+def _object_stub(container, object_name: str):
+    """Build an object handle without a metadata request, for calls that only need its name"""
+    return cloud.Object(name=object_name, size=None, hash=None, extra={}, meta_data={},
+                        container=container, driver=container.driver)
+
+def _object_key(cloud_profile, bucket_name: str, object_name: str):
+    return (cloud_profile.name, cloud_profile.generation, bucket_name, object_name)
+
+def invalidate_bucket(bucket_name: str) -> int:
+    """Drop cached handles and object metadata for a bucket, returning the number of entries removed"""
+    removed = container_cache.invalidate_where(lambda key: key[2] == bucket_name)
+    removed += object_cache.invalidate_where(lambda key: key[2] == bucket_name)
+    return removed
+
+def invalidate_object(cloud_profile, bucket_name: str, object_name: str) -> bool:
+    """Drop cached metadata for an object"""
+    return object_cache.invalidate(_object_key(cloud_profile, bucket_name, object_name))
+
+async def _cache_call(func, *args):
+    """Call a cache operation from the event loop; the shared caches query SQLite, so they run on a thread"""
+    if container_cache.blocking or object_cache.blocking:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+def _profile_error(profile: str) -> str:
+    """Return the error message for a profile that cannot be used"""
+    if profile and profile != cloud.DEFAULT_PROFILE:
+        return f"Unknown cloud profile: {profile}"
+    return "Cloud driver not initialized"
+
+def _async_client(cloud_profile):
+    """Return the profile's asyncio S3 client, or None if the profile uses libcloud drivers"""
+    if cloud_profile.backend != cloud.BACKEND_ASYNC:
+        return None
+    return s3async.get_client(cloud_profile)
+
+def _share_key(args) -> tuple:
+    """Normalize call arguments into a hashable key; profiles are identified by name and generation"""
+    key = []
+    for arg in args:
+        if isinstance(arg, cloud.DriverProfile):
+            arg = (arg.name, arg.generation)
+        elif isinstance(arg, list):
+            arg = tuple(arg)
+        key.append(arg)
+    return tuple(key)
+
+async def _run_bucket_call(tool_name: str, bucket_name: str, func, *args, shared: bool = False) -> Any:
+    """
+    Run a blocking bucket operation, invalidating cached handles if it fails.
+    
+    Read-only calls pass shared=True so that identical concurrent calls share
+    one provider request.
+    """
+    try:
+        if shared:
+            return await dispatch.run_shared(tool_name, _share_key(args), func, *args)
+        return await dispatch.run_blocking(tool_name, func, *args)
+    except Exception:
+        await _cache_call(invalidate_bucket, bucket_name)
+        raise
+
 # Tool functions
 def initialize_cloud_driver(provider: str, credentials: Dict[str, str]) -> Dict[str, Any]:
     """Initialize cloud driver with provided credentials"""
@@ -56,269 +224,2106 @@ def initialize_cloud_driver(provider: str, credentials: Dict[str, str]) -> Dict[
             "message": f"Error: {str(e)}"
         }
 
-async def list_buckets() -> List[Dict[str, Any]]:
-    """List all buckets from the initialized cloud driver"""
+async def list_profiles() -> List[Dict[str, Any]]:
+    """
+    List the configured cloud profiles.
+    
+    Returns:
+        List[Dict[str, Any]]: Name, provider and region of each profile usable as a tool's profile argument
+    """
+    return cloud.list_profiles()
+
+async def list_buckets(fields: List[str] = None, compact: bool = False, profile: str = None) -> Any:
+    """
+    List all buckets from the initialized cloud driver.
+    
+    Args:
+        fields (List[str], optional): Fields to return per bucket, from name, provider, region and extra (default: name, provider, region)
+        compact (bool, optional): Return {'columns', 'buckets', 'count'} with each bucket as a list of values
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+        
+    Returns:
+        Any: List of buckets, or the compact form
+    """
     try:
-        if not cloud.driver:
-            return [{"error": "Cloud driver not initialized"}]
-        
-        containers = cloud.driver.list_containers()
-        return [{
-            "name": container.name,
-            "provider": cloud.provider,
-            "region": cloud.region
-        } for container in containers]
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return [{"error": _profile_error(profile)}]
+        fields = listing.parse_fields(fields, BUCKET_FIELDS, DEFAULT_BUCKET_FIELDS)
+        
+        client = _async_client(cloud_profile)
+        if client is not None:
+            return await dispatch.share("list_buckets", _share_key((cloud_profile, fields, compact)),
+                                        lambda: _list_buckets_async(client, cloud_profile, fields, compact))
+        return await dispatch.run_shared("list_buckets", _share_key((cloud_profile, fields, compact)), _list_buckets,
+                                         cloud_profile, fields, compact)
+    except ValueError as e:
+        return [{"error": str(e)}]
+    except s3async.S3Error as e:
+        return [{"error": f"Error listing buckets: {str(e)}"}]
     except Exception as e:
         return [{"error": f"Failed to list buckets: {str(e)}"}]
 
-async def get_bucket_details(bucket_name: str) -> Dict[str, Any]:
+def _list_buckets(cloud_profile, fields: List[str] = DEFAULT_BUCKET_FIELDS, compact: bool = False) -> Any:
+    containers = cloud_profile.get_thread_driver().list_containers()
+    
+    # Prime the container cache so follow-up calls skip the lookup
+    for container in containers:
+        container_cache.set((cloud_profile.name, cloud_profile.generation, container.name),
+                            (container.name, container.extra))
+    return _format_buckets(cloud_profile, containers, fields, compact)
+
+async def _list_buckets_async(client, cloud_profile, fields: List[str], compact: bool) -> Any:
+    return _format_buckets(cloud_profile, await client.list_buckets(), fields, compact)
+
+def _format_buckets(cloud_profile, containers, fields: List[str], compact: bool) -> Any:
+    getters = {
+        'name': lambda container: container.name,
+        'provider': lambda container: cloud_profile.provider,
+        'region': lambda container: cloud_profile.region,
+        'extra': lambda container: container.extra
+    }
+    buckets = listing.project(containers, fields, getters, compact)
+    if compact:
+        return {'columns': fields, 'buckets': buckets, 'count': len(buckets)}
+    return buckets
+
+async def get_bucket_details(bucket_name: str, profile: str = None) -> Dict[str, Any]:
     """Get details about a specific bucket"""
     try:
-        if not cloud.driver:
-            return {"error": "Cloud driver not initialized"}
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
             
-        container = cloud.driver.get_container(bucket_name)
+        client = _async_client(cloud_profile)
+        if client is not None:
+            container = await dispatch.share("get_bucket_details", _share_key((cloud_profile, bucket_name)),
+                                             lambda: client.head_bucket(bucket_name))
+            return _bucket_details(cloud_profile, container)
+        return await _run_bucket_call("get_bucket_details", bucket_name, _get_bucket_details, cloud_profile, bucket_name, shared=True)
+    except Exception as e:
+        return {"error": f"Failed to get bucket details: {str(e)}"}    
+
+def _get_bucket_details(cloud_profile, bucket_name: str) -> Dict[str, Any]:
+    return _bucket_details(cloud_profile, _get_container(cloud_profile, cloud_profile.get_thread_driver(), bucket_name))
+
+def _bucket_details(cloud_profile, container) -> Dict[str, Any]:
+    return {
+        "name": container.name,
+        "provider": cloud_profile.provider,
+        "region": cloud_profile.region,
+        "extra": container.extra
+    }
+
+async def bucket_inventory(bucket_names: List[str] = None, timeout: float = DEFAULT_INVENTORY_TIMEOUT,
+                           max_concurrency: int = None, max_objects_per_bucket: int = None,
+                           use_index: bool = True, profile: str = None, ctx: Context = None) -> Dict[str, Any]:
+    """
+    Summarise object counts, total size and latest modification time for many buckets at once.
+    
+    Buckets are listed concurrently, each with its own time limit; a bucket
+    that runs out of time reports the partial totals it reached. Buckets with
+    a complete listing index are summarised from the index instead. Each
+    bucket's summary is also sent as a log notification (with progress) as
+    soon as it is ready.
+    
+    Args:
+        bucket_names (List[str], optional): Buckets to summarise (all buckets if omitted)
+        timeout (float, optional): Seconds allowed per bucket (default 30)
+        max_concurrency (int, optional): Number of buckets listed concurrently (also capped by the tool's dispatch limit)
+        max_objects_per_bucket (int, optional): Stop counting a bucket after this many objects
+        use_index (bool, optional): Use the listing index for buckets it fully covers
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+        
+    Returns:
+        Dict[str, Any]: Per-bucket totals with completeness flags, and account-wide totals
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        
+        started_at = time.monotonic()
+        if bucket_names is None:
+            buckets = await dispatch.run_blocking("bucket_inventory", _list_buckets, cloud_profile, ['name'])
+            bucket_names = [bucket['name'] for bucket in buckets]
+        semaphore = asyncio.Semaphore(transfer.get_batch_concurrency(max_concurrency))
+        
+        async def _summarise(bucket_name):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(
+                        _run_bucket_call("bucket_inventory", bucket_name, _inventory_bucket, cloud_profile,
+                                         bucket_name, timeout, max_objects_per_bucket, use_index),
+                        timeout + INVENTORY_TIMEOUT_GRACE)
+                except asyncio.TimeoutError:
+                    return {'name': bucket_name, 'error': f"Timed out after {timeout}s", 'complete': False}
+                except Exception as e:
+                    return {'name': bucket_name, 'error': str(e), 'complete': False}
+        
+        results = []
+        for future in asyncio.as_completed([_summarise(name) for name in bucket_names]):
+            item = await future
+            results.append(item)
+            await _report_partial(ctx, len(results), len(bucket_names), item)
+        
+        results.sort(key=lambda item: item['name'])
+        summarised = [item for item in results if 'error' not in item]
         return {
-            "name": container.name,
-            "provider": cloud.provider,
-            "region": cloud.region,
-            "extra": container.extra
+            'buckets': results,
+            'count': len(results),
+            'complete': sum(1 for item in summarised if item['complete']),
+            'partial': sum(1 for item in summarised if not item['complete']),
+            'failed': len(results) - len(summarised),
+            'total_objects': sum(item['objects'] for item in summarised),
+            'total_size': sum(item['total_size'] for item in summarised),
+            'elapsed_seconds': round(time.monotonic() - started_at, 3)
         }
+        
+    except cloud.LibcloudError as e:
+        return {"error": f"Error building inventory: {str(e)}"}
     except Exception as e:
-        return {"error": f"Failed to get bucket details: {str(e)}"}    
+        return {"error": f"Unexpected error: {str(e)}"}
+
+async def _report_partial(ctx, done: int, total: int, item: Dict[str, Any]):
+    """Send one bucket's result to the client as progress and a log message, if it is listening"""
+    if ctx is None:
+        return
+    try:
+        await ctx.report_progress(done, total)
+        await ctx.info(json.dumps(item, default=str))
+    except Exception as e:
+        logger.debug(f"Could not send partial inventory result: {str(e)}")
+
+def _inventory_bucket(cloud_profile, bucket_name: str, timeout: float, max_objects: int,
+                      use_index: bool) -> Dict[str, Any]:
+    started_at = time.monotonic()
+    if use_index and index.is_enabled():
+        state = index.get_state(cloud_profile.name, bucket_name, '')
+        if state is not None and state['prefix'] == '' and state['complete']:
+            stats = index.aggregate(cloud_profile.name, bucket_name, top=0)
+            return {
+                'name': bucket_name,
+                'objects': stats['objects'],
+                'total_size': stats['total_size'],
+                'last_modified': stats['newest_modified'],
+                'complete': True,
+                'source': 'index',
+                'index': state,
+                'elapsed_seconds': round(time.monotonic() - started_at, 3)
+            }
+    
+    deadline = started_at + timeout
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, bucket_name)
+    count = 0
+    total_size = 0
+    last_modified = None
+    stopped = None
+    for obj in listing.iterate_objects(driver, container):
+        count += 1
+        total_size += obj.size or 0
+        modified = sync.remote_mtime(obj)
+        if modified is not None and (last_modified is None or modified > last_modified):
+            last_modified = modified
+        if max_objects and count >= max_objects:
+            stopped = 'max_objects'
+            break
+        if time.monotonic() > deadline:
+            stopped = 'timeout'
+            break
+    
+    result = {
+        'name': bucket_name,
+        'objects': count,
+        'total_size': total_size,
+        'last_modified': last_modified,
+        'complete': stopped is None,
+        'source': 'listing',
+        'elapsed_seconds': round(time.monotonic() - started_at, 3)
+    }
+    if stopped:
+        result['stopped'] = stopped
+    return result
 
-async def list_objects(bucket_name: str) -> List[Dict[str, Any]]:
+async def list_objects(bucket_name: str, page_size: int = listing.DEFAULT_PAGE_SIZE,
+                       continuation_token: str = None, fields: List[str] = None, compact: bool = False,
+                       profile: str = None) -> Dict[str, Any]:
     """
-    List all objects in a specific bucket.
+    List objects in a specific bucket, one page at a time.
     
     Args:
         bucket_name (str): Name of the bucket to list objects from
+        page_size (int, optional): Maximum number of objects to return (default 1000, max 10000)
+        continuation_token (str, optional): next_token from a previous call, to fetch the following page
+        fields (List[str], optional): Fields to return per object, from name, size, hash, last_modified, container and extra (default: name, size, hash, container, extra)
+        compact (bool, optional): Return each object as a list of values, in the order given by 'columns'
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
         
     Returns:
-        List[Dict[str, Any]]: List of objects in the bucket
+        Dict[str, Any]: Page of objects in the bucket and next_token (None on the last page)
     """
     try:
-        if not cloud.driver:
-            return [{"error": "Cloud driver not initialized"}]
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        fields = listing.parse_fields(fields, listing.OBJECT_FIELDS, listing.DEFAULT_OBJECT_FIELDS)
             
-        container = cloud.driver.get_container(bucket_name)
-        objects = container.list_objects()
-        
-        # Convert objects to dictionary format
-        return [{
-            'name': obj.name,
-            'size': obj.size,
-            'hash': obj.hash,
-            'container': obj.container.name,
-            'extra': obj.extra
-        } for obj in objects]
-        
-    except LibcloudError as e:
-        return [{"error": f"Error listing objects: {str(e)}"}]
+        return await _run_list_page("list_objects", cloud_profile, bucket_name, None, None, page_size,
+                                    continuation_token, fields, compact)
+        
+    except ValueError as e:
+        return {"error": str(e)}
+    except s3async.S3Error as e:
+        return {"error": f"Error listing objects: {str(e)}"}
+    except cloud.LibcloudError as e:
+        return {"error": f"Error listing objects: {str(e)}"}
     except Exception as e:
-        return [{"error": f"Unexpected error: {str(e)}"}]
+        return {"error": f"Unexpected error: {str(e)}"}
 
-async def list_all_objects(bucket_name: str, prefix: str = None, delimiter: str = None) -> List[Dict[str, Any]]:
+async def list_all_objects(bucket_name: str, prefix: str = None, delimiter: str = None,
+                           page_size: int = listing.DEFAULT_PAGE_SIZE,
+                           continuation_token: str = None, fields: List[str] = None, compact: bool = False,
+                           profile: str = None) -> Dict[str, Any]:
     """
-    List all objects in a bucket, including those in folders.
+    List objects in a bucket, including those in folders, one page at a time.
     
     Args:
         bucket_name (str): Name of the bucket to list objects from
         prefix (str, optional): Filter results to objects whose names begin with this prefix
         delimiter (str, optional): Group common prefixes into a single result
+        page_size (int, optional): Maximum number of entries to return (default 1000, max 10000)
+        continuation_token (str, optional): next_token from a previous call, to fetch the following page
+        fields (List[str], optional): Fields to return per entry, from name, type, size, hash, last_modified, container and extra (default: name, size, hash, container, extra, type)
+        compact (bool, optional): Return each entry as a list of values, in the order given by 'columns'
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
         
     Returns:
-        List[Dict[str, Any]]: List of objects and common prefixes in the bucket
+        Dict[str, Any]: Page of objects and common prefixes in the bucket and next_token (None on the last page)
     """
     try:
-        if not cloud.driver:
-            return [{"error": "Cloud driver not initialized"}]
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        fields = listing.parse_fields(fields, listing.ENTRY_FIELDS, listing.DEFAULT_OBJECT_FIELDS + ['type'])
             
-        container = cloud.driver.get_container(bucket_name)
-        
-        # Get objects with optional prefix and delimiter
-        objects = container.list_objects(prefix=prefix, delimiter=delimiter)
-        
-        # Process results
-        result = []
+        return await _run_list_page("list_all_objects", cloud_profile, bucket_name, prefix, delimiter, page_size,
+                                    continuation_token, fields, compact)
         
-        # Add objects
-        for obj in objects:
-            result.append({
-                'name': obj.name,
-                'size': obj.size,
-                'hash': obj.hash,
-                'container': obj.container.name,
-                'extra': obj.extra,
-                'type': 'object'
-            })
-            
-        # Add common prefixes (folders)
-        if hasattr(objects, 'prefixes') and objects.prefixes:
-            for prefix in objects.prefixes:
-                result.append({
-                    'name': prefix,
-                    'type': 'folder',
-                    'container': bucket_name
-                })
-                
-        return result
-        
-    except LibcloudError as e:
-        return [{"error": f"Error listing all objects: {str(e)}"}]
+    except ValueError as e:
+        return {"error": str(e)}
+    except s3async.S3Error as e:
+        return {"error": f"Error listing all objects: {str(e)}"}
+    except cloud.LibcloudError as e:
+        return {"error": f"Error listing all objects: {str(e)}"}
     except Exception as e:
-        return [{"error": f"Unexpected error: {str(e)}"}]
+        return {"error": f"Unexpected error: {str(e)}"}
+
+async def _run_list_page(tool_name: str, cloud_profile, bucket_name: str, prefix: str, delimiter: str,
+                         page_size: int, continuation_token: str, fields: List[str], compact: bool) -> Dict[str, Any]:
+    """Fetch one listing page with the profile's backend"""
+    args = (cloud_profile, bucket_name, prefix, delimiter, page_size, continuation_token, fields, compact)
+    client = _async_client(cloud_profile)
+    if client is not None:
+        return await dispatch.share(tool_name, _share_key(args), lambda: _list_page_async(client, *args))
+    return await _run_bucket_call(tool_name, bucket_name, _list_page, *args, shared=True)
 
-async def get_object(bucket_name: str, object_name: str) -> Dict[str, Any]:
+def _page_start(bucket_name: str, prefix: str, delimiter: str, continuation_token: str):
+    """Return the listing state, start marker and folder already returned for a page"""
+    state = {'bucket': bucket_name, 'prefix': prefix, 'delimiter': delimiter}
+    if not continuation_token:
+        return state, None, None
+    token_state = listing.decode_token(continuation_token)
+    if any(token_state.get(name) != value for name, value in state.items()):
+        raise ValueError("Continuation token does not match this listing")
+    return state, token_state.get('marker'), token_state.get('folder')
+
+def _list_page(cloud_profile, bucket_name: str, prefix: str, delimiter: str, page_size: int,
+               continuation_token: str, fields: List[str], compact: bool) -> Dict[str, Any]:
+    page_size = listing.clamp_page_size(page_size)
+    state, marker, skip_folder = _page_start(bucket_name, prefix, delimiter, continuation_token)
+    
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, bucket_name)
+    entries = listing.iterate_entries(driver, container, prefix=prefix, delimiter=delimiter,
+                                      marker=marker, skip_folder=skip_folder)
+    
+    # Read one entry past the page to find out whether another page exists
+    page = list(itertools.islice(entries, page_size + 1))
+    return _page_response(bucket_name, state, page, page_size, fields, compact)
+
+async def _list_page_async(client, cloud_profile, bucket_name: str, prefix: str, delimiter: str, page_size: int,
+                           continuation_token: str, fields: List[str], compact: bool) -> Dict[str, Any]:
+    page_size = listing.clamp_page_size(page_size)
+    state, marker, skip_folder = _page_start(bucket_name, prefix, delimiter, continuation_token)
+    
+    page = []
+    entries = client.iterate_entries(bucket_name, prefix=prefix, delimiter=delimiter, marker=marker,
+                                     skip_folder=skip_folder, page_size=min(page_size + 1, listing.DEFAULT_PAGE_SIZE))
+    try:
+        async for entry in entries:
+            page.append(entry)
+            if len(page) > page_size:
+                break
+    finally:
+        await entries.aclose()
+    return _page_response(bucket_name, state, page, page_size, fields, compact)
+
+def _page_response(bucket_name: str, state: Dict[str, Any], page: List[Dict[str, Any]], page_size: int,
+                   fields: List[str], compact: bool) -> Dict[str, Any]:
+    """Build a listing response from up to page_size + 1 entries"""
+    is_truncated = len(page) > page_size
+    page = page[:page_size]
+    
+    result = listing.project(page, fields, listing.ENTRY_FIELDS, compact)
+    
+    next_token = None
+    if is_truncated:
+        last = page[-1]
+        if last['type'] == 'folder':
+            next_state = dict(state, marker=last['name'], folder=last['name'])
+        else:
+            next_state = dict(state, marker=last['object'].name)
+        next_token = listing.encode_token(next_state)
+    
+    response = {
+        'bucket_name': bucket_name,
+        'objects': result,
+        'count': len(result),
+        'is_truncated': is_truncated,
+        'next_token': next_token
+    }
+    if compact:
+        response['columns'] = fields
+    return response
+
+async def get_object(bucket_name: str, object_name: str, revalidate: bool = False,
+                     profile: str = None) -> Dict[str, Any]:
     """
     Get details about a specific object in a bucket.
     
     Args:
         bucket_name (str): Name of the bucket containing the object
         object_name (str): Name of the object to retrieve
+        revalidate (bool, optional): Bypass the metadata cache and check the cached hash/ETag against the provider
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
         
     Returns:
         Dict[str, Any]: Object details
     """
     try:
-        if not cloud.driver:
-            return {"error": "Cloud driver not initialized"}
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        
+        key = _object_key(cloud_profile, bucket_name, object_name)
+        cached = MISSING if revalidate else await _cache_call(object_cache.get, key)
+        if cached is not MISSING:
+            return dict(cached, extra=dict(cached['extra']))
             
-        container = cloud.driver.get_container(bucket_name)
-        obj = container.get_object(object_name)
+        client = _async_client(cloud_profile)
+        if client is not None:
+            result = await dispatch.share("get_object", _share_key((cloud_profile, bucket_name, object_name)),
+                                          lambda: _get_object_async(client, cloud_profile, bucket_name, object_name))
+        else:
+            result = await _run_bucket_call("get_object", bucket_name, _get_object, cloud_profile, bucket_name,
+                                            object_name, shared=True)
         
-        return {
-            'name': obj.name,
-            'size': obj.size,
-            'hash': obj.hash,
-            'container': obj.container.name,
-            'extra': obj.extra,
-            'driver': cloud.provider
-        }
+        if revalidate:
+            previous = await _cache_call(object_cache.peek, key)
+            if previous is not MISSING:
+                outcome = 'unchanged' if previous['hash'] == result['hash'] else 'changed'
+                with _revalidation_lock:
+                    revalidation_stats[outcome] += 1
+        await _cache_call(object_cache.set, key, result)
+        return dict(result, extra=dict(result['extra']))
         
-    except LibcloudError as e:
+    except (cloud.LibcloudError, s3async.S3Error) as e:
         return {"error": f"Error getting object: {str(e)}"}
     except Exception as e:
         return {"error": f"Unexpected error: {str(e)}"}
 
-async def download_object(bucket_name: str, object_name: str, destination_path: str) -> Dict[str, Any]:
+def _get_object(cloud_profile, bucket_name: str, object_name: str) -> Dict[str, Any]:
+    container = _get_container(cloud_profile, cloud_profile.get_thread_driver(), bucket_name)
+    return _object_details(cloud_profile, container.get_object(object_name))
+
+async def _get_object_async(client, cloud_profile, bucket_name: str, object_name: str) -> Dict[str, Any]:
+    return _object_details(cloud_profile, await client.head_object(bucket_name, object_name))
+
+def _object_details(cloud_profile, obj) -> Dict[str, Any]:
+    return {
+        'name': obj.name,
+        'size': obj.size,
+        'hash': obj.hash,
+        'container': obj.container.name,
+        'extra': obj.extra,
+        'driver': cloud_profile.provider
+    }
+
+async def read_object(bucket_name: str, object_name: str, offset: int = 0, length: int = None,
+                      encoding: str = content.DEFAULT_ENCODING, profile: str = None) -> Dict[str, Any]:
+    """
+    Read part of an object's content without downloading it to disk.
+
+    At most READ_MAX_BYTES are returned per call; pass next_offset back as
+    offset to read the following page. Binary content is returned base64-encoded.
+
+    Args:
+        bucket_name (str): Name of the bucket containing the object
+        object_name (str): Name of the object to read
+        offset (int, optional): First byte to read (negative values count from the end of the object)
+        length (int, optional): Number of bytes to read, capped at READ_MAX_BYTES (the cap if omitted)
+        encoding (str, optional): Text encoding of the object, or 'base64' for raw bytes
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+
+    Returns:
+        Dict[str, Any]: Content page with its byte range, encoding and next_offset (None at the end of the object)
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        if encoding and encoding != content.BASE64_ENCODING:
+            try:
+                codecs.lookup(encoding)
+            except LookupError:
+                return {"error": f"Unknown encoding: {encoding}"}
+
+        client = _async_client(cloud_profile)
+        if client is not None:
+            return await _read_object_async(client, cloud_profile, bucket_name, object_name, offset, length, encoding)
+        return await _run_bucket_call("read_object", bucket_name, _read_object, cloud_profile, bucket_name,
+                                      object_name, offset, length, encoding)
+
+    except (cloud.LibcloudError, s3async.S3Error) as e:
+        return {"error": f"Error reading object: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def _object_size(cloud_profile, bucket_name: str, object_name: str) -> int:
+    """Return an object's size, from the metadata cache where possible"""
+    key = _object_key(cloud_profile, bucket_name, object_name)
+    cached = object_cache.get(key)
+    if cached is MISSING:
+        cached = _get_object(cloud_profile, bucket_name, object_name)
+        object_cache.set(key, cached)
+    return cached['size'] or 0
+
+def _read_object(cloud_profile, bucket_name: str, object_name: str, offset: int, length: int,
+                 encoding: str) -> Dict[str, Any]:
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, bucket_name)
+
+    # Ranges must lie within the object, so its size is needed up front
+    size = _object_size(cloud_profile, bucket_name, object_name)
+    offset, wanted, capped = _read_window(size, offset, length)
+    data = content.read_range(driver, _object_stub(container, object_name), offset, capped)
+    return _read_response(bucket_name, object_name, size, offset, data, wanted, capped, encoding)
+
+async def _cached_size_async(client, cloud_profile, bucket_name: str, object_name: str) -> int:
+    """Return an object's size, from the metadata cache where possible"""
+    key = _object_key(cloud_profile, bucket_name, object_name)
+    cached = await _cache_call(object_cache.get, key)
+    if cached is MISSING:
+        cached = await _get_object_async(client, cloud_profile, bucket_name, object_name)
+        await _cache_call(object_cache.set, key, cached)
+    return cached['size'] or 0
+
+async def _read_object_async(client, cloud_profile, bucket_name: str, object_name: str, offset: int, length: int,
+                             encoding: str) -> Dict[str, Any]:
+    size = await _cached_size_async(client, cloud_profile, bucket_name, object_name)
+    offset, wanted, capped = _read_window(size, offset, length)
+    data = bytearray()
+    if capped:
+        async for chunk in client.iterate_object(bucket_name, object_name, offset, offset + capped):
+            data += chunk
+    return _read_response(bucket_name, object_name, size, offset, bytes(data), wanted, capped, encoding)
+
+def _read_window(size: int, offset: int, length: int):
+    """Resolve a requested read against the object size, returning (offset, wanted, capped) byte counts"""
+    offset = offset or 0
+    if offset < 0:
+        offset = max(0, size + offset)
+    offset = min(offset, size)
+    wanted = size - offset if length is None or length < 0 else min(length, size - offset)
+    return offset, wanted, content.clamp_length(wanted)
+
+def _read_response(bucket_name: str, object_name: str, size: int, offset: int, data: bytes, wanted: int,
+                   capped: int, encoding: str) -> Dict[str, Any]:
+    end = offset + len(data)
+    text, used_encoding, consumed = content.decode(data, encoding, final=end >= size)
+    end = offset + consumed
+
+    return {
+        'bucket_name': bucket_name,
+        'object_name': object_name,
+        'object_size': size,
+        'offset': offset,
+        'bytes': consumed,
+        'encoding': used_encoding,
+        'content': text,
+        'truncated': capped < wanted,
+        'eof': end >= size,
+        'next_offset': end if end < size else None
+    }
+
+async def preview_object(bucket_name: str, object_name: str, format: str = None, member: str = None,
+                         max_rows: int = preview.DEFAULT_PREVIEW_ROWS, delimiter: str = None,
+                         encoding: str = content.DEFAULT_ENCODING, profile: str = None) -> Dict[str, Any]:
+    """
+    Preview the structure or first rows of an object with ranged reads instead of a download.
+
+    Parquet files are described from their footer (schema, row count and row
+    groups). CSV, JSON Lines and text objects return their first rows or
+    lines, also when gzip-compressed. Zip and tar archives list their first
+    members; pass member to preview a CSV, JSON Lines or text file inside one.
+
+    Args:
+        bucket_name (str): Name of the bucket containing the object
+        object_name (str): Name of the object to preview
+        format (str, optional): zip, tar, parquet, csv, jsonl or text (guessed from the name and first bytes if omitted)
+        member (str, optional): Name of an archive member to preview instead of the archive
+        max_rows (int, optional): Maximum rows, lines or members returned (default 20, at most 1000)
+        delimiter (str, optional): CSV field delimiter (tab for .tsv names, otherwise a comma)
+        encoding (str, optional): Text encoding of CSV, JSON Lines and text content
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+
+    Returns:
+        Dict[str, Any]: Format, compression and the preview, with the bytes and requests it took
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        if format is not None and format not in preview.FORMATS:
+            return {"error": f"Unknown format: {format} (expected one of {', '.join(preview.FORMATS)})"}
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            return {"error": f"Unknown encoding: {encoding}"}
+
+        return await _run_bucket_call("preview_object", bucket_name, _preview_object, cloud_profile, bucket_name,
+                                      object_name, format, member, max_rows, delimiter, encoding, shared=True)
+
+    except ValueError as e:
+        return {"error": f"Cannot preview {object_name}: {str(e)}"}
+    except cloud.LibcloudError as e:
+        return {"error": f"Error previewing object: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def _open_range_file(cloud_profile, bucket_name: str, object_name: str) -> preview.RangeFile:
+    """Return a seekable file over an object that fetches only the byte ranges that are read"""
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, bucket_name)
+    obj = _object_stub(container, object_name)
+    size = _object_size(cloud_profile, bucket_name, object_name)
+    return preview.RangeFile(lambda offset, length: content.read_range(driver, obj, offset, length), size)
+
+def _detect_format(file: preview.RangeFile, name: str, fmt: str = None):
+    """Resolve the format and compression of an object, sniffing its first bytes if the name is not enough"""
+    def _sniff():
+        file.seek(0)
+        return file.read(content.SNIFF_BYTES)
+
+    detected, compression = preview.detect_format(name, None if fmt else _sniff)
+    return fmt or detected, compression
+
+def _archive_format(file: preview.RangeFile, object_name: str):
+    fmt, compression = _detect_format(file, object_name)
+    if fmt not in preview.ARCHIVE_FORMATS:
+        raise ValueError("not a zip or tar archive")
+    return fmt, compression
+
+def _preview_rows(stream, name: str, fmt: str, compression: str, max_rows: int, delimiter: str,
+                  encoding: str) -> Dict[str, Any]:
+    with preview.decompressed(stream, compression) as data:
+        return preview.preview_rows(data, fmt, max_rows, encoding, delimiter or preview.default_delimiter(name))
+
+def _preview_object(cloud_profile, bucket_name: str, object_name: str, fmt: str, member: str, max_rows: int,
+                    delimiter: str, encoding: str) -> Dict[str, Any]:
+    file = _open_range_file(cloud_profile, bucket_name, object_name)
+    response = {'bucket_name': bucket_name, 'object_name': object_name, 'object_size': file.size}
+    if member:
+        archive_format, archive_compression = _archive_format(file, object_name)
+        fmt, compression = (fmt, None) if fmt else preview.detect_format(member)
+        if fmt not in preview.ROW_FORMATS:
+            raise ValueError(f"only CSV, JSON Lines and text members can be previewed; "
+                             f"use extract_archive_member for {member}")
+        with preview.open_member(file, archive_format, archive_compression, member) as stream:
+            result = _preview_rows(stream, member, fmt, compression, max_rows, delimiter, encoding)
+        response['member'] = member
+    else:
+        fmt, compression = _detect_format(file, object_name, fmt)
+        if fmt in preview.ARCHIVE_FORMATS:
+            result = preview.list_members(file, fmt, compression, max_members=max_rows)
+        elif fmt == preview.FORMAT_PARQUET:
+            result = preview.preview_parquet(file)
+        else:
+            file.seek(0)
+            result = _preview_rows(file, object_name, fmt, compression, max_rows, delimiter, encoding)
+
+    response.update(format=fmt, compression=compression)
+    response.update(result)
+    response.update(bytes=file.bytes_fetched, requests=file.requests)
+    return response
+
+async def list_archive_members(bucket_name: str, object_name: str, prefix: str = '', offset: int = 0,
+                               max_members: int = preview.DEFAULT_ARCHIVE_MEMBERS,
+                               profile: str = None) -> Dict[str, Any]:
+    """
+    List the members of a zip or tar archive in a bucket without downloading it.
+
+    Zip archives are listed from their central directory with a few ranged
+    reads at the end of the object; uncompressed tar archives are listed by
+    reading only their member headers. Gzipped tarballs have no index and are
+    decompressed up to the last member listed.
+
+    Args:
+        bucket_name (str): Name of the bucket containing the archive
+        object_name (str): Name of the archive object
+        prefix (str, optional): Only list members whose names start with this prefix
+        offset (int, optional): Number of members to skip (pass next_offset to get the next page)
+        max_members (int, optional): Maximum members to return (default 1000, at most 10000)
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+
+    Returns:
+        Dict[str, Any]: Member names, types, sizes and times, next_offset, and the bytes and requests it took
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+
+        return await _run_bucket_call("list_archive_members", bucket_name, _list_archive_members, cloud_profile,
+                                      bucket_name, object_name, prefix or None, offset, max_members, shared=True)
+
+    except ValueError as e:
+        return {"error": f"Cannot list {object_name}: {str(e)}"}
+    except cloud.LibcloudError as e:
+        return {"error": f"Error listing archive members: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def _list_archive_members(cloud_profile, bucket_name: str, object_name: str, prefix: str, offset: int,
+                          max_members: int) -> Dict[str, Any]:
+    file = _open_range_file(cloud_profile, bucket_name, object_name)
+    fmt, compression = _archive_format(file, object_name)
+    result = preview.list_members(file, fmt, compression, prefix, offset, max_members)
+    return dict({
+        'bucket_name': bucket_name,
+        'object_name': object_name,
+        'object_size': file.size,
+        'format': fmt,
+        'compression': compression
+    }, **result, bytes=file.bytes_fetched, requests=file.requests)
+
+async def extract_archive_member(bucket_name: str, object_name: str, member: str, destination_path: str,
+                                 profile: str = None) -> Dict[str, Any]:
+    """
+    Extract a single member of a zip or tar archive in a bucket to a local file.
+
+    Only the archive's index and the member's own data are fetched. Zip
+    members are checked against their CRC.
+
+    Args:
+        bucket_name (str): Name of the bucket containing the archive
+        object_name (str): Name of the archive object
+        member (str): Name of the member to extract, as returned by list_archive_members
+        destination_path (str): Local path where the member should be saved
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+
+    Returns:
+        Dict[str, Any]: Status, destination and member size, with the bytes and requests it took
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+
+        return await _run_bucket_call("extract_archive_member", bucket_name, _extract_archive_member,
+                                      cloud_profile, bucket_name, object_name, member, destination_path)
+
+    except ValueError as e:
+        return {"error": f"Cannot extract {member} from {object_name}: {str(e)}"}
+    except cloud.LibcloudError as e:
+        return {"error": f"Error extracting archive member: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def _extract_archive_member(cloud_profile, bucket_name: str, object_name: str, member: str,
+                            destination_path: str) -> Dict[str, Any]:
+    os.makedirs(os.path.dirname(os.path.abspath(destination_path)), exist_ok=True)
+    file = _open_range_file(cloud_profile, bucket_name, object_name)
+    fmt, compression = _archive_format(file, object_name)
+    with preview.open_member(file, fmt, compression, member) as stream:
+        size = _stream_to_file(iter(lambda: stream.read(preview.CHUNK_SIZE), b''), destination_path)
+    return {
+        'status': 'success',
+        'message': f'Member {member} extracted from {object_name}',
+        'destination': destination_path,
+        'size': size,
+        'member': member,
+        'object_name': object_name,
+        'bucket_name': bucket_name,
+        'bytes': file.bytes_fetched,
+        'requests': file.requests
+    }
+
+async def download_object(bucket_name: str, object_name: str, destination_path: str,
+                          fresh_metadata: bool = False, parallel: bool = None,
+                          part_size: int = None, max_concurrency: int = None,
+                          verify_hash: bool = True, decompress: bool = True,
+                          profile: str = None) -> Dict[str, Any]:
     """
     Download an object from a bucket to a local file.
     
+    Large objects are fetched as concurrent byte ranges, and an interrupted
+    ranged download of the same destination is resumed. When the download
+    cache is enabled, an unchanged object (same ETag) is served from disk.
+    Objects that upload_object compressed are decompressed after download.
+    
     Args:
         bucket_name (str): Name of the bucket containing the object
         object_name (str): Name of the object to download
         destination_path (str): Local path where the object should be saved
+        fresh_metadata (bool, optional): Fetch object metadata before downloading and verify the size
+        parallel (bool, optional): Force (True) or disable (False) ranged downloads; by default objects of at
+            least TRANSFER_MULTIPART_THRESHOLD bytes are ranged, after a metadata request unless their size is cached
+        part_size (int, optional): Bytes per ranged GET (minimum 5 MiB)
+        max_concurrency (int, optional): Number of ranges fetched concurrently
+        verify_hash (bool, optional): Verify ranged downloads against the object's MD5 ETag where available
+        decompress (bool, optional): Decompress objects stored compressed by upload_object (False keeps them as stored)
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
         
     Returns:
         Dict[str, Any]: Download result
     """
     try:
-        if not cloud.driver:
-            return {"error": "Cloud driver not initialized"}
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
             
-        # Ensure the destination directory exists
-        os.makedirs(os.path.dirname(os.path.abspath(destination_path)), exist_ok=True)
-            
-        container = cloud.driver.get_container(bucket_name)
-        obj = container.get_object(object_name)
+        # Ranged and resumed downloads and the download cache use the libcloud path
+        client = _async_client(cloud_profile)
+        if (client is not None and not parallel and filecache.get_cache() is None
+                and not transfer.has_resume_state(destination_path)
+                and (parallel is False or await _cached_size_async(client, cloud_profile, bucket_name, object_name)
+                     < transfer.get_multipart_threshold())):
+            return await _download_object_async(client, bucket_name, object_name, destination_path, fresh_metadata,
+                                                decompress)
+        return await _run_bucket_call("download_object", bucket_name, _download_object, cloud_profile, bucket_name, object_name,
+                                      destination_path, fresh_metadata, parallel, part_size, max_concurrency,
+                                      verify_hash, decompress)
         
-        # Download the object
-        result = container.download_object(obj, destination_path, overwrite_existing=True)
-        
-        if result:
-            return {
-                'status': 'success',
-                'message': f'Object {object_name} downloaded successfully',
-                'destination': destination_path,
-                'size': obj.size,
-                'object_name': object_name,
-                'bucket_name': bucket_name
-            }
-        else:
-            return {"error": f"Failed to download object {object_name}"} 
-        
-    except LibcloudError as e:
+    except (cloud.LibcloudError, s3async.S3Error) as e:
         return {"error": f"Error downloading object: {str(e)}"}
     except Exception as e:
         return {"error": f"Unexpected error: {str(e)}"}
 
-async def upload_object(bucket_name: str, object_name: str, file_path: str) -> Dict[str, Any]:
+def _download_object(cloud_profile, bucket_name: str, object_name: str, destination_path: str,
+                     fresh_metadata: bool = False, parallel: bool = None,
+                     part_size: int = None, max_concurrency: int = None,
+                     verify_hash: bool = True, decompress: bool = True) -> Dict[str, Any]:
+    # Ensure the destination directory exists
+    os.makedirs(os.path.dirname(os.path.abspath(destination_path)), exist_ok=True)
+        
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, bucket_name)
+    threshold = transfer.get_multipart_threshold()
+    
+    # Ranged downloads need the object size; the metadata request is only
+    # skipped when the cached size shows the object is small
+    force_ranged = False
+    maybe_ranged = False
+    if parallel is not False and transfer.supports_ranges(driver):
+        force_ranged = bool(parallel) or transfer.has_resume_state(destination_path)
+        cached = object_cache.peek(_object_key(cloud_profile, bucket_name, object_name))
+        maybe_ranged = force_ranged or fresh_metadata or cached is MISSING or (cached['size'] or 0) >= threshold
+    
+    # The download cache is keyed on the ETag, so it needs fresh metadata too
+    downloads = filecache.get_cache()
+    stats = {}
+    if maybe_ranged or fresh_metadata or downloads is not None:
+        obj = container.get_object(object_name)
+        cache_key = None
+        if downloads is not None and obj.hash:
+            cache_key = filecache.make_key(cloud_profile.name, bucket_name, object_name, obj.hash)
+            served_by = downloads.fetch(cache_key, destination_path)
+            if served_by:
+                # The cache holds objects as stored, so hits are decompressed like downloads
+                result = {
+                    'status': 'success',
+                    'message': f'Object {object_name} served from the download cache',
+                    'destination': destination_path,
+                    'size': obj.size,
+                    'object_name': object_name,
+                    'bucket_name': bucket_name,
+                    'cache': 'hit',
+                    'served_by': served_by
+                }
+                return _decompress_download(result, destination_path, lambda: obj.meta_data) if decompress else result
+        if maybe_ranged and (force_ranged or obj.size >= threshold):
+            stats = transfer.download_file(obj, destination_path, part_size=part_size,
+                                           max_concurrency=max_concurrency, verify_hash=verify_hash,
+                                           profile=cloud_profile.name)
+            result = True
+        else:
+            # libcloud writes the destination in place; never write through a hardlinked cache file
+            filecache.detach(destination_path)
+            result = container.download_object(obj, destination_path, overwrite_existing=True)
+        size = obj.size
+        if result and cache_key is not None:
+            downloads.store(cache_key, destination_path)
+            stats['cache'] = 'miss'
+        meta_data = lambda: obj.meta_data
+    else:
+        # Skip the metadata request and stream the object body straight to disk
+        obj = _object_stub(container, object_name)
+        size = _stream_to_file(driver.download_object_as_stream(obj), destination_path)
+        result = True
+        meta_data = lambda: container.get_object(object_name).meta_data
+    
+    if result:
+        result = dict({
+            'status': 'success',
+            'message': f'Object {object_name} downloaded successfully',
+            'destination': destination_path,
+            'size': size,
+            'object_name': object_name,
+            'bucket_name': bucket_name
+        }, **stats)
+        return _decompress_download(result, destination_path, meta_data) if decompress else result
+    else:
+        return {"error": f"Failed to download object {object_name}"} 
+
+async def _download_object_async(client, bucket_name: str, object_name: str, destination_path: str,
+                                 fresh_metadata: bool, decompress: bool) -> Dict[str, Any]:
+    os.makedirs(os.path.dirname(os.path.abspath(destination_path)), exist_ok=True)
+    head = await client.head_object(bucket_name, object_name) if fresh_metadata else None
+    size = await client.download_file(bucket_name, object_name, destination_path)
+    if head is not None and size != head.size:
+        return {"error": f"Downloaded {size} bytes of {object_name} but expected {head.size}"}
+    result = {
+        'status': 'success',
+        'message': f'Object {object_name} downloaded successfully',
+        'destination': destination_path,
+        'size': size,
+        'object_name': object_name,
+        'bucket_name': bucket_name
+    }
+    sniffed = await asyncio.to_thread(compress.sniff_file, destination_path) if decompress else None
+    if sniffed is not None:
+        head = head or await client.head_object(bucket_name, object_name)
+        if compress.from_metadata(head.meta_data) == sniffed:
+            result.update(stored_size=size, decompressed=sniffed,
+                          size=await asyncio.to_thread(compress.decompress_file, destination_path, sniffed))
+    return result
+
+def _decompress_download(result: Dict[str, Any], destination_path: str, meta_data) -> Dict[str, Any]:
+    """
+    Decompress a downloaded object in place if upload_object stored it compressed.
+
+    meta_data returns the object's user metadata and may cost a request, so
+    it is only called for files that start with a compression magic number.
+    """
+    sniffed = compress.sniff_file(destination_path)
+    if sniffed is None or compress.from_metadata(meta_data()) != sniffed:
+        return result
+    result['stored_size'] = result['size']
+    result['size'] = compress.decompress_file(destination_path, sniffed)
+    result['decompressed'] = sniffed
+    return result
+
+def _stream_to_file(stream, destination_path: str) -> int:
+    """Write a byte stream to destination_path via a temporary file, returning the bytes written"""
+    temp_path = f'{destination_path}.part'
+    size = 0
+    try:
+        with open(temp_path, 'wb') as f:
+            for chunk in stream:
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(temp_path, destination_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return size
+
+async def upload_object(bucket_name: str, object_name: str, file_path: str = None,
+                        part_size: int = None, max_concurrency: int = None, data: str = None,
+                        encoding: str = content.DEFAULT_ENCODING, compression: str = None,
+                        profile: str = None) -> Dict[str, Any]:
     """
-    Upload a local file to a bucket as an object.
+    Upload a local file, or content passed directly, to a bucket as an object.
+    
+    Large files are uploaded as parallel multipart uploads where the provider
+    supports it. Content passed as data is streamed from memory without a
+    temporary file. With compression, the object is compressed on the fly and
+    marked in its metadata so that download_object decompresses it again;
+    uploads of data or with compression report a SHA-256 computed in the
+    same pass.
     
     Args:
         bucket_name (str): Name of the bucket to upload to
         object_name (str): Name to give the uploaded object
-        file_path (str): Local path of the file to upload
+        file_path (str, optional): Local path of the file to upload
+        part_size (int, optional): Bytes per multipart part (minimum 5 MiB)
+        max_concurrency (int, optional): Number of parts uploaded concurrently
+        data (str, optional): Content to upload instead of a file
+        encoding (str, optional): Text encoding of data, or 'base64' for binary content
+        compression (str, optional): Store the object compressed with 'gzip' or 'zstd'
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
         
     Returns:
         Dict[str, Any]: Upload result
     """
     try:
-        if not cloud.driver:
-            return {"error": "Cloud driver not initialized"}
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        if (file_path is None) == (data is None):
+            return {"error": "Exactly one of file_path or data is required"}
+        try:
+            compress.check(compression)
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        client = _async_client(cloud_profile)
+        if data is not None:
+            try:
+                payload = (base64.b64decode(data, validate=True) if encoding == content.BASE64_ENCODING
+                           else data.encode(encoding))
+            except binascii.Error as e:
+                return {"error": f"Invalid base64 data: {str(e)}"}
+            except LookupError:
+                return {"error": f"Unknown encoding: {encoding}"}
+            if client is not None:
+                return await _upload_data_async(client, cloud_profile, bucket_name, object_name, payload, compression)
+            return await _run_bucket_call("upload_object", bucket_name, _upload_stream, cloud_profile, bucket_name,
+                                          object_name, compress.iter_chunks(payload), compression)
             
         # Check if file exists
         if not os.path.exists(file_path):
             return {"error": f"File not found: {file_path}"}
+        if compression:
+            return await _run_bucket_call("upload_object", bucket_name, _upload_file_compressed, cloud_profile,
+                                          bucket_name, object_name, file_path, compression)
             
-        container = cloud.driver.get_container(bucket_name)
-        
-        # Upload the file
-        with open(file_path, 'rb') as file_obj:
-            obj = container.upload_object_via_stream(iterator=file_obj, object_name=object_name)
-        
-        return {
-            'status': 'success',
-            'message': f'Object {object_name} uploaded successfully',
-            'name': obj.name,
-            'size': obj.size,
-            'hash': obj.hash,
-            'container': obj.container.name
-        }
+        # Multipart uploads use the libcloud path
+        threshold = transfer.get_multipart_threshold()
+        if client is not None and os.path.getsize(file_path) < max(threshold, transfer.get_part_size(part_size)):
+            return await _upload_object_async(client, cloud_profile, bucket_name, object_name, file_path)
+        return await _run_bucket_call("upload_object", bucket_name, _upload_object, cloud_profile, bucket_name, object_name, file_path,
+                                      part_size, max_concurrency)
         
-    except LibcloudError as e:
+    except (cloud.LibcloudError, s3async.S3Error) as e:
         return {"error": f"Error uploading object: {str(e)}"}
     except Exception as e:
         return {"error": f"Unexpected error: {str(e)}"}
 
-async def delete_object(bucket_name: str, object_name: str) -> Dict[str, Any]:
+def _upload_object(cloud_profile, bucket_name: str, object_name: str, file_path: str,
+                   part_size: int = None, max_concurrency: int = None) -> Dict[str, Any]:
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, bucket_name)
+    
+    # Upload the file
+    result = transfer.upload_file(driver, container, object_name, file_path,
+                                  part_size=part_size, max_concurrency=max_concurrency,
+                                  profile=cloud_profile.name)
+    invalidate_object(cloud_profile, bucket_name, object_name)
+    index.record_object(cloud_profile.name, bucket_name, object_name, result.get('size'))
+    
+    return dict({
+        'status': 'success',
+        'message': f'Object {object_name} uploaded successfully'
+    }, **result)
+
+def _upload_stream(cloud_profile, bucket_name: str, object_name: str, chunks, compression: str) -> Dict[str, Any]:
+    """Upload chunks through upload_object_via_stream, compressing and checksumming them on the way"""
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, bucket_name)
+    started_at = time.monotonic()
+    stream = compress.EncodedStream(chunks, compression)
+    extra = {'meta_data': compress.metadata(compression)} if compression else None
+    # libcloud only accepts bytes chunks, so views of in-memory content are copied one chunk at a time
+    obj = container.upload_object_via_stream(iterator=(bytes(chunk) for chunk in stream), object_name=object_name,
+                                             extra=extra)
+    elapsed = time.monotonic() - started_at
+    invalidate_object(cloud_profile, bucket_name, object_name)
+    index.record_object(cloud_profile.name, bucket_name, object_name, stream.stored_size)
+    return dict({
+        'status': 'success',
+        'message': f'Object {object_name} uploaded successfully',
+        'name': obj.name,
+        'size': stream.stored_size,
+        'hash': obj.hash,
+        'container': obj.container.name,
+        'mode': 'stream',
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_bytes_per_sec': int(stream.size / elapsed) if elapsed > 0 else None
+    }, **stream.summary(obj.hash if cloud.is_s3_driver(driver) else None))
+
+def _upload_file_compressed(cloud_profile, bucket_name: str, object_name: str, file_path: str,
+                            compression: str) -> Dict[str, Any]:
+    with open(file_path, 'rb') as f:
+        return _upload_stream(cloud_profile, bucket_name, object_name,
+                              iter(lambda: f.read(compress.CHUNK_SIZE), b''), compression)
+
+async def _upload_data_async(client, cloud_profile, bucket_name: str, object_name: str, payload: bytes,
+                             compression: str) -> Dict[str, Any]:
+    started_at = time.monotonic()
+    stream = compress.EncodedStream(compress.iter_chunks(payload), compression)
+    # A signed PUT needs the whole body up front; uncompressed chunks are views of the payload
+    chunks = await asyncio.to_thread(list, stream)
+    body = b''.join(chunks) if compression else payload
+    result = await client.upload_bytes(bucket_name, object_name, body, mimetypes.guess_type(object_name)[0],
+                                       compress.metadata(compression))
+    await _cache_call(invalidate_object, cloud_profile, bucket_name, object_name)
+    index.record_object(cloud_profile.name, bucket_name, object_name, result['size'], result['hash'])
+    elapsed = time.monotonic() - started_at
+    return dict({
+        'status': 'success',
+        'message': f'Object {object_name} uploaded successfully',
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_bytes_per_sec': int(stream.size / elapsed) if elapsed > 0 else None
+    }, **result, **stream.summary(result['hash']))
+
+async def _upload_object_async(client, cloud_profile, bucket_name: str, object_name: str,
+                               file_path: str) -> Dict[str, Any]:
+    started_at = time.monotonic()
+    result = await client.upload_file(bucket_name, object_name, file_path, mimetypes.guess_type(object_name)[0])
+    await _cache_call(invalidate_object, cloud_profile, bucket_name, object_name)
+    index.record_object(cloud_profile.name, bucket_name, object_name, result['size'], result['hash'])
+    elapsed = time.monotonic() - started_at
+    return dict({
+        'status': 'success',
+        'message': f'Object {object_name} uploaded successfully',
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_bytes_per_sec': int(result['size'] / elapsed) if elapsed > 0 else None
+    }, **result)
+
+async def delete_object(bucket_name: str, object_name: str, profile: str = None) -> Dict[str, Any]:
     """
     Delete an object from a bucket.
     
+    The object is not looked up first, so deletes are idempotent on providers
+    such as S3 that accept deleting a missing key; providers that reject it
+    return an error.
+    
     Args:
         bucket_name (str): Name of the bucket containing the object
         object_name (str): Name of the object to delete
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
         
     Returns:
         Dict[str, Any]: Deletion result
     """
     try:
-        if not cloud.driver:
-            return {"error": "Cloud driver not initialized"}
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
             
-        container = cloud.driver.get_container(bucket_name)
-        obj = container.get_object(object_name)
-        
-        # Delete the object
-        result = container.delete_object(obj)
-        
-        if result:
+        client = _async_client(cloud_profile)
+        if client is not None:
+            await client.delete_object(bucket_name, object_name)
+            await _cache_call(invalidate_object, cloud_profile, bucket_name, object_name)
+            index.remove_object(cloud_profile.name, bucket_name, object_name)
             return {
                 'status': 'success',
                 'message': f'Object {object_name} deleted successfully',
                 'object_name': object_name,
                 'bucket_name': bucket_name
             }
-        else:
-            return {"error": f"Failed to delete object {object_name}"}
+        return await _run_bucket_call("delete_object", bucket_name, _delete_object, cloud_profile, bucket_name, object_name)
         
-    except LibcloudError as e:
+    except (cloud.LibcloudError, s3async.S3Error) as e:
         return {"error": f"Error deleting object: {str(e)}"}
     except Exception as e:
         return {"error": f"Unexpected error: {str(e)}"}
 
+def _delete_object(cloud_profile, bucket_name: str, object_name: str) -> Dict[str, Any]:
+    container = _get_container(cloud_profile, cloud_profile.get_thread_driver(), bucket_name)
+    
+    # Deleting only needs the object name, so skip the metadata request
+    obj = _object_stub(container, object_name)
+    result = container.delete_object(obj)
+    invalidate_object(cloud_profile, bucket_name, object_name)
+    index.remove_object(cloud_profile.name, bucket_name, object_name)
+    
+    if result:
+        return {
+            'status': 'success',
+            'message': f'Object {object_name} deleted successfully',
+            'object_name': object_name,
+            'bucket_name': bucket_name
+        }
+    else:
+        return {"error": f"Failed to delete object {object_name}"}
+
+def _chunked(iterable, size: int):
+    """Yield lists of up to size consecutive items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _forget_objects(cloud_profile, bucket_name: str, object_names: List[str]):
+    """Drop deleted objects from the metadata cache and the listing index"""
+    for object_name in object_names:
+        invalidate_object(cloud_profile, bucket_name, object_name)
+    index.remove_objects(cloud_profile.name, bucket_name, object_names)
+
+def _bulk_recorder(counts: Dict[str, int], succeeded: str):
+    """
+    Return a callback that counts per-object results and keeps a bounded sample.
+
+    Failures are kept first; the sample is returned by the callback's items().
+    """
+    failures = []
+    done = []
+    
+    def _record(item):
+        if 'error' in item:
+            counts['failed'] += 1
+            if len(failures) < MAX_SYNC_REPORT_ITEMS:
+                failures.append(item)
+            return
+        counts[succeeded] += 1
+        counts['bytes'] += item.get('size') or 0
+        if len(done) < MAX_SYNC_REPORT_ITEMS:
+            done.append(item)
+    
+    _record.items = lambda: (failures + sorted(done, key=lambda item: item['name']))[:MAX_SYNC_REPORT_ITEMS]
+    return _record
+
+def _delete_names(cloud_profile, bucket_name: str, container, names: List[str], batch: bool) -> Dict[str, str]:
+    """
+    Delete objects on the calling thread's driver, returning an error message per object that failed.
+
+    With batch set the names (at most bulk.DELETE_BATCH_SIZE) go in one
+    request; otherwise they are deleted one by one.
+    """
+    driver = cloud_profile.get_thread_driver()
+    item_container = cloud.Container(name=container.name, extra=container.extra, driver=driver)
+    errors = {}
+    if batch:
+        try:
+            errors = bulk.delete_batch(driver, item_container, names)
+        except Exception as e:
+            errors = dict.fromkeys(names, str(e))
+    else:
+        for name in names:
+            try:
+                if not item_container.delete_object(_object_stub(item_container, name)):
+                    errors[name] = "Delete failed"
+            except Exception as e:
+                errors[name] = str(e)
+    _forget_objects(cloud_profile, bucket_name, [name for name in names if name not in errors])
+    return errors
+
+async def delete_objects(bucket_name: str, object_names: List[str] = None, prefix: str = None,
+                         dry_run: bool = False, max_objects: int = None, max_concurrency: int = None,
+                         profile: str = None) -> Dict[str, Any]:
+    """
+    Delete many objects from a bucket, by name or by prefix.
+    
+    S3-compatible providers delete up to 1000 objects per request; other
+    providers delete objects concurrently one at a time. The listing of a
+    prefix is streamed, so any number of objects can be deleted in one call.
+    
+    Args:
+        bucket_name (str): Name of the bucket containing the objects
+        object_names (List[str], optional): Names of the objects to delete
+        prefix (str, optional): Delete every object whose name begins with this prefix instead ('' for all objects)
+        dry_run (bool, optional): Only report what would be deleted
+        max_objects (int, optional): Maximum number of objects to delete (no limit if omitted)
+        max_concurrency (int, optional): Number of delete requests in flight
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+        
+    Returns:
+        Dict[str, Any]: Counts of matched, deleted and failed objects, with a sample of the items
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        if object_names is None and prefix is None:
+            return {"error": "Either object_names or prefix is required"}
+            
+        return await _run_bucket_call("delete_objects", bucket_name, _delete_objects, cloud_profile, bucket_name,
+                                      object_names, prefix, dry_run, max_objects, max_concurrency)
+        
+    except cloud.LibcloudError as e:
+        return {"error": f"Error deleting objects: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def _delete_objects(cloud_profile, bucket_name: str, object_names: List[str], prefix: str, dry_run: bool,
+                    max_objects: int, max_concurrency: int) -> Dict[str, Any]:
+    started_at = time.monotonic()
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, bucket_name)
+    
+    if object_names is not None:
+        objects = (_object_stub(container, name) for name in object_names)
+    else:
+        objects = listing.iterate_objects(driver, container, prefix=prefix or None)
+    if max_objects:
+        objects = itertools.islice(objects, max_objects)
+    
+    counts = {'matched': 0, 'deleted': 0, 'failed': 0, 'bytes': 0}
+    record = _bulk_recorder(counts, 'deleted')
+    batch = bulk.supports_batch_delete(driver)
+    size_of = {}
+    
+    def _matched():
+        for obj in objects:
+            counts['matched'] += 1
+            if obj.size is not None:
+                size_of[obj.name] = obj.size
+            yield obj.name
+    
+    def _delete_chunk(names):
+        errors = _delete_names(cloud_profile, bucket_name, container, names, batch)
+        return [{'name': name, 'error': errors[name]} if name in errors
+                else {'name': name, 'size': size_of.get(name)} for name in names]
+    
+    def _record_chunk(items):
+        for item in items:
+            size_of.pop(item['name'], None)
+            record(item)
+    
+    if dry_run:
+        for name in _matched():
+            record({'name': name, 'size': size_of.pop(name, None)})
+        counts['deleted'] = 0
+    else:
+        # Without a batch API each task deletes a single object
+        chunks = _chunked(_matched(), bulk.DELETE_BATCH_SIZE if batch else 1)
+        tasks = (lambda names=names: _delete_chunk(names) for names in chunks)
+        transfer.run_windowed(tasks, transfer.get_batch_concurrency(max_concurrency),
+                              on_result=_record_chunk, keep_results=False)
+    
+    elapsed = time.monotonic() - started_at
+    return {
+        'status': 'success' if not counts['failed'] else ('partial' if counts['deleted'] else 'error'),
+        'bucket_name': bucket_name,
+        'prefix': prefix,
+        'dry_run': dry_run,
+        'mode': bulk.MODE_BATCH if batch else bulk.MODE_INDIVIDUAL,
+        'matched': counts['matched'],
+        'deleted': counts['deleted'],
+        'failed': counts['failed'],
+        'bytes_deleted': counts['bytes'],
+        'elapsed_seconds': round(elapsed, 3),
+        'items': record.items()
+    }
+
+async def copy_objects(source_bucket: str, destination_bucket: str = None, object_names: List[str] = None,
+                       prefix: str = None, destination_prefix: str = None, move: bool = False,
+                       dry_run: bool = False, max_objects: int = None, max_concurrency: int = None,
+                       profile: str = None) -> Dict[str, Any]:
+    """
+    Copy or move many objects, by name or by prefix, within or between buckets.
+    
+    S3-compatible providers copy server-side, so the data does not pass
+    through this server; other providers stream each object across. Moves
+    delete each source after its copy succeeds, in batches where supported.
+    
+    Args:
+        source_bucket (str): Name of the bucket containing the objects
+        destination_bucket (str, optional): Bucket to copy into (the source bucket if omitted)
+        object_names (List[str], optional): Names of the objects to copy
+        prefix (str, optional): Copy every object whose name begins with this prefix instead ('' for all objects)
+        destination_prefix (str, optional): Replaces prefix (or is prepended to object_names) in the copies' names
+        move (bool, optional): Delete each source object once it has been copied
+        dry_run (bool, optional): Only report what would be copied
+        max_objects (int, optional): Maximum number of objects to copy (no limit if omitted)
+        max_concurrency (int, optional): Number of objects copied concurrently
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+        
+    Returns:
+        Dict[str, Any]: Counts of matched, copied and failed objects, with a sample of the items
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        if object_names is None and prefix is None:
+            return {"error": "Either object_names or prefix is required"}
+        destination_bucket = destination_bucket or source_bucket
+        if destination_bucket == source_bucket and destination_prefix is None:
+            return {"error": "Copying within a bucket requires a destination_prefix"}
+            
+        return await _run_bucket_call("copy_objects", source_bucket, _copy_objects, cloud_profile, source_bucket,
+                                      destination_bucket, object_names, prefix, destination_prefix, move, dry_run,
+                                      max_objects, max_concurrency)
+        
+    except cloud.LibcloudError as e:
+        return {"error": f"Error copying objects: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def _copy_name(object_name: str, prefix: str, destination_prefix: str) -> str:
+    """Return the name of an object's copy"""
+    if destination_prefix is None:
+        return object_name
+    if prefix and object_name.startswith(prefix):
+        return destination_prefix + object_name[len(prefix):]
+    return destination_prefix + object_name
+
+def _copy_objects(cloud_profile, source_bucket: str, destination_bucket: str, object_names: List[str], prefix: str,
+                  destination_prefix: str, move: bool, dry_run: bool, max_objects: int,
+                  max_concurrency: int) -> Dict[str, Any]:
+    started_at = time.monotonic()
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, source_bucket)
+    destination = _get_container(cloud_profile, driver, destination_bucket)
+    
+    # Explicit names are looked up on the worker, which also reports missing objects
+    if object_names is not None:
+        objects = (_object_stub(container, name) for name in object_names)
+    else:
+        objects = listing.iterate_objects(driver, container, prefix=prefix or None)
+    if max_objects:
+        objects = itertools.islice(objects, max_objects)
+    
+    counts = {'matched': 0, 'copied': 0, 'failed': 0, 'bytes': 0}
+    record = _bulk_recorder(counts, 'copied')
+    batch_delete = move and bulk.supports_batch_delete(driver)
+    # Copied objects awaiting a batched delete of their source
+    pending_moves = []
+    
+    def _matched():
+        for obj in objects:
+            counts['matched'] += 1
+            yield obj
+    
+    def _copy_item(obj):
+        target_name = _copy_name(obj.name, prefix, destination_prefix)
+        item = {'name': obj.name, 'destination': target_name}
+        try:
+            if destination_bucket == source_bucket and target_name == obj.name:
+                raise ValueError("Source and destination are the same object")
+            item_driver = cloud_profile.get_thread_driver()
+            if obj.size is None:
+                source = _get_container(cloud_profile, item_driver, source_bucket).get_object(obj.name)
+            else:
+                source = transfer.rebind_object(obj, item_driver)
+            item_destination = cloud.Container(name=destination.name, extra=destination.extra, driver=item_driver)
+            result = bulk.copy_object(item_driver, source, item_destination, target_name)
+            invalidate_object(cloud_profile, destination_bucket, target_name)
+            index.record_object(cloud_profile.name, destination_bucket, target_name, result['size'], result['hash'])
+            item.update(size=result['size'], mode=result['mode'])
+        except Exception as e:
+            item['error'] = str(e)
+            return item
+        if move and not batch_delete:
+            errors = _delete_names(cloud_profile, source_bucket, container, [obj.name], False)
+            if errors:
+                item['error'] = f"Copied but the source was not deleted: {errors[obj.name]}"
+        return item
+    
+    def _flush_moves():
+        errors = _delete_names(cloud_profile, source_bucket, container, [item['name'] for item in pending_moves], True)
+        for item in pending_moves:
+            if item['name'] in errors:
+                item = dict(item, error=f"Copied but the source was not deleted: {errors[item['name']]}")
+            record(item)
+        pending_moves.clear()
+    
+    def _record_copy(item):
+        if not batch_delete or 'error' in item:
+            record(item)
+            return
+        pending_moves.append(item)
+        if len(pending_moves) >= bulk.DELETE_BATCH_SIZE:
+            _flush_moves()
+    
+    if dry_run:
+        for obj in _matched():
+            record({'name': obj.name, 'destination': _copy_name(obj.name, prefix, destination_prefix),
+                    'size': obj.size})
+        counts['copied'] = 0
+    else:
+        tasks = (lambda obj=obj: _copy_item(obj) for obj in _matched())
+        try:
+            transfer.run_windowed(tasks, transfer.get_batch_concurrency(max_concurrency),
+                                  on_result=_record_copy, keep_results=False)
+        finally:
+            if pending_moves:
+                _flush_moves()
+    
+    elapsed = time.monotonic() - started_at
+    return {
+        'status': 'success' if not counts['failed'] else ('partial' if counts['copied'] else 'error'),
+        'source_bucket': source_bucket,
+        'destination_bucket': destination_bucket,
+        'prefix': prefix,
+        'destination_prefix': destination_prefix,
+        'move': move,
+        'dry_run': dry_run,
+        'mode': bulk.MODE_SERVER if bulk.supports_server_copy(driver) else bulk.MODE_STREAM,
+        'matched': counts['matched'],
+        'copied': counts['copied'],
+        'failed': counts['failed'],
+        'bytes_copied': counts['bytes'],
+        'elapsed_seconds': round(elapsed, 3),
+        'items': record.items()
+    }
+
+def _local_path(directory: str, relative_name: str) -> str:
+    """Join an object key onto a local directory, refusing keys that escape it"""
+    root = os.path.abspath(directory)
+    path = os.path.abspath(os.path.join(root, *relative_name.split('/')))
+    if os.path.commonpath([root, path]) != root or path == root:
+        raise ValueError(f"Object name {relative_name} is not a valid local path")
+    return path
+
+def _batch_summary(bucket_name: str, items: List[Dict[str, Any]], started_at: float) -> Dict[str, Any]:
+    """Summarise per-item batch results with aggregate throughput"""
+    elapsed = time.monotonic() - started_at
+    transferred = sum(item.get('size') or 0 for item in items)
+    failed = sum(1 for item in items if 'error' in item)
+    return {
+        'status': 'success' if not failed else ('partial' if failed < len(items) else 'error'),
+        'bucket_name': bucket_name,
+        'total': len(items),
+        'succeeded': len(items) - failed,
+        'failed': failed,
+        'bytes': transferred,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_bytes_per_sec': int(transferred / elapsed) if elapsed > 0 else None,
+        'items': items
+    }
+
+async def download_objects(bucket_name: str, destination_dir: str, object_names: List[str] = None,
+                           prefix: str = None, max_concurrency: int = None,
+                           max_objects: int = MAX_BATCH_ITEMS, decompress: bool = True,
+                           profile: str = None) -> Dict[str, Any]:
+    """
+    Download many objects from a bucket into a local directory in parallel.
+    
+    Objects that upload_object compressed are decompressed after download.
+    
+    Args:
+        bucket_name (str): Name of the bucket containing the objects
+        destination_dir (str): Local directory; each object is saved at its key below it
+        object_names (List[str], optional): Names of the objects to download
+        prefix (str, optional): Download every object whose name begins with this prefix instead
+        max_concurrency (int, optional): Number of objects downloaded concurrently
+        max_objects (int, optional): Maximum number of objects to download (default 10000)
+        decompress (bool, optional): Decompress objects stored compressed by upload_object (False keeps them as stored)
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+        
+    Returns:
+        Dict[str, Any]: Per-object status and aggregate bytes and throughput
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        if object_names is None and prefix is None:
+            return {"error": "Either object_names or prefix is required"}
+            
+        return await _run_bucket_call("download_objects", bucket_name, _download_objects, cloud_profile, bucket_name,
+                                      destination_dir, object_names, prefix, max_concurrency, max_objects,
+                                      decompress)
+        
+    except cloud.LibcloudError as e:
+        return {"error": f"Error downloading objects: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def _download_objects(cloud_profile, bucket_name: str, destination_dir: str, object_names: List[str], prefix: str,
+                      max_concurrency: int, max_objects: int, decompress: bool = True) -> Dict[str, Any]:
+    started_at = time.monotonic()
+    limit = max(1, min(max_objects or MAX_BATCH_ITEMS, MAX_BATCH_ITEMS))
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, bucket_name)
+    
+    # Listed objects already carry metadata; explicit names are fetched without a HEAD request
+    if object_names is not None:
+        objects = (_object_stub(container, name) for name in object_names)
+    else:
+        objects = listing.iterate_objects(driver, container, prefix=prefix)
+    # Only listed objects carry the ETag the download cache is keyed on
+    downloads = filecache.get_cache()
+    
+    def _download_item(obj):
+        try:
+            destination_path = _local_path(destination_dir, obj.name)
+            os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+            item_driver = cloud_profile.get_thread_driver()
+            # Listings carry no user metadata, so a compressed-looking object costs a HEAD request
+            meta_data = lambda: item_driver.get_object(bucket_name, obj.name).meta_data
+            cache_key = None
+            if downloads is not None and obj.hash:
+                cache_key = filecache.make_key(cloud_profile.name, bucket_name, obj.name, obj.hash)
+                if downloads.fetch(cache_key, destination_path):
+                    item = {'name': obj.name, 'size': obj.size, 'cache': 'hit'}
+                    return _decompress_download(item, destination_path, meta_data) if decompress else item
+            stream = item_driver.download_object_as_stream(transfer.rebind_object(obj, item_driver))
+            size = _stream_to_file(stream, destination_path)
+            if cache_key is not None:
+                downloads.store(cache_key, destination_path)
+            item = {'name': obj.name, 'size': size}
+            return _decompress_download(item, destination_path, meta_data) if decompress else item
+        except Exception as e:
+            return {'name': obj.name, 'error': str(e)}
+    
+    tasks = (lambda obj=obj: _download_item(obj) for obj in itertools.islice(objects, limit))
+    items = transfer.run_windowed(tasks, transfer.get_batch_concurrency(max_concurrency))
+    items.sort(key=lambda item: item['name'])
+    return _batch_summary(bucket_name, items, started_at)
+
+async def upload_objects(bucket_name: str, file_paths: List[str] = None, source_dir: str = None,
+                         prefix: str = '', max_concurrency: int = None,
+                         max_objects: int = MAX_BATCH_ITEMS, profile: str = None) -> Dict[str, Any]:
+    """
+    Upload many local files to a bucket in parallel.
+    
+    Args:
+        bucket_name (str): Name of the bucket to upload to
+        file_paths (List[str], optional): Local files to upload, each named prefix + file name
+        source_dir (str, optional): Upload every file below this directory, named prefix + relative path
+        prefix (str, optional): Prefix added to every object name
+        max_concurrency (int, optional): Number of files uploaded concurrently
+        max_objects (int, optional): Maximum number of files to upload (default 10000)
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+        
+    Returns:
+        Dict[str, Any]: Per-object status and aggregate bytes and throughput
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        if file_paths is None and source_dir is None:
+            return {"error": "Either file_paths or source_dir is required"}
+        if source_dir is not None and not os.path.isdir(source_dir):
+            return {"error": f"Directory not found: {source_dir}"}
+            
+        return await _run_bucket_call("upload_objects", bucket_name, _upload_objects, cloud_profile, bucket_name,
+                                      file_paths, source_dir, prefix or '', max_concurrency, max_objects)
+        
+    except cloud.LibcloudError as e:
+        return {"error": f"Error uploading objects: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def _iterate_local_files(source_dir: str):
+    """Yield (path, relative name with '/' separators) for every file below source_dir"""
+    for folder, subfolders, files in os.walk(source_dir):
+        subfolders.sort()
+        for name in sorted(files):
+            path = os.path.join(folder, name)
+            yield path, os.path.relpath(path, source_dir).replace(os.sep, '/')
+
+def _upload_objects(cloud_profile, bucket_name: str, file_paths: List[str], source_dir: str, prefix: str,
+                    max_concurrency: int, max_objects: int) -> Dict[str, Any]:
+    started_at = time.monotonic()
+    limit = max(1, min(max_objects or MAX_BATCH_ITEMS, MAX_BATCH_ITEMS))
+    container = _get_container(cloud_profile, cloud_profile.get_thread_driver(), bucket_name)
+    
+    if file_paths is not None:
+        files = ((path, os.path.basename(path)) for path in file_paths)
+    else:
+        files = _iterate_local_files(source_dir)
+    
+    def _upload_item(path, object_name):
+        try:
+            item_container = cloud.Container(name=container.name, extra=container.extra,
+                                             driver=cloud_profile.get_thread_driver())
+            with open(path, 'rb') as file_obj:
+                obj = item_container.upload_object_via_stream(iterator=file_obj, object_name=object_name)
+            invalidate_object(cloud_profile, bucket_name, object_name)
+            size = obj.size if obj.size is not None else os.path.getsize(path)
+            index.record_object(cloud_profile.name, bucket_name, object_name, size, obj.hash)
+            return {'name': object_name, 'size': size}
+        except Exception as e:
+            return {'name': object_name, 'error': str(e)}
+    
+    tasks = (lambda path=path, name=name: _upload_item(path, prefix + name)
+             for path, name in itertools.islice(files, limit))
+    items = transfer.run_windowed(tasks, transfer.get_batch_concurrency(max_concurrency))
+    items.sort(key=lambda item: item['name'])
+    return _batch_summary(bucket_name, items, started_at)
+
+async def sync_prefix(bucket_name: str, local_dir: str, prefix: str = '', direction: str = 'download',
+                      compare_hash: bool = False, dry_run: bool = False,
+                      max_concurrency: int = None, profile: str = None) -> Dict[str, Any]:
+    """
+    Mirror a bucket prefix and a local directory, transferring only changed files.
+    
+    Objects are compared with their local counterparts (the key with the prefix
+    removed, below local_dir) by size, optionally hash, and modification time.
+    The prefix is treated as a folder, so 'logs' mirrors 'logs/' but not 'logs2/'.
+    Nothing is deleted on either side.
+    
+    Args:
+        bucket_name (str): Name of the bucket to sync with
+        local_dir (str): Local directory to sync with
+        prefix (str, optional): Key prefix mirrored by local_dir
+        direction (str, optional): 'download' (bucket to local) or 'upload' (local to bucket)
+        compare_hash (bool, optional): Compare MD5 content hashes where the provider exposes them
+        dry_run (bool, optional): Only report what would be transferred
+        max_concurrency (int, optional): Number of files transferred concurrently
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+        
+    Returns:
+        Dict[str, Any]: Counts of transferred, skipped and failed files, bytes and throughput
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        if direction not in ('download', 'upload'):
+            return {"error": f"Invalid direction: {direction}"}
+        if direction == 'upload' and not os.path.isdir(local_dir):
+            return {"error": f"Directory not found: {local_dir}"}
+            
+        return await _run_bucket_call("sync_prefix", bucket_name, _sync_prefix, cloud_profile, bucket_name, local_dir,
+                                      prefix or '', direction, compare_hash, dry_run, max_concurrency)
+        
+    except cloud.LibcloudError as e:
+        return {"error": f"Error syncing prefix: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def _sync_prefix(cloud_profile, bucket_name: str, local_dir: str, prefix: str, direction: str, compare_hash: bool,
+                 dry_run: bool, max_concurrency: int) -> Dict[str, Any]:
+    started_at = time.monotonic()
+    if prefix and not prefix.endswith('/'):
+        prefix += '/'
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, bucket_name)
+    local_files = sync.scan_local(local_dir)
+    counts = {'scanned': 0, 'skipped': 0, 'transferred': 0, 'failed': 0, 'bytes': 0}
+    _record = _bulk_recorder(counts, 'transferred')
+    
+    def _plan():
+        # The remote listing is streamed; only the local index is held in memory
+        for obj in listing.iterate_objects(driver, container, prefix=prefix or None):
+            # Uploads build keys as prefix + relative_name, the exact inverse of this
+            relative_name = obj.name[len(prefix):]
+            if not relative_name or relative_name.startswith('/') or relative_name.endswith('/'):
+                continue
+            counts['scanned'] += 1
+            local = local_files.pop(relative_name, None)
+            try:
+                local_path = _local_path(local_dir, relative_name)
+            except ValueError as e:
+                _record({'name': obj.name, 'error': str(e)})
+                continue
+            if direction == 'download':
+                if sync.needs_download(obj, local, local_path, compare_hash):
+                    yield obj, relative_name
+                    continue
+            elif local is not None and sync.needs_upload(obj, local, local_path, compare_hash):
+                yield obj, relative_name
+                continue
+            counts['skipped'] += 1
+        if direction == 'upload':
+            # Files with no remote counterpart
+            for relative_name in sorted(local_files):
+                counts['scanned'] += 1
+                yield None, relative_name
+    
+    def _download_item(obj, relative_name):
+        try:
+            destination_path = _local_path(local_dir, relative_name)
+            os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+            item_driver = cloud_profile.get_thread_driver()
+            stream = item_driver.download_object_as_stream(transfer.rebind_object(obj, item_driver))
+            size = _stream_to_file(stream, destination_path)
+            # Match the remote timestamp so the next sync sees the file as unchanged
+            modified = sync.remote_mtime(obj)
+            if modified is not None:
+                os.utime(destination_path, (modified, modified))
+            return {'name': obj.name, 'size': size}
+        except Exception as e:
+            return {'name': obj.name, 'error': str(e)}
+    
+    def _upload_item(relative_name):
+        object_name = prefix + relative_name
+        try:
+            path = _local_path(local_dir, relative_name)
+            item_container = cloud.Container(name=container.name, extra=container.extra,
+                                             driver=cloud_profile.get_thread_driver())
+            with open(path, 'rb') as file_obj:
+                obj = item_container.upload_object_via_stream(iterator=file_obj, object_name=object_name)
+            invalidate_object(cloud_profile, bucket_name, object_name)
+            size = os.path.getsize(path)
+            index.record_object(cloud_profile.name, bucket_name, object_name, size, obj.hash)
+            return {'name': object_name, 'size': size}
+        except Exception as e:
+            return {'name': object_name, 'error': str(e)}
+    
+    concurrency = transfer.get_batch_concurrency(max_concurrency)
+    if dry_run:
+        for obj, relative_name in _plan():
+            _record({'name': prefix + relative_name, 'size': obj.size if obj is not None else None})
+        counts['bytes'] = 0
+    elif direction == 'download':
+        tasks = (lambda obj=obj, name=name: _download_item(obj, name) for obj, name in _plan())
+        transfer.run_windowed(tasks, concurrency, on_result=_record, keep_results=False)
+    else:
+        tasks = (lambda name=name: _upload_item(name) for _, name in _plan())
+        transfer.run_windowed(tasks, concurrency, on_result=_record, keep_results=False)
+    
+    elapsed = time.monotonic() - started_at
+    return {
+        'status': 'success' if not counts['failed'] else 'partial',
+        'bucket_name': bucket_name,
+        'prefix': prefix,
+        'local_dir': local_dir,
+        'direction': direction,
+        'dry_run': dry_run,
+        'scanned': counts['scanned'],
+        'skipped': counts['skipped'],
+        'transferred': counts['transferred'],
+        'failed': counts['failed'],
+        'bytes': counts['bytes'],
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_bytes_per_sec': int(counts['bytes'] / elapsed) if elapsed > 0 else None,
+        'items': _record.items()
+    }
+
+async def search_objects(bucket_name: str, pattern: str, prefix: str = '', ignore_case: bool = False,
+                         fixed_string: bool = False, max_results: int = DEFAULT_SEARCH_RESULTS,
+                         max_matches_per_object: int = None, max_bytes_per_object: int = None,
+                         max_object_size: int = None, max_objects: int = MAX_BATCH_ITEMS,
+                         encoding: str = content.DEFAULT_ENCODING, max_concurrency: int = None,
+                         profile: str = None) -> Dict[str, Any]:
+    """
+    Search the lines of objects under a prefix, like grep, without downloading them to disk.
+    
+    Objects are streamed in parallel and scanning stops as soon as a match
+    beyond max_results is found, which sets truncated; objects_truncated is
+    set when the prefix holds more than max_objects objects. Binary objects
+    are skipped.
+    
+    Args:
+        bucket_name (str): Name of the bucket to search
+        pattern (str): Regular expression (or literal text with fixed_string) matched against each line
+        prefix (str, optional): Only search objects whose names start with this prefix
+        ignore_case (bool, optional): Match case-insensitively
+        fixed_string (bool, optional): Treat pattern as literal text rather than a regular expression
+        max_results (int, optional): Stop after this many matching lines (default 100, at most 1000)
+        max_matches_per_object (int, optional): Stop reading an object after this many matches
+        max_bytes_per_object (int, optional): Only scan the first bytes of each object
+        max_object_size (int, optional): Skip objects larger than this many bytes
+        max_objects (int, optional): Maximum number of objects to search (default 10000)
+        encoding (str, optional): Text encoding of the objects
+        max_concurrency (int, optional): Number of objects scanned concurrently
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+        
+    Returns:
+        Dict[str, Any]: Matching lines with their object, line number and byte offset, plus scan counters
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        try:
+            regex = re.compile(re.escape(pattern) if fixed_string else pattern,
+                               re.IGNORECASE if ignore_case else 0)
+        except re.error as e:
+            return {"error": f"Invalid pattern: {str(e)}"}
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            return {"error": f"Unknown encoding: {encoding}"}
+            
+        return await _run_bucket_call("search_objects", bucket_name, _search_objects, cloud_profile, bucket_name,
+                                      regex, prefix or None, max_results, max_matches_per_object,
+                                      max_bytes_per_object, max_object_size, max_objects, encoding,
+                                      max_concurrency)
+        
+    except cloud.LibcloudError as e:
+        return {"error": f"Error searching objects: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def _search_objects(cloud_profile, bucket_name: str, regex, prefix: str, max_results: int,
+                    max_matches_per_object: int, max_bytes_per_object: int, max_object_size: int,
+                    max_objects: int, encoding: str, max_concurrency: int) -> Dict[str, Any]:
+    started_at = time.monotonic()
+    limit = max(1, min(max_results or DEFAULT_SEARCH_RESULTS, MAX_SEARCH_RESULTS))
+    driver = cloud_profile.get_thread_driver()
+    container = _get_container(cloud_profile, driver, bucket_name)
+    lock = threading.Lock()
+    stop = threading.Event()
+    matches = []
+    counts = {'scanned': 0, 'skipped': 0, 'bytes': 0}
+    truncated = {'matches': False, 'objects': False}
+    errors = []
+    
+    def _search_item(obj):
+        if stop.is_set():
+            return
+        length = obj.size or 0
+        if max_object_size is not None and length > max_object_size:
+            with lock:
+                counts['skipped'] += 1
+            return
+        if max_bytes_per_object is not None:
+            length = min(length, max_bytes_per_object)
+        
+        found = 0
+        scanned = 0
+        binary = False
+        item_driver = cloud_profile.get_thread_driver()
+        chunks = content.iter_range(item_driver, transfer.rebind_object(obj, item_driver), 0, length,
+                                    window=content.SCAN_WINDOW)
+        try:
+            first = next(chunks, b'')
+            scanned = len(first)
+            if content.is_binary(first):
+                binary = True
+                return
+            
+            def _counted():
+                nonlocal scanned
+                for chunk in chunks:
+                    if stop.is_set():
+                        return
+                    scanned += len(chunk)
+                    yield chunk
+            
+            for offset, line_number, line in content.iter_lines(itertools.chain([first], _counted())):
+                text = line.decode(encoding, errors='replace').rstrip('\r')
+                if not regex.search(text):
+                    continue
+                with lock:
+                    # Scanning goes on past the limit until a further match shows the results are cut off
+                    if len(matches) >= limit:
+                        truncated['matches'] = True
+                        stop.set()
+                        return
+                    matches.append({
+                        'object_name': obj.name,
+                        'line': line_number,
+                        'offset': offset,
+                        'text': text[:MAX_MATCH_TEXT]
+                    })
+                found += 1
+                if stop.is_set() or (max_matches_per_object and found >= max_matches_per_object):
+                    return
+        except Exception as e:
+            with lock:
+                errors.append({'object_name': obj.name, 'error': str(e)})
+        finally:
+            chunks.close()
+            with lock:
+                counts['skipped' if binary else 'scanned'] += 1
+                counts['bytes'] += scanned
+    
+    def _tasks():
+        object_limit = max(1, min(max_objects or MAX_BATCH_ITEMS, MAX_BATCH_ITEMS))
+        for position, obj in enumerate(listing.iterate_objects(driver, container, prefix=prefix)):
+            # Stop listing once enough matches have been found
+            if stop.is_set():
+                return
+            if position >= object_limit:
+                truncated['objects'] = True
+                return
+            yield lambda obj=obj: _search_item(obj)
+    
+    transfer.run_windowed(_tasks(), transfer.get_batch_concurrency(max_concurrency), keep_results=False)
+    matches.sort(key=lambda match: (match['object_name'], match['offset']))
+    elapsed = time.monotonic() - started_at
+    return {
+        'bucket_name': bucket_name,
+        'pattern': regex.pattern,
+        'matches': matches,
+        'count': len(matches),
+        'truncated': truncated['matches'],
+        'objects_truncated': truncated['objects'],
+        'objects_scanned': counts['scanned'],
+        'objects_skipped': counts['skipped'],
+        'bytes': counts['bytes'],
+        'errors': errors[:MAX_SYNC_REPORT_ITEMS],
+        'elapsed_seconds': round(elapsed, 3)
+    }
+
+async def index_bucket(bucket_name: str, prefix: str = '', wait: bool = False,
+                       profile: str = None) -> Dict[str, Any]:
+    """
+    Build or refresh the local listing index of a bucket prefix.
+    
+    The crawl runs in the background unless wait is set; query_index and
+    get_bucket_stats can be used while it runs and report how complete and
+    how old the indexed listing is. Indexed prefixes are re-crawled every
+    LISTING_INDEX_REFRESH seconds.
+    
+    Args:
+        bucket_name (str): Name of the bucket to index
+        prefix (str, optional): Only index objects under this prefix
+        wait (bool, optional): Wait for the crawl to finish
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+        
+    Returns:
+        Dict[str, Any]: Crawl status of the prefix
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        if not index.is_enabled():
+            return {"error": f"Listing index is disabled; set {index.ENV_LISTING_INDEX_PATH} to enable it"}
+        
+        prefix = prefix or ''
+        if wait:
+            state = await dispatch.run_blocking("index_bucket", index.crawl, cloud_profile, bucket_name, prefix)
+        else:
+            scheduled = index.schedule(cloud_profile, bucket_name, prefix)
+            state = await dispatch.run_blocking("index_bucket", index.get_state, cloud_profile.name,
+                                                bucket_name, prefix)
+            state = dict(state or {}, status='crawling' if not scheduled else 'scheduled')
+        return {'bucket_name': bucket_name, 'prefix': prefix, 'index': state}
+        
+    except cloud.LibcloudError as e:
+        return {"error": f"Error indexing bucket: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+async def _run_index_query(tool_name: str, cloud_profile, bucket_name: str, prefix: str, func, *args):
+    """Run an index query, returning (state, result) or an error dict if the prefix is not indexed"""
+    def _query():
+        state = index.get_state(cloud_profile.name, bucket_name, prefix)
+        if state is None:
+            return None, None
+        return state, func(cloud_profile.name, bucket_name, prefix, *args)
+    
+    state, result = await dispatch.run_blocking(tool_name, _query)
+    if state is None:
+        return {"error": f"Bucket {bucket_name} is not indexed for prefix '{prefix}'; call index_bucket first"}, None
+    return state, result
+
+async def query_index(bucket_name: str, prefix: str = '', min_size: int = None, max_size: int = None,
+                      sort: str = 'name', descending: bool = False, limit: int = index.DEFAULT_QUERY_LIMIT,
+                      offset: int = 0, profile: str = None) -> Dict[str, Any]:
+    """
+    Query objects from the local listing index without listing the provider.
+    
+    Args:
+        bucket_name (str): Name of the indexed bucket
+        prefix (str, optional): Only return objects whose names start with this prefix
+        min_size (int, optional): Only return objects of at least this many bytes
+        max_size (int, optional): Only return objects of at most this many bytes
+        sort (str, optional): 'name' (default), 'size' or 'last_modified'
+        descending (bool, optional): Sort in descending order, e.g. largest or newest first
+        limit (int, optional): Maximum number of objects to return (default 100, at most 10000)
+        offset (int, optional): Number of matching objects to skip, for paging
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+        
+    Returns:
+        Dict[str, Any]: Matching objects and an 'index' field describing how fresh the index is
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        if not index.is_enabled():
+            return {"error": f"Listing index is disabled; set {index.ENV_LISTING_INDEX_PATH} to enable it"}
+        if sort not in index.SORT_COLUMNS:
+            return {"error": f"Invalid sort: {sort}"}
+        
+        prefix = prefix or ''
+        state, objects = await _run_index_query("query_index", cloud_profile, bucket_name, prefix, index.query,
+                                                min_size, max_size, sort, descending, limit, offset)
+        if objects is None:
+            return state
+        return {
+            'bucket_name': bucket_name,
+            'prefix': prefix,
+            'objects': objects,
+            'count': len(objects),
+            'index': state
+        }
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+async def get_bucket_stats(bucket_name: str, prefix: str = '', delimiter: str = None, top: int = 10,
+                           profile: str = None) -> Dict[str, Any]:
+    """
+    Get object count, total size and largest objects of a bucket prefix from the local listing index.
+    
+    Args:
+        bucket_name (str): Name of the indexed bucket
+        prefix (str, optional): Only count objects under this prefix
+        delimiter (str, optional): Also report totals for each folder directly below the prefix, e.g. '/'
+        top (int, optional): Number of largest objects to include (default 10)
+        profile (str, optional): Name of the cloud profile to use (default profile if omitted)
+        
+    Returns:
+        Dict[str, Any]: Aggregates and an 'index' field describing how fresh the index is
+    """
+    try:
+        cloud_profile = cloud.get_profile(profile)
+        if cloud_profile is None:
+            return {"error": _profile_error(profile)}
+        if not index.is_enabled():
+            return {"error": f"Listing index is disabled; set {index.ENV_LISTING_INDEX_PATH} to enable it"}
+        
+        prefix = prefix or ''
+        state, stats = await _run_index_query("get_bucket_stats", cloud_profile, bucket_name, prefix,
+                                              index.aggregate, delimiter, max(0, min(top, 1000)))
+        if stats is None:
+            return state
+        return dict({'bucket_name': bucket_name, 'prefix': prefix}, **stats, index=state)
+    except Exception as e:
+        return {"error": f"Unexpected error: {str(e)}"}
+
+async def get_dispatch_stats() -> Dict[str, Any]:
+    """
+    Get worker pool statistics for storage tools.
+    
+    Returns:
+        Dict[str, Any]: Pool size, per-tool concurrency limits, queue depth and call counters
+    """
+    return dispatch.get_stats()
+
+async def get_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit/miss statistics for the container handle, object metadata and download caches.
+    
+    Returns:
+        Dict[str, Any]: Per-cache size, TTL and hit/miss/eviction counters ('downloads' is None while disabled)
+    """
+    objects = await _cache_call(object_cache.stats)
+    with _revalidation_lock:
+        objects['revalidated_unchanged'] = revalidation_stats['unchanged']
+        objects['revalidated_changed'] = revalidation_stats['changed']
+    downloads = filecache.get_cache()
+    return {
+        'containers': await _cache_call(container_cache.stats),
+        'objects': objects,
+        'downloads': downloads.stats() if downloads is not None else None
+    }
+
+async def get_metrics(format: str = 'json') -> Any:
+    """
+    Get per-tool call counts, latency histograms, bytes transferred and provider request counts.
+    
+    Args:
+        format (str, optional): 'json' (default) or 'prometheus' for the Prometheus text exposition format
+        
+    Returns:
+        Any: Metrics labeled by tool, provider and bucket, or Prometheus text
+    """
+    if format == 'prometheus':
+        return metrics.export_prometheus()
+    if format != 'json':
+        return {"error": f"Invalid format: {format}"}
+    return metrics.get_metrics()
+
 # Resource endpoints
 async def get_object_resource(bucket_name: str, object_name: str) -> Dict[str, Any]:
     """Resource endpoint to get object details"""
@@ -330,3 +2335,11 @@ async def download_object_resource(bucket_name: str, object_name: str) -> Dict[s
     destination_path = f'./downloads/{object_name}'
     
     return await download_object(bucket_name, object_name, destination_path)
+
+async def read_object_resource(bucket_name: str, object_name: str) -> Dict[str, Any]:
+    """Resource endpoint to read the first page of an object's content"""
+    return await read_object(bucket_name, object_name)
+
+async def get_metrics_resource() -> str:
+    """Resource endpoint exposing metrics in the Prometheus text format"""
+    return metrics.export_prometheus()
@@ -0,0 +1,103 @@
+import os
+import re
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+import cloud
+import transfer
+
+# Provider timestamps are often truncated to whole seconds
+MTIME_TOLERANCE = 2.0
+_MD5_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def scan_local(local_dir: str) -> Dict[str, Tuple[int, float]]:
+    """
+    Index the files below a local directory.
+
+    Args:
+        local_dir (str): Directory to scan; a missing directory is treated as empty
+
+    Returns:
+        Dict[str, Tuple[int, float]]: Relative name with '/' separators -> (size, mtime)
+    """
+    files = {}
+    if not os.path.isdir(local_dir):
+        return files
+    for folder, subfolders, names in os.walk(local_dir):
+        for name in names:
+            if name.endswith(transfer.PARTIAL_SUFFIX) or name.endswith(transfer.PROGRESS_SUFFIX):
+                continue
+            path = os.path.join(folder, name)
+            stat = os.stat(path)
+            files[os.path.relpath(path, local_dir).replace(os.sep, '/')] = (stat.st_size, stat.st_mtime)
+    return files
+
+
+def remote_mtime(obj) -> Optional[float]:
+    """Return the object's last-modified time as a POSIX timestamp, if the driver reports one"""
+    extra = obj.extra or {}
+    if isinstance(extra.get('modify_time'), (int, float)):
+        return float(extra['modify_time'])
+
+    value = extra.get('last_modified')
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%dT%H:%M:%SZ'):
+        try:
+            return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def content_md5(obj) -> Optional[str]:
+    """Return the object's content MD5 if its hash is one (S3-style single-part ETag)"""
+    if not cloud.is_s3_driver(obj.driver) or not obj.hash:
+        return None
+    value = obj.hash.strip('"')
+    return value if _MD5_PATTERN.match(value) else None
+
+
+def needs_download(obj, local: Optional[Tuple[int, float]], local_path: str, compare_hash: bool) -> bool:
+    """
+    Decide whether a remote object must be copied over its local counterpart.
+
+    Files are compared by size, then by content hash when requested and
+    available, then by modification time.
+    """
+    if local is None:
+        return True
+    size, mtime = local
+    if obj.size is not None and int(obj.size) != size:
+        return True
+    md5 = content_md5(obj) if compare_hash else None
+    if md5 is not None:
+        return transfer.file_md5(local_path) != md5
+    modified = remote_mtime(obj)
+    if modified is None:
+        return False
+    return abs(modified - mtime) > MTIME_TOLERANCE
+
+
+def needs_upload(obj, local: Tuple[int, float], local_path: str, compare_hash: bool) -> bool:
+    """
+    Decide whether a local file must be copied over its remote counterpart.
+
+    Files are compared by size, then by content hash when requested and
+    available, then by whether the local file is newer than the object.
+    """
+    size, mtime = local
+    if obj.size is not None and int(obj.size) != size:
+        return True
+    md5 = content_md5(obj) if compare_hash else None
+    if md5 is not None:
+        return transfer.file_md5(local_path) != md5
+    modified = remote_mtime(obj)
+    if modified is None:
+        return False
+    return mtime > modified + MTIME_TOLERANCE
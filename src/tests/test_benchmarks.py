@@ -0,0 +1,43 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import storage_bench
+
+
+class StorageBenchmarkTest(unittest.TestCase):
+    """Smoke test for the offline storage benchmark suite"""
+
+    def test_suite_covers_every_tool(self):
+        """Test that a tiny run benchmarks every tool without errors and writes JSON"""
+        output = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            storage_bench.main(['--objects', '20', '--iterations', '2', '--concurrency', '2',
+                                '--output', output])
+
+        with open(output, 'r') as f:
+            results = json.load(f)
+        tools = results['buckets']['20']
+        for name in ['list_buckets', 'list_objects', 'get_object_cold', 'download_object',
+                     'upload_object', 'download_objects', 'sync_prefix']:
+            self.assertEqual(tools[name]['errors'], 0, name)
+            self.assertIn('p99', tools[name]['latency_seconds'])
+            self.assertIn('blocked_seconds', tools[name]['event_loop'])
+        self.assertGreater(tools['list_objects']['peak_rss_bytes'], 0)
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        self.assertEqual(storage_bench.percentile(values, 0.5), 50)
+        self.assertEqual(storage_bench.percentile(values, 0.99), 99)
+        self.assertEqual(storage_bench.percentile([7], 0.9), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,1093 @@
+import asyncio
+import base64
+import gzip
+import hashlib
+import importlib.util
+import io
+import os
+import shutil
+import struct
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import unittest
+import urllib.request
+import zipfile
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libcloud.storage.types import Provider
+
+import cache
+import cloud
+import dispatch
+import filecache
+import index
+import metrics
+import s3async
+import storage
+import transfer
+
+
+def _thrift(kind, value) -> bytes:
+    """Encode a value with the Thrift compact protocol; structs are {field id: (type, value)}"""
+    def _varint(number):
+        out = bytearray()
+        while number > 0x7f:
+            out.append(number & 0x7f | 0x80)
+            number >>= 7
+        return bytes(out + bytes([number]))
+
+    if kind in (5, 6):
+        return _varint((value << 1) ^ (value >> 63))
+    if kind == 8:
+        return _varint(len(value)) + value
+    if kind == 9:
+        element_kind, items = value
+        return bytes([len(items) << 4 | element_kind]) + b''.join(_thrift(element_kind, item) for item in items)
+    out = bytearray()
+    last = 0
+    for field_id in sorted(value):
+        field_kind, field_value = value[field_id]
+        out += bytes([(field_id - last) << 4 | field_kind]) + _thrift(field_kind, field_value)
+        last = field_id
+    return bytes(out + b'\x00')
+
+
+class StorageTest(unittest.TestCase):
+    """Test cases for storage tools against libcloud's local driver"""
+
+    def setUp(self):
+        """Point the cloud driver at a temporary local storage directory"""
+        self.root = tempfile.mkdtemp()
+        self.workdir = tempfile.mkdtemp()
+        cloud.SUPPORTED_PROVIDERS['local'] = Provider.LOCAL
+        cloud.provider = 'local'
+        cloud.initialize_cloud_driver_internal('local', self.root, None, None)
+        storage.container_cache.clear()
+        storage.object_cache.clear()
+        self.container = cloud.driver.create_container('bucket')
+        for name in ['a.txt', 'logs/1.log', 'logs/2.log']:
+            self.container.upload_object_via_stream(iter([name.encode()]), name)
+
+    def tearDown(self):
+        dispatch.shutdown()
+        transfer.shutdown()
+        dispatch.reset_stats()
+        metrics.reset()
+        shutil.rmtree(self.root, ignore_errors=True)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_list_buckets(self):
+        """Test that buckets are listed through the worker pool"""
+        result = self.run_async(storage.list_buckets())
+        self.assertEqual([bucket['name'] for bucket in result], ['bucket'])
+        stats = dispatch.get_stats()
+        self.assertEqual(stats['tools']['list_buckets']['completed'], 1)
+
+    def test_get_object(self):
+        """Test object metadata lookup"""
+        result = self.run_async(storage.get_object('bucket', 'a.txt'))
+        self.assertEqual(result['name'], 'a.txt')
+        self.assertEqual(result['size'], len(b'a.txt'))
+
+    def test_upload_and_download_object(self):
+        """Test an upload followed by a download round-trip"""
+        source = os.path.join(self.workdir, 'source.bin')
+        with open(source, 'wb') as f:
+            f.write(b'payload' * 100)
+        result = self.run_async(storage.upload_object('bucket', 'data/source.bin', source))
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['mode'], 'single')
+        self.assertEqual(result['size'], 700)
+
+        destination = os.path.join(self.workdir, 'out', 'source.bin')
+        result = self.run_async(storage.download_object('bucket', 'data/source.bin', destination))
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['size'], 700)
+        with open(destination, 'rb') as f:
+            self.assertEqual(f.read(), b'payload' * 100)
+
+        result = self.run_async(storage.download_object('bucket', 'data/source.bin', destination,
+                                                        fresh_metadata=True))
+        self.assertEqual(result['size'], 700)
+
+    def test_parallel_calls_respect_tool_limit(self):
+        """Test that concurrent calls run in parallel up to the per-tool limit"""
+        dispatch.configure(in_max_workers=4, in_tool_concurrency=2, in_tool_limits={})
+
+        async def fan_out():
+            return await asyncio.gather(*[storage.get_object('bucket', 'a.txt') for _ in range(6)])
+
+        # Identical calls would otherwise share one provider call
+        with mock.patch.dict(os.environ, {dispatch.ENV_STORAGE_COALESCE: 'false'}):
+            results = self.run_async(fan_out())
+        self.assertTrue(all(result['name'] == 'a.txt' for result in results))
+        stats = dispatch.get_stats()['tools']['get_object']
+        self.assertEqual(stats['completed'], 6)
+        self.assertEqual(stats['limit'], 2)
+        self.assertEqual(stats['active'], 0)
+
+    def test_cancelled_calls_keep_their_slot(self):
+        """Test that a cancelled call holds its tool slot until its thread finishes and queued calls settle once"""
+        release = threading.Event()
+        running = []
+
+        def blocking(name):
+            running.append(name)
+            release.wait(5)
+            return name
+
+        async def started(count):
+            while len(running) < count:
+                await asyncio.sleep(0.01)
+
+        async def cancel_running():
+            first = asyncio.ensure_future(dispatch.run_blocking('slow', blocking, 'first'))
+            await started(1)
+            first.cancel()
+            second = asyncio.ensure_future(dispatch.run_blocking('slow', blocking, 'second'))
+            # A worker thread is free, but the first call's thread still holds the tool's only slot
+            await asyncio.sleep(0.1)
+            self.assertEqual(running, ['first'])
+            release.set()
+            return await second
+
+        async def cancel_queued():
+            busy = asyncio.ensure_future(dispatch.run_blocking('slow', blocking, 'busy'))
+            await started(1)
+            queued = asyncio.ensure_future(dispatch.run_blocking('other', blocking, 'queued'))
+            await asyncio.sleep(0.05)
+            queued.cancel()
+            await asyncio.sleep(0.05)
+            release.set()
+            return await busy
+
+        dispatch.configure(in_max_workers=2, in_tool_concurrency=1, in_tool_limits={})
+        self.assertEqual(self.run_async(cancel_running()), 'second')
+        self.assertEqual(running, ['first', 'second'])
+        slow = dispatch.get_stats()['tools']['slow']
+        self.assertEqual((slow['completed'], slow['queued'], slow['active']), (2, 0, 0))
+
+        dispatch.configure(in_max_workers=1, in_tool_concurrency=1, in_tool_limits={})
+        dispatch.reset_stats()
+        release.clear()
+        running.clear()
+        self.assertEqual(self.run_async(cancel_queued()), 'busy')
+        self.assertEqual(running, ['busy'])
+        other = dispatch.get_stats()['tools']['other']
+        self.assertEqual((other['failed'], other['queued'], other['active']), (1, 0, 0))
+
+    def test_list_objects_pagination(self):
+        """Test that list_objects pages through the bucket with continuation tokens"""
+        names = []
+        token = None
+        pages = 0
+        while True:
+            result = self.run_async(storage.list_objects('bucket', page_size=1, continuation_token=token))
+            names.extend(obj['name'] for obj in result['objects'])
+            pages += 1
+            token = result['next_token']
+            if token is None:
+                break
+        self.assertEqual(names, ['a.txt', 'logs/1.log', 'logs/2.log'])
+        self.assertEqual(pages, 3)
+
+    def test_list_all_objects_delimiter(self):
+        """Test that keys are grouped into folders and folders are not repeated across pages"""
+        first = self.run_async(storage.list_all_objects('bucket', delimiter='/', page_size=1))
+        self.assertEqual(first['objects'][0]['name'], 'a.txt')
+        second = self.run_async(storage.list_all_objects('bucket', delimiter='/', page_size=1,
+                                                         continuation_token=first['next_token']))
+        self.assertEqual(second['objects'], [{'name': 'logs/', 'type': 'folder', 'container': 'bucket'}])
+        self.assertIsNone(second['next_token'])
+
+    def test_list_all_objects_rejects_foreign_token(self):
+        """Test that a token from a different listing is rejected"""
+        first = self.run_async(storage.list_all_objects('bucket', page_size=1))
+        result = self.run_async(storage.list_all_objects('bucket', prefix='logs/',
+                                                         continuation_token=first['next_token']))
+        self.assertIn('error', result)
+
+    def test_listing_field_projection(self):
+        """Test that listings return only the requested fields, optionally as compact rows"""
+        result = self.run_async(storage.list_objects('bucket', fields=['name', 'size']))
+        self.assertEqual(result['objects'][0], {'name': 'a.txt', 'size': 5})
+
+        result = self.run_async(storage.list_all_objects('bucket', delimiter='/', fields=['type', 'name', 'size'],
+                                                         compact=True))
+        self.assertEqual(result['columns'], ['type', 'name', 'size'])
+        self.assertEqual(result['objects'], [['object', 'a.txt', 5], ['folder', 'logs/', None]])
+
+        result = self.run_async(storage.list_buckets(fields=['name'], compact=True))
+        self.assertEqual(result, {'columns': ['name'], 'buckets': [['bucket']], 'count': 1})
+        self.assertIn('error', self.run_async(storage.list_objects('bucket', fields=['name', 'owner'])))
+
+    def test_container_cache_skips_lookup(self):
+        """Test that repeated calls reuse the cached container handle"""
+        storage.container_cache.clear()
+        before = storage.container_cache.stats()
+        self.run_async(storage.get_object('bucket', 'a.txt'))
+        self.run_async(storage.get_object('bucket', 'logs/1.log'))
+        after = storage.container_cache.stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    def test_failed_call_invalidates_container(self):
+        """Test that a provider error drops the cached container handle"""
+        storage.container_cache.clear()
+        self.run_async(storage.get_object('bucket', 'a.txt'))
+        self.assertEqual(len(storage.container_cache), 1)
+        result = self.run_async(storage.get_object('bucket', 'missing.txt'))
+        self.assertIn('error', result)
+        self.assertEqual(len(storage.container_cache), 0)
+
+    def test_object_cache_and_revalidation(self):
+        """Test that object metadata is cached and revalidation detects changes"""
+        before = storage.object_cache.stats()
+        first = self.run_async(storage.get_object('bucket', 'a.txt'))
+        second = self.run_async(storage.get_object_resource('bucket', 'a.txt'))
+        self.assertEqual(first, second)
+        after = storage.object_cache.stats()
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+        # Change the object behind the cache's back
+        self.container.upload_object_via_stream(iter([b'changed content']), 'a.txt')
+        stale = self.run_async(storage.get_object('bucket', 'a.txt'))
+        self.assertEqual(stale['hash'], first['hash'])
+        fresh = self.run_async(storage.get_object('bucket', 'a.txt', revalidate=True))
+        self.assertNotEqual(fresh['hash'], first['hash'])
+        stats = self.run_async(storage.get_cache_stats())
+        self.assertGreaterEqual(stats['objects']['revalidated_changed'], 1)
+
+    def test_shared_cache_across_instances(self):
+        """Test that caches on the same SQLite file share entries, invalidations and size limits"""
+        path = os.path.join(self.workdir, 'shared.db')
+        first = cache.SharedTTLCache(path, 'objects', max_size=2, ttl=60)
+        second = cache.SharedTTLCache(path, 'objects', max_size=2, ttl=60)
+        other = cache.SharedTTLCache(path, 'containers', max_size=2, ttl=60)
+        first.set(('default', 1, 'bucket', 'a.txt'), {'size': 1})
+        self.assertEqual(second.get(('default', 1, 'bucket', 'a.txt')), {'size': 1})
+        self.assertIs(other.get(('default', 1, 'bucket', 'a.txt')), cache.MISSING)
+
+        second.set(('default', 1, 'bucket', 'b.txt'), {'size': 2})
+        second.set(('default', 1, 'other', 'c.txt'), {'size': 3})
+        # The entry closest to expiry makes room
+        self.assertEqual(len(first), 2)
+        self.assertIs(first.get(('default', 1, 'bucket', 'a.txt')), cache.MISSING)
+        self.assertEqual(first.invalidate_where(lambda key: key[2] == 'bucket'), 1)
+        self.assertIs(second.peek(('default', 1, 'bucket', 'b.txt')), cache.MISSING)
+
+        # Lookups never write; expired rows are removed by the next set
+        with mock.patch('cache.time.time', return_value=time.time() + 120):
+            self.assertIs(second.get(('default', 1, 'other', 'c.txt')), cache.MISSING)
+            second.set(('default', 1, 'other', 'd.txt'), {'size': 4})
+        stats = second.stats()
+        self.assertEqual((stats['hits'], stats['expirations'], stats['evictions']), (1, 1, 1))
+        self.assertEqual(stats['shared_path'], path)
+
+        # Tools keep the shared cache's SQLite calls off the event loop
+        loop_thread = threading.get_ident()
+        lookups = []
+        original_lookup = cache.SharedTTLCache._lookup
+
+        def record_lookup(self, key):
+            lookups.append(threading.get_ident())
+            return original_lookup(self, key)
+
+        with mock.patch.object(storage, 'object_cache', cache.SharedTTLCache(path, 'tool', ttl=60)), \
+                mock.patch.object(cache.SharedTTLCache, '_lookup', record_lookup):
+            self.assertEqual(self.run_async(storage.get_object('bucket', 'a.txt'))['size'], len(b'a.txt'))
+            self.assertEqual(self.run_async(storage.get_object('bucket', 'a.txt'))['size'], len(b'a.txt'))
+            self.assertEqual(storage.object_cache.stats()['hits'], 1)
+        self.assertTrue(lookups)
+        self.assertNotIn(loop_thread, lookups)
+
+    def test_upload_invalidates_object_cache(self):
+        """Test that uploading through the tool drops stale cached metadata"""
+        self.run_async(storage.get_object('bucket', 'a.txt'))
+        source = os.path.join(self.workdir, 'a.txt')
+        with open(source, 'wb') as f:
+            f.write(b'new content')
+        self.run_async(storage.upload_object('bucket', 'a.txt', source))
+        result = self.run_async(storage.get_object('bucket', 'a.txt'))
+        self.assertEqual(result['size'], len(b'new content'))
+
+    def test_upload_data_with_compression(self):
+        """Test uploading content from memory, compressed and checksummed in one pass"""
+        text = 'line of log output\n' * 1000
+        result = self.run_async(storage.upload_object('bucket', 'logs/app.log', data=text, compression='gzip'))
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['original_size'], len(text))
+        self.assertLess(result['stored_size'], len(text) / 10)
+        self.assertEqual(result['sha256'], hashlib.sha256(text.encode()).hexdigest())
+        stored = b''.join(cloud.driver.download_object_as_stream(self.container.get_object('logs/app.log')))
+        self.assertEqual(gzip.decompress(stored).decode(), text)
+
+        result = self.run_async(storage.upload_object('bucket', 'blob.bin', data='AAEC/w==', encoding='base64'))
+        self.assertEqual(result['size'], 4)
+        self.assertIsNone(result['compression'])
+        self.assertIn('error', self.run_async(storage.upload_object('bucket', 'x', data='%%', encoding='base64')))
+        self.assertIn('error', self.run_async(storage.upload_object('bucket', 'x')))
+        self.assertIn('error', self.run_async(storage.upload_object('bucket', 'x', data='a', compression='lz4')))
+
+    @unittest.skipUnless(importlib.util.find_spec('moto'), "moto is required for a local S3 endpoint")
+    def test_compressed_upload_round_trip(self):
+        """Test that downloads decompress objects compressed on upload, but not ordinary .gz objects"""
+        profile = self.start_s3_stand_in()
+        self.addCleanup(cloud.profiles.pop, 's3-async', None)
+        cloud.register_profile('s3-async', 'aws', 'key', 'secret', 'us-east-1', host='localhost',
+                               port=profile.driver_kwargs['port'], secure=False, backend='async')
+        text = '{"event": "login"}\n' * 500
+
+        async def upload():
+            try:
+                return await storage.upload_object('remote', 'events.jsonl', data=text, compression='gzip',
+                                                   profile='s3-async')
+            finally:
+                await s3async.close_clients()
+
+        result = self.run_async(upload())
+        self.assertTrue(result['etag_verified'])
+        archive = base64.b64encode(gzip.compress(b'raw')).decode()
+        self.run_async(storage.upload_object('remote', 'archive.gz', data=archive, encoding='base64', profile='s3'))
+
+        destination = os.path.join(self.workdir, 'events.jsonl')
+        result = self.run_async(storage.download_object('remote', 'events.jsonl', destination, profile='s3'))
+        self.assertEqual((result['decompressed'], result['size']), ('gzip', len(text)))
+        with open(destination) as f:
+            self.assertEqual(f.read(), text)
+        result = self.run_async(storage.download_object('remote', 'events.jsonl', destination, decompress=False,
+                                                        profile='s3'))
+        self.assertNotIn('decompressed', result)
+
+        result = self.run_async(storage.download_objects('remote', os.path.join(self.workdir, 'all'), prefix='',
+                                                         profile='s3'))
+        self.assertEqual({item['name']: item.get('decompressed') for item in result['items']},
+                         {'archive.gz': None, 'events.jsonl': 'gzip'})
+
+    def test_delete_object(self):
+        """Test deleting an object without a metadata lookup"""
+        result = self.run_async(storage.delete_object('bucket', 'a.txt'))
+        self.assertEqual(result['status'], 'success')
+        result = self.run_async(storage.get_object('bucket', 'a.txt'))
+        self.assertIn('error', result)
+
+    def test_download_missing_object(self):
+        """Test that a streamed download of a missing object leaves no file behind"""
+        destination = os.path.join(self.workdir, 'missing.txt')
+        result = self.run_async(storage.download_object('bucket', 'missing.txt', destination))
+        self.assertIn('error', result)
+        self.assertFalse(os.path.exists(destination))
+        self.assertFalse(os.path.exists(destination + '.part'))
+
+    def test_read_object_pages_through_content(self):
+        """Test that read_object returns capped pages that split only on character boundaries"""
+        text = 'héllo wörld ' * 50
+        self.container.upload_object_via_stream(iter([text.encode('utf-8')]), 'notes.txt')
+        pages = []
+        offset = 0
+        with mock.patch.dict(os.environ, {'READ_MAX_BYTES': '64'}):
+            while offset is not None:
+                result = self.run_async(storage.read_object('bucket', 'notes.txt', offset=offset))
+                self.assertLessEqual(result['bytes'], 64)
+                pages.append(result['content'])
+                offset = result['next_offset']
+        self.assertEqual(''.join(pages), text)
+        self.assertTrue(result['eof'])
+
+        result = self.run_async(storage.read_object('bucket', 'notes.txt', offset=-7, length=4))
+        self.assertEqual(result['content'], 'wör')
+        self.assertFalse(result['truncated'])
+
+    def test_read_object_binary_and_errors(self):
+        """Test base64 output for binary content and errors for missing objects or bad encodings"""
+        self.container.upload_object_via_stream(iter([b'\x00\x01\x02\xff']), 'blob.bin')
+        result = self.run_async(storage.read_object('bucket', 'blob.bin'))
+        self.assertEqual(result['encoding'], 'base64')
+        self.assertEqual(result['content'], 'AAEC/w==')
+        self.assertIsNone(result['next_offset'])
+
+        result = self.run_async(storage.read_object('bucket', 'blob.bin', offset=10))
+        self.assertEqual(result['bytes'], 0)
+        self.assertTrue(result['eof'])
+        self.assertIn('error', self.run_async(storage.read_object('bucket', 'missing.txt')))
+        self.assertIn('error', self.run_async(storage.read_object('bucket', 'a.txt', encoding='nope')))
+
+    def test_archive_members_and_extraction(self):
+        """Test listing and extracting zip and tar members with ranged reads"""
+        payload = os.urandom(300 * 1024)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('big.bin', payload)
+            for i in range(50):
+                archive.writestr(f'docs/{i}.txt', f'doc {i}')
+        self.container.upload_object_via_stream(iter([buffer.getvalue()]), 'data.zip')
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w') as archive:
+            for name, data in [('big.bin', payload), ('notes/readme.txt', b'hello')]:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        self.container.upload_object_via_stream(iter([buffer.getvalue()]), 'data.tar')
+
+        result = self.run_async(storage.list_archive_members('bucket', 'data.zip', prefix='docs/', max_members=20))
+        self.assertEqual(result['format'], 'zip')
+        self.assertEqual(result['total'], 50)
+        self.assertEqual([member['name'] for member in result['members']][:2], ['docs/0.txt', 'docs/1.txt'])
+        self.assertEqual(result['next_offset'], 20)
+        # Only the central directory at the end of the archive is read
+        self.assertLess(result['bytes'], len(payload) / 2)
+
+        result = self.run_async(storage.list_archive_members('bucket', 'data.tar'))
+        self.assertEqual([(member['name'], member['size']) for member in result['members']],
+                         [('big.bin', len(payload)), ('notes/readme.txt', 5)])
+        self.assertIsNone(result['next_offset'])
+        self.assertLess(result['bytes'], len(payload) / 2)
+
+        destination = os.path.join(self.workdir, 'out', 'readme.txt')
+        result = self.run_async(storage.extract_archive_member('bucket', 'data.tar', 'notes/readme.txt',
+                                                               destination))
+        self.assertEqual(result['status'], 'success')
+        with open(destination, 'rb') as f:
+            self.assertEqual(f.read(), b'hello')
+        destination = os.path.join(self.workdir, 'big.bin')
+        result = self.run_async(storage.extract_archive_member('bucket', 'data.zip', 'big.bin', destination))
+        with open(destination, 'rb') as f:
+            self.assertEqual(f.read(), payload)
+
+        self.assertIn('error', self.run_async(storage.extract_archive_member('bucket', 'data.zip', 'nope',
+                                                                             destination)))
+        self.assertIn('error', self.run_async(storage.list_archive_members('bucket', 'a.txt')))
+
+    def test_preview_object_formats(self):
+        """Test CSV, JSON Lines, gzip, Parquet footer and archive member previews"""
+        rows = ''.join(f'{i},"name, {i}"\n' for i in range(100))
+        self.container.upload_object_via_stream(iter([f'id,name\n{rows}'.encode()]), 'table.csv')
+        self.container.upload_object_via_stream(iter([gzip.compress(b'{"a": 1}\nnot json\n{"b": 2}\n')]),
+                                                'events.jsonl.gz')
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('inner.tsv', 'x\ty\n1\t2\n')
+        self.container.upload_object_via_stream(iter([buffer.getvalue()]), 'bundle.zip')
+        schema = [
+            {4: (8, b'schema'), 5: (5, 2)},
+            {1: (5, 2), 3: (5, 0), 4: (8, b'id')},
+            {1: (5, 6), 3: (5, 1), 4: (8, b'name'), 6: (5, 0)}
+        ]
+        row_group = {1: (9, (12, [{3: (12, {4: (5, 6)})}])), 2: (6, 100), 3: (6, 3)}
+        footer = _thrift(12, {1: (5, 1), 2: (9, (12, schema)), 3: (6, 3), 4: (9, (12, [row_group])),
+                              6: (8, b'test writer')})
+        parquet = b'PAR1' + bytes(1000) + footer + struct.pack('<I', len(footer)) + b'PAR1'
+        self.container.upload_object_via_stream(iter([parquet]), 'table.parquet')
+
+        result = self.run_async(storage.preview_object('bucket', 'table.csv', max_rows=3))
+        self.assertEqual(result['format'], 'csv')
+        self.assertEqual(result['columns'], ['id', 'name'])
+        self.assertEqual(result['rows'], [['0', 'name, 0'], ['1', 'name, 1'], ['2', 'name, 2']])
+        self.assertTrue(result['truncated'])
+
+        result = self.run_async(storage.preview_object('bucket', 'events.jsonl.gz'))
+        self.assertEqual((result['format'], result['compression']), ('jsonl', 'gzip'))
+        self.assertEqual(result['rows'], [{'a': 1}, {'b': 2}])
+        self.assertEqual(result['columns'], ['a', 'b'])
+        self.assertEqual(result['errors'][0]['line'], 2)
+        self.assertFalse(result['truncated'])
+
+        result = self.run_async(storage.preview_object('bucket', 'table.parquet'))
+        self.assertEqual(result['num_rows'], 3)
+        self.assertEqual(result['columns'], [
+            {'name': 'id', 'type': 'INT64', 'logical_type': None, 'repetition': 'REQUIRED'},
+            {'name': 'name', 'type': 'BYTE_ARRAY', 'logical_type': 'UTF8', 'repetition': 'OPTIONAL'}
+        ])
+        self.assertEqual(result['compression'], ['ZSTD'])
+        self.assertEqual(result['created_by'], 'test writer')
+
+        result = self.run_async(storage.preview_object('bucket', 'bundle.zip', member='inner.tsv'))
+        self.assertEqual((result['columns'], result['rows']), (['x', 'y'], [['1', '2']]))
+        result = self.run_async(storage.preview_object('bucket', 'bundle.zip'))
+        self.assertEqual([member['name'] for member in result['members']], ['inner.tsv'])
+        self.assertIn('error', self.run_async(storage.preview_object('bucket', 'a.txt', format='nope')))
+
+    def test_search_objects(self):
+        """Test that matching lines are reported with their object, line number and offset"""
+        self.container.upload_object_via_stream(iter([b'ok\nERROR disk full\nok\nerror retry\n']), 'logs/3.log')
+        self.container.upload_object_via_stream(iter([b'\x00ERROR\n']), 'logs/4.bin')
+        result = self.run_async(storage.search_objects('bucket', 'error', prefix='logs/', ignore_case=True))
+        self.assertEqual(result['matches'], [
+            {'object_name': 'logs/3.log', 'line': 2, 'offset': 3, 'text': 'ERROR disk full'},
+            {'object_name': 'logs/3.log', 'line': 4, 'offset': 22, 'text': 'error retry'},
+        ])
+        self.assertEqual(result['objects_scanned'], 3)
+        self.assertEqual(result['objects_skipped'], 1)
+        self.assertFalse(result['truncated'])
+
+        # Exactly max_results matches is not a truncated result
+        result = self.run_async(storage.search_objects('bucket', 'log', max_results=2))
+        self.assertEqual(result['count'], 2)
+        self.assertFalse(result['truncated'])
+        self.assertFalse(result['objects_truncated'])
+        result = self.run_async(storage.search_objects('bucket', 'log', max_results=1))
+        self.assertEqual(result['count'], 1)
+        self.assertTrue(result['truncated'])
+        result = self.run_async(storage.search_objects('bucket', 'log', max_objects=2))
+        self.assertTrue(result['objects_truncated'])
+        self.assertIn('error', self.run_async(storage.search_objects('bucket', '(')))
+
+    def test_listing_index(self):
+        """Test crawling a bucket into the index, querying it and keeping it current"""
+        index.configure(os.path.join(self.workdir, 'index.sqlite3'), 0)
+        self.addCleanup(index.configure, '', 0)
+        self.assertIn('error', self.run_async(storage.query_index('bucket')))
+
+        self.container.upload_object_via_stream(iter([b'x' * 100]), 'logs/big.log')
+        result = self.run_async(storage.index_bucket('bucket', wait=True))
+        self.assertEqual(result['index']['status'], 'complete')
+        self.assertEqual(result['index']['objects_indexed'], 4)
+
+        result = self.run_async(storage.query_index('bucket', prefix='logs/', sort='size', descending=True,
+                                                    limit=2))
+        self.assertEqual([obj['name'] for obj in result['objects']], ['logs/big.log', 'logs/1.log'])
+        self.assertTrue(result['index']['complete'])
+        self.assertGreaterEqual(result['index']['age_seconds'], 0)
+
+        stats = self.run_async(storage.get_bucket_stats('bucket', delimiter='/'))
+        self.assertEqual(stats['objects'], 4)
+        self.assertEqual(stats['total_size'], 5 + 10 + 10 + 100)
+        self.assertEqual(stats['folders'], [{'name': 'logs/', 'objects': 3, 'total_size': 120}])
+        self.assertEqual(stats['direct_objects'], 1)
+
+        # Writes through the server update the index; a re-crawl drops objects deleted elsewhere
+        source = os.path.join(self.workdir, 'new.txt')
+        with open(source, 'wb') as f:
+            f.write(b'new')
+        self.run_async(storage.upload_object('bucket', 'new.txt', source))
+        self.run_async(storage.delete_object('bucket', 'a.txt'))
+        self.container.get_object('logs/1.log').delete()
+        names = [obj['name'] for obj in self.run_async(storage.query_index('bucket'))['objects']]
+        self.assertEqual(names, ['logs/1.log', 'logs/2.log', 'logs/big.log', 'new.txt'])
+        self.run_async(storage.index_bucket('bucket', prefix='logs/', wait=True))
+        names = [obj['name'] for obj in self.run_async(storage.query_index('bucket'))['objects']]
+        self.assertEqual(names, ['logs/2.log', 'logs/big.log', 'new.txt'])
+        self.assertEqual(self.run_async(storage.query_index('bucket', prefix='logs/'))['index']['prefix'], 'logs/')
+        inventory = self.run_async(storage.bucket_inventory(['bucket']))
+        self.assertEqual(inventory['buckets'][0]['source'], 'index')
+        self.assertEqual(inventory['total_objects'], 3)
+
+    def test_bucket_inventory(self):
+        """Test per-bucket totals, partial results and streamed progress"""
+        other = cloud.driver.create_container('other')
+        other.upload_object_via_stream(iter([b'x' * 10]), 'one')
+        other.upload_object_via_stream(iter([b'x' * 20]), 'two')
+        ctx = mock.AsyncMock()
+        result = self.run_async(storage.bucket_inventory(ctx=ctx))
+        self.assertEqual([bucket['name'] for bucket in result['buckets']], ['bucket', 'other'])
+        self.assertEqual(result['buckets'][1]['objects'], 2)
+        self.assertEqual(result['buckets'][1]['total_size'], 30)
+        self.assertIsNotNone(result['buckets'][1]['last_modified'])
+        self.assertEqual(result['complete'], 2)
+        self.assertEqual(result['total_objects'], 5)
+        self.assertEqual(ctx.info.await_count, 2)
+        ctx.report_progress.assert_awaited_with(2, 2)
+
+        result = self.run_async(storage.bucket_inventory(['bucket', 'missing'], max_objects_per_bucket=2))
+        self.assertEqual(result['buckets'][0]['stopped'], 'max_objects')
+        self.assertEqual(result['partial'], 1)
+        self.assertEqual(result['failed'], 1)
+        self.assertIn('error', result['buckets'][1])
+
+    def test_ranged_download_resumes(self):
+        """Test that an interrupted ranged download only fetches the missing parts"""
+        payload = os.urandom(transfer.MIN_PART_SIZE * 2 + 1024)
+        self.container.upload_object_via_stream(iter([payload]), 'big.bin')
+        destination = os.path.join(self.workdir, 'big.bin')
+        original = transfer._download_part
+
+        def fail_last_part(profile, obj, partial_path, part_number, offset, length, retries):
+            if part_number == 3:
+                raise IOError("connection reset")
+            return original(profile, obj, partial_path, part_number, offset, length, retries)
+
+        with mock.patch.object(transfer, '_download_part', side_effect=fail_last_part), \
+                mock.patch.dict(os.environ, {transfer.ENV_TRANSFER_PART_RETRIES: '0'}):
+            result = self.run_async(storage.download_object('bucket', 'big.bin', destination, parallel=True,
+                                                            part_size=transfer.MIN_PART_SIZE))
+        self.assertIn('error', result)
+        self.assertTrue(transfer.has_resume_state(destination))
+
+        result = self.run_async(storage.download_object('bucket', 'big.bin', destination,
+                                                        part_size=transfer.MIN_PART_SIZE))
+        self.assertEqual(result['mode'], 'ranged')
+        self.assertEqual(result['resumed_parts'], 2)
+        self.assertFalse(transfer.has_resume_state(destination))
+        with open(destination, 'rb') as f:
+            self.assertEqual(f.read(), payload)
+
+    @unittest.skipUnless(importlib.util.find_spec('moto'), "moto is required for a local S3 endpoint")
+    def test_multipart_upload_retries_parts_and_aborts(self):
+        """Test that large files upload in parts, failed parts are retried and a failed upload is aborted"""
+        profile = self.start_s3_stand_in()
+        payload = os.urandom(transfer.MIN_PART_SIZE * 2 + 1024)
+        source = os.path.join(self.workdir, 'big.bin')
+        with open(source, 'wb') as f:
+            f.write(payload)
+        container = profile.get_driver().get_container('remote')
+        original = cloud.get_thread_driver
+        calls = []
+
+        def flaky_driver(name):
+            # Each part attempt fetches its thread's driver first: fail the first attempt, or every one while failing
+            calls.append(name)
+            if len(calls) == 1 or failing:
+                raise ConnectionError("connection reset")
+            return original(name)
+
+        settings = {transfer.ENV_TRANSFER_MULTIPART_THRESHOLD: str(transfer.MIN_PART_SIZE),
+                    transfer.ENV_TRANSFER_PART_RETRIES: '1'}
+        with mock.patch.dict(os.environ, settings), mock.patch.object(cloud, 'get_thread_driver', flaky_driver):
+            failing = False
+            result = self.run_async(storage.upload_object('remote', 'big.bin', source,
+                                                          part_size=transfer.MIN_PART_SIZE, profile='s3'))
+            self.assertEqual((result['mode'], result['parts']), ('multipart', 3))
+            self.assertEqual(len(calls), 4)
+
+            failing = True
+            failed = self.run_async(storage.upload_object('remote', 'broken.bin', source,
+                                                          part_size=transfer.MIN_PART_SIZE, profile='s3'))
+        self.assertIn('error', failed)
+        self.assertEqual(b''.join(profile.get_driver().download_object_as_stream(container.get_object('big.bin'))),
+                         payload)
+        self.assertEqual(list(profile.get_driver().ex_iterate_multipart_uploads(container)), [])
+        self.assertNotIn('broken.bin', [obj.name for obj in container.list_objects()])
+
+    @unittest.skipUnless(importlib.util.find_spec('moto'), "moto is required for a local S3 endpoint")
+    def test_large_download_is_ranged_without_cached_metadata(self):
+        """Test that a default download of an object over the threshold is ranged after one metadata request"""
+        profile = self.start_s3_stand_in()
+        payload = os.urandom(transfer.MIN_PART_SIZE * 2 + 1024)
+        container = profile.get_driver().get_container('remote')
+        container.upload_object_via_stream(iter([payload]), 'big.bin')
+        container.upload_object_via_stream(iter([b'small']), 'small.txt')
+        storage.object_cache.clear()
+        destination = os.path.join(self.workdir, 'big.bin')
+
+        with mock.patch.dict(os.environ, {transfer.ENV_TRANSFER_MULTIPART_THRESHOLD: str(transfer.MIN_PART_SIZE)}):
+            result = self.run_async(storage.download_object('remote', 'big.bin', destination,
+                                                            part_size=transfer.MIN_PART_SIZE, profile='s3'))
+            small = self.run_async(storage.download_object('remote', 'small.txt',
+                                                           os.path.join(self.workdir, 'small.txt'), profile='s3'))
+        self.assertEqual(result['mode'], 'ranged')
+        self.assertEqual(result['parts'], 3)
+        with open(destination, 'rb') as f:
+            self.assertEqual(f.read(), payload)
+        self.assertNotIn('mode', small)
+        self.assertEqual(small['size'], 5)
+
+    def test_batch_download_by_prefix(self):
+        """Test downloading every object under a prefix in one call"""
+        result = self.run_async(storage.download_objects('bucket', self.workdir, prefix='logs/'))
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual([item['name'] for item in result['items']], ['logs/1.log', 'logs/2.log'])
+        with open(os.path.join(self.workdir, 'logs', '2.log'), 'rb') as f:
+            self.assertEqual(f.read(), b'logs/2.log')
+
+    def test_identical_calls_are_coalesced(self):
+        """Test that concurrent identical calls share one provider call and different calls do not"""
+        original = storage._list_page
+        calls = []
+
+        def slow_list_page(*args):
+            calls.append(args[2])
+            time.sleep(0.2)
+            return original(*args)
+
+        async def run():
+            return await asyncio.gather(*[storage.list_all_objects('bucket', prefix=prefix)
+                                          for prefix in ['logs/'] * 4 + ['a']])
+
+        with mock.patch.object(storage, '_list_page', side_effect=slow_list_page):
+            results = self.run_async(run())
+        self.assertEqual(sorted(calls), ['a', 'logs/'])
+        self.assertEqual(results[0], results[3])
+        self.assertEqual(results[0]['count'], 2)
+        self.assertEqual(results[4]['count'], 1)
+        stats = dispatch.get_stats()
+        self.assertEqual(stats['tools']['list_all_objects']['coalesced'], 3)
+        self.assertEqual(stats['tools']['list_all_objects']['completed'], 2)
+        self.assertEqual(stats['shared_in_flight'], 0)
+
+    def test_bulk_delete_and_move(self):
+        """Test dry runs, moves by prefix and deletes by name with the per-object fallback"""
+        result = self.run_async(storage.delete_objects('bucket', prefix='logs/', dry_run=True))
+        self.assertEqual(result['matched'], 2)
+        self.assertEqual(result['deleted'], 0)
+        self.assertEqual(len(list(self.container.list_objects())), 3)
+
+        result = self.run_async(storage.copy_objects('bucket', prefix='logs/', destination_prefix='archive/',
+                                                     move=True))
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['mode'], 'stream')
+        self.assertEqual(result['copied'], 2)
+        self.assertEqual(sorted(obj.name for obj in self.container.list_objects()),
+                         ['a.txt', 'archive/1.log', 'archive/2.log'])
+        self.assertIn('error', self.run_async(storage.copy_objects('bucket', object_names=['a.txt'])))
+
+        result = self.run_async(storage.delete_objects('bucket', object_names=['archive/1.log', 'missing']))
+        self.assertEqual(result['mode'], 'individual')
+        self.assertEqual(result['status'], 'partial')
+        self.assertEqual(result['deleted'], 1)
+        self.assertEqual(result['items'][0]['name'], 'missing')
+        self.assertEqual(sorted(obj.name for obj in self.container.list_objects()), ['a.txt', 'archive/2.log'])
+
+    def test_download_cache(self):
+        """Test that unchanged objects are served from the download cache and evicted by size"""
+        filecache.configure(os.path.join(self.workdir, 'cache'), in_max_size=12, in_link_mode='hardlink')
+        self.addCleanup(filecache.configure, '')
+        first = os.path.join(self.workdir, 'first.txt')
+        second = os.path.join(self.workdir, 'second.txt')
+        result = self.run_async(storage.download_object('bucket', 'a.txt', first))
+        self.assertEqual(result['cache'], 'miss')
+        result = self.run_async(storage.download_object('bucket', 'a.txt', second))
+        self.assertEqual(result['cache'], 'hit')
+        self.assertEqual(result['served_by'], 'hardlink')
+        with open(second, 'rb') as f:
+            self.assertEqual(f.read(), b'a.txt')
+
+        # A changed object has a new ETag; downloading over the hardlink leaves the cached copy intact
+        self.container.upload_object_via_stream(iter([b'changed']), 'a.txt')
+        result = self.run_async(storage.download_object('bucket', 'a.txt', second))
+        self.assertEqual(result['cache'], 'miss')
+        with open(second, 'rb') as f:
+            self.assertEqual(f.read(), b'changed')
+        with open(first, 'rb') as f:
+            self.assertEqual(f.read(), b'a.txt')
+
+        result = self.run_async(storage.download_objects('bucket', self.workdir, prefix='logs/'))
+        self.assertEqual(result['status'], 'success')
+        stats = self.run_async(storage.get_cache_stats())['downloads']
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['stores'], 4)
+        self.assertLessEqual(stats['size'], 12)
+        self.assertEqual(stats['evictions'], 3)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_batch_download_reports_item_errors(self):
+        """Test that one missing object does not fail the whole batch"""
+        result = self.run_async(storage.download_objects('bucket', self.workdir,
+                                                         object_names=['a.txt', 'missing.txt', '../escape']))
+        self.assertEqual(result['status'], 'partial')
+        self.assertEqual(result['succeeded'], 1)
+        self.assertEqual(result['failed'], 2)
+        self.assertEqual(result['bytes'], len(b'a.txt'))
+
+    def test_batch_upload_directory(self):
+        """Test uploading a directory tree under a prefix"""
+        os.makedirs(os.path.join(self.workdir, 'src', 'sub'))
+        for name in ['one.txt', os.path.join('sub', 'two.txt')]:
+            with open(os.path.join(self.workdir, 'src', name), 'wb') as f:
+                f.write(b'data')
+        result = self.run_async(storage.upload_objects('bucket', source_dir=os.path.join(self.workdir, 'src'),
+                                                       prefix='up/'))
+        self.assertEqual(result['succeeded'], 2)
+        listed = self.run_async(storage.list_all_objects('bucket', prefix='up/'))
+        self.assertEqual([obj['name'] for obj in listed['objects']], ['up/one.txt', 'up/sub/two.txt'])
+
+    def test_sync_prefix_transfers_only_changes(self):
+        """Test that a second sync skips unchanged files and picks up new ones"""
+        target = os.path.join(self.workdir, 'mirror')
+        result = self.run_async(storage.sync_prefix('bucket', target, prefix='logs/'))
+        self.assertEqual(result['transferred'], 2)
+        self.assertTrue(os.path.exists(os.path.join(target, '1.log')))
+
+        result = self.run_async(storage.sync_prefix('bucket', target, prefix='logs/'))
+        self.assertEqual(result['transferred'], 0)
+        self.assertEqual(result['skipped'], 2)
+
+        with open(os.path.join(target, '3.log'), 'wb') as f:
+            f.write(b'new')
+        result = self.run_async(storage.sync_prefix('bucket', target, prefix='logs/', direction='upload',
+                                                     dry_run=True))
+        self.assertEqual([item['name'] for item in result['items']], ['logs/3.log'])
+        result = self.run_async(storage.sync_prefix('bucket', target, prefix='logs/', direction='upload'))
+        self.assertEqual(result['transferred'], 1)
+        self.assertEqual(self.run_async(storage.get_object('bucket', 'logs/3.log'))['size'], 3)
+
+        # A prefix without a trailing slash is a folder and does not match sibling prefixes
+        self.container.upload_object_via_stream(iter([b'other']), 'logs2/x.log')
+        sibling = os.path.join(self.workdir, 'sibling')
+        result = self.run_async(storage.sync_prefix('bucket', sibling, prefix='logs'))
+        self.assertEqual(result['transferred'], 3)
+        self.assertEqual(sorted(os.listdir(sibling)), ['1.log', '2.log', '3.log'])
+        with open(os.path.join(sibling, 'new.log'), 'wb') as f:
+            f.write(b'new')
+        result = self.run_async(storage.sync_prefix('bucket', sibling, prefix='logs', direction='upload'))
+        self.assertEqual([item['name'] for item in result['items']], ['logs/new.log'])
+        self.assertEqual(self.run_async(storage.get_object('bucket', 'logs/new.log'))['size'], 3)
+
+    def test_missing_bucket_returns_error(self):
+        """Test that provider errors are returned as error dicts"""
+        result = self.run_async(storage.get_object('missing', 'a.txt'))
+        self.assertIn('error', result)
+
+    def test_lazy_driver_initialization(self):
+        """Test that a lazily configured driver is built on the first tool call"""
+        profile = cloud.initialize_cloud_driver_from_env('local', self.root, 'unused', 'local', lazy=True)
+        self.assertIsNone(cloud.driver)
+        result = self.run_async(storage.get_object('bucket', 'a.txt'))
+        self.assertEqual(result['name'], 'a.txt')
+        self.assertIs(cloud.driver, profile.get_driver())
+
+    def test_metrics_instrumentation(self):
+        """Test that instrumented tools record calls, errors, bytes and provider requests"""
+        download = metrics.instrument('download_object', storage.download_object)
+        get_object = metrics.instrument('get_object', storage.get_object)
+        destination = os.path.join(self.workdir, 'a.txt')
+        self.run_async(download('bucket', 'a.txt', destination))
+        self.run_async(get_object('bucket', 'missing.txt'))
+
+        def _counted_list(*args):
+            # Provider requests made on worker threads are attributed to the calling tool
+            metrics.record_provider_request('local')
+            return []
+
+        async def list_things(bucket_name):
+            return await dispatch.run_blocking('list_things', _counted_list)
+
+        self.run_async(metrics.instrument('list_things', list_things)('bucket'))
+
+        series = {item['tool']: item for item in metrics.get_metrics()['series']}
+        self.assertEqual(series['download_object']['bytes'], len(b'a.txt'))
+        self.assertEqual(series['download_object']['bucket'], 'bucket')
+        self.assertEqual(series['download_object']['provider'], 'local')
+        self.assertEqual(series['get_object']['error_rate'], 1.0)
+        self.assertEqual(series['list_things']['provider_requests'], 1)
+        self.assertEqual(series['list_things']['latency_histogram']['+Inf'], 1)
+        self.assertIn('mcp_cloud_tool_calls_total{tool="get_object",provider="local",bucket="bucket"} 1',
+                      metrics.export_prometheus())
+
+    def test_slow_call_hook_receives_profile(self):
+        """Test that calls over the slow call threshold are reported with a profile"""
+        reports = []
+        metrics.add_slow_call_hook(reports.append)
+        self.addCleanup(metrics.remove_slow_call_hook, reports.append)
+        with mock.patch.object(metrics, 'slow_call_seconds', 1e-9), \
+                mock.patch.object(metrics, 'profile_slow_calls', True):
+            self.run_async(metrics.instrument('list_buckets', storage.list_buckets)())
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0]['tool'], 'list_buckets')
+        self.assertIn('_list_buckets', reports[0]['profile'])
+
+    def test_resilience_retries_throttled_requests(self):
+        """Test that throttled and transient failures are retried and slow the limiter down"""
+        from libcloud.common.types import LibcloudError
+        from libcloud.storage.types import ObjectDoesNotExistError
+
+        policy = cloud.ResiliencePolicy('test', max_retries=3, base_delay=0, threshold=0)
+        policy.limiter = mock.Mock()
+        responses = [LibcloudError("Unknown error. Status code: 503"), ConnectionError("reset"), 'ok']
+
+        def request():
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        self.assertEqual(policy.call(request, True), 'ok')
+        self.assertEqual(policy.retries, 2)
+        policy.limiter.on_throttle.assert_called_once_with()
+
+        # Streamed bodies cannot be replayed and errors retrying cannot fix are raised at once
+        responses[:] = [LibcloudError("Unknown error. Status code: 500")]
+        self.assertRaises(LibcloudError, policy.call, request, False)
+        missing = ObjectDoesNotExistError("missing", None, 'a.txt')
+        self.assertEqual(cloud.classify_error(missing), cloud.ERROR_FATAL)
+        self.assertEqual(policy.retries, 2)
+
+    def test_circuit_breaker_opens_and_probes(self):
+        """Test that consecutive transient failures open the circuit until the cooldown ends"""
+        policy = cloud.ResiliencePolicy('test', max_retries=0, threshold=2, cooldown=60)
+        failing = mock.Mock(side_effect=ConnectionError("refused"))
+        for _ in range(2):
+            self.assertRaises(ConnectionError, policy.call, failing, True)
+        self.assertRaises(cloud.ProviderUnavailableError, policy.call, failing, True)
+        self.assertEqual(failing.call_count, 2)
+        self.assertEqual(policy.describe()['circuit_state'], 'open')
+
+        policy.breaker.cooldown = 0
+        self.assertEqual(policy.call(mock.Mock(return_value='ok'), True), 'ok')
+        self.assertEqual(policy.describe()['circuit_state'], 'closed')
+
+    def test_circuit_breaker_settles_unknown_and_cancelled_probes(self):
+        """Test that a probe ending in an unknown error or a cancellation reopens the circuit"""
+        from libcloud.common.types import LibcloudError
+
+        policy = cloud.ResiliencePolicy('test', max_retries=0, threshold=1, cooldown=0)
+        self.assertRaises(ConnectionError, policy.call, mock.Mock(side_effect=ConnectionError("refused")), True)
+        self.assertEqual(policy.describe()['circuit_state'], 'open')
+
+        wrong_region = mock.Mock(side_effect=LibcloudError("This bucket is located in a different region"))
+        self.assertEqual(cloud.classify_error(wrong_region.side_effect), cloud.ERROR_UNKNOWN)
+        self.assertRaises(LibcloudError, policy.call, wrong_region, True)
+        self.assertEqual(policy.describe()['circuit_state'], 'open')
+        self.assertEqual(policy.call(mock.Mock(return_value='ok'), True), 'ok')
+
+        self.assertRaises(ConnectionError, policy.call, mock.Mock(side_effect=ConnectionError("refused")), True)
+
+        async def probe_and_cancel():
+            task = asyncio.ensure_future(policy.call_async(asyncio.sleep, True, 60))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.run_async(probe_and_cancel())
+        self.assertEqual(policy.describe()['circuit_state'], 'open')
+        self.assertEqual(policy.call(mock.Mock(return_value='ok'), True), 'ok')
+        self.assertEqual(policy.describe()['circuit_state'], 'closed')
+
+    def test_worker_relays_messages_to_session_owner(self):
+        """Test that a worker relays session messages to the worker holding the session over its socket"""
+        import httpx
+        import uvicorn
+        from mcp.server.fastmcp import FastMCP
+        import serve
+
+        runtime_dir = tempfile.mkdtemp(prefix='mcp-')
+        self.addCleanup(shutil.rmtree, runtime_dir, True)
+        mcp = FastMCP("test")
+        front = serve.Worker(mcp, '101', runtime_dir)
+        owner = serve.Worker(mcp, '202', runtime_dir)
+
+        async def scenario():
+            server = uvicorn.Server(uvicorn.Config(owner.app(), uds=serve._socket_path(runtime_dir, '202'),
+                                                   lifespan='off', log_level='warning'))
+            serving = asyncio.ensure_future(server.serve())
+            while not server.started:
+                await asyncio.sleep(0.01)
+            direct = httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(uds=serve._socket_path(runtime_dir, '202')),
+                                       base_url='http://worker')
+            relayed = httpx.AsyncClient(transport=httpx.ASGITransport(app=front.app()), base_url='http://front')
+            try:
+                async with direct.stream('GET', serve.SSE_PATH) as stream:
+                    lines = stream.aiter_lines()
+                    endpoint = None
+                    while endpoint is None:
+                        line = await lines.__anext__()
+                        if line.startswith('data: '):
+                            endpoint = line[len('data: '):]
+                    self.assertEqual(owner.sessions, 1)
+                    ping = {'jsonrpc': '2.0', 'id': 1, 'method': 'ping'}
+                    accepted = await relayed.post(endpoint, json=ping)
+                    unknown = await relayed.post(endpoint.replace('/202/', '/303/'), json=ping)
+                    invalid = await relayed.post(endpoint.replace('/202/', '/..%2F202/'), json=ping)
+                    named = await relayed.post(endpoint.replace('/202/', '/worker/'), json=ping)
+                    owner.close_sessions()
+            finally:
+                await relayed.aclose()
+                await direct.aclose()
+                server.should_exit = True
+                await serving
+            return endpoint, accepted, unknown, invalid, named
+
+        endpoint, accepted, unknown, invalid, named = self.run_async(scenario())
+        self.assertTrue(endpoint.startswith('/messages/202/?session_id='))
+        self.assertEqual(accepted.status_code, 202)
+        self.assertEqual(owner.sessions, 0)
+        for response in (unknown, invalid, named):
+            self.assertEqual(response.status_code, 404)
+
+    def test_rate_limiter_backs_off_and_recovers(self):
+        """Test that throttling halves the rate, which then recovers to the configured limit"""
+        limiter = cloud.RateLimiter(rate=100)
+        limiter.on_throttle()
+        self.assertEqual(limiter.rate, 50)
+        limiter.on_throttle()
+        self.assertEqual(limiter.rate, 50)
+        with mock.patch.object(cloud.time, 'monotonic', return_value=time.monotonic() + 3600):
+            for _ in range(10):
+                limiter._adjusted_at = 0
+                limiter._recover(time.monotonic())
+        self.assertEqual(limiter.rate, 100)
+
+    def test_named_profiles(self):
+        """Test that tools route to the requested profile and keep separate caches"""
+        other_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other_root, True)
+        self.addCleanup(cloud.profiles.pop, 'other', None)
+        other = cloud.register_profile('other', 'local', other_root, None, None)
+        other.get_driver().create_container('bucket').upload_object_via_stream(iter([b'other']), 'a.txt')
+
+        default_result = self.run_async(storage.get_object('bucket', 'a.txt'))
+        other_result = self.run_async(storage.get_object('bucket', 'a.txt', profile='other'))
+        self.assertEqual(default_result['size'], len(b'a.txt'))
+        self.assertEqual(other_result['size'], len(b'other'))
+        self.assertIn('other', [profile['name'] for profile in self.run_async(storage.list_profiles())])
+
+        result = self.run_async(storage.list_buckets(profile='missing'))
+        self.assertEqual(result, [{'error': 'Unknown cloud profile: missing'}])
+
+    def start_s3_stand_in(self, backend: str = None):
+        """Start moto's S3 server on a free port and register it as the 's3' profile with a 'remote' bucket"""
+        import socket
+        from moto.server import ThreadedMotoServer
+
+        with socket.socket() as probe:
+            probe.bind(('localhost', 0))
+            port = probe.getsockname()[1]
+        server = ThreadedMotoServer(ip_address='localhost', port=port, verbose=False)
+        server.start()
+        self.addCleanup(server.stop)
+        # moto keeps its state per process, so start from an empty store
+        urllib.request.urlopen(urllib.request.Request(f'http://localhost:{port}/moto-api/reset', method='POST'))
+        self.addCleanup(cloud.profiles.pop, 's3', None)
+        profile = cloud.register_profile('s3', 'aws', 'key', 'secret', 'us-east-1', host='localhost', port=port,
+                                         secure=False, backend=backend)
+        profile.get_driver().create_container('remote')
+        return profile
+
+    @unittest.skipUnless(importlib.util.find_spec('moto'), "moto is required for a local S3 endpoint")
+    def test_async_backend_against_s3_stand_in(self):
+        """Test the asyncio S3 backend end to end against a local S3-compatible server"""
+        profile = self.start_s3_stand_in(backend='async')
+        source = os.path.join(self.workdir, 'source.txt')
+        with open(source, 'wb') as f:
+            f.write(b'0123456789' * 10)
+
+        async def scenario():
+            try:
+                uploaded = await storage.upload_object('remote', 'dir/a b.txt', source, profile='s3')
+                names = [f'dir/{i}.txt' for i in range(20)]
+                await asyncio.gather(*[storage.upload_object('remote', name, source, profile='s3')
+                                       for name in names])
+                heads = await asyncio.gather(*[storage.get_object('remote', name, revalidate=True, profile='s3')
+                                               for name in names])
+                listing = await storage.list_all_objects('remote', delimiter='/', profile='s3')
+                nested = await storage.list_all_objects('remote', prefix='dir/', page_size=5, profile='s3')
+                window = await storage.read_object('remote', 'dir/a b.txt', offset=-4, profile='s3')
+                missing = await storage.get_object('remote', 'dir/missing', profile='s3')
+                deleted = await storage.delete_object('remote', 'dir/a b.txt', profile='s3')
+                return uploaded, heads, listing, nested, window, missing, deleted
+            finally:
+                await s3async.close_clients()
+
+        uploaded, heads, listing, nested, window, missing, deleted = self.run_async(scenario())
+        self.assertEqual(uploaded['size'], 100)
+        self.assertEqual({head['size'] for head in heads}, {100})
+        self.assertEqual([(entry['name'], entry['type']) for entry in listing['objects']], [('dir/', 'folder')])
+        self.assertEqual(nested['count'], 5)
+        self.assertIsNotNone(nested['next_token'])
+        self.assertEqual(window['content'], '6789')
+        self.assertIn('error', missing)
+        self.assertEqual(deleted['status'], 'success')
+        remaining = profile.get_driver().get_container('remote').list_objects()
+        self.assertNotIn('dir/a b.txt', [obj.name for obj in remaining])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,442 @@
+import base64
+import contextvars
+import hashlib
+import json
+import os
+import re
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict
+
+import cloud
+from cloud import logger
+
+# Environment variable names
+ENV_TRANSFER_MAX_WORKERS = "TRANSFER_MAX_WORKERS"
+ENV_TRANSFER_PART_SIZE = "TRANSFER_PART_SIZE"
+ENV_TRANSFER_MULTIPART_THRESHOLD = "TRANSFER_MULTIPART_THRESHOLD"
+ENV_TRANSFER_CONCURRENCY = "TRANSFER_CONCURRENCY"
+ENV_TRANSFER_PART_RETRIES = "TRANSFER_PART_RETRIES"
+ENV_TRANSFER_BATCH_CONCURRENCY = "TRANSFER_BATCH_CONCURRENCY"
+
+MIB = 1024 * 1024
+# S3 rejects parts smaller than 5 MiB (except the last) and more than 10000 parts
+MIN_PART_SIZE = 5 * MIB
+MAX_PARTS = 10000
+DEFAULT_TRANSFER_MAX_WORKERS = 16
+DEFAULT_TRANSFER_PART_SIZE = 8 * MIB
+DEFAULT_TRANSFER_MULTIPART_THRESHOLD = 64 * MIB
+DEFAULT_TRANSFER_CONCURRENCY = 4
+DEFAULT_TRANSFER_PART_RETRIES = 3
+DEFAULT_TRANSFER_BATCH_CONCURRENCY = 8
+
+# Suffixes of the in-progress download file and its resume sidecar
+PARTIAL_SUFFIX = '.part'
+PROGRESS_SUFFIX = '.progress'
+READ_CHUNK_SIZE = 1024 * 1024
+_MD5_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Part-level worker pool, separate from the dispatch pool so that a tool call
+# running on a dispatch worker can wait on its parts without deadlocking
+executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the shared part transfer executor, creating it on first use"""
+    global executor
+    with _lock:
+        if executor is None:
+            workers = int(os.environ.get(ENV_TRANSFER_MAX_WORKERS, DEFAULT_TRANSFER_MAX_WORKERS))
+            executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="transfer")
+        return executor
+
+
+def shutdown(wait=True):
+    """Shut down the part transfer executor"""
+    global executor
+    with _lock:
+        old_executor = executor
+        executor = None
+    if old_executor is not None:
+        old_executor.shutdown(wait=wait)
+
+
+def get_part_size(part_size: int = None) -> int:
+    """Return the configured part size, never below the provider minimum"""
+    if not part_size:
+        part_size = int(os.environ.get(ENV_TRANSFER_PART_SIZE, DEFAULT_TRANSFER_PART_SIZE))
+    return max(MIN_PART_SIZE, part_size)
+
+
+def get_multipart_threshold() -> int:
+    """Return the size from which files and objects are transferred in parallel parts"""
+    return int(os.environ.get(ENV_TRANSFER_MULTIPART_THRESHOLD, DEFAULT_TRANSFER_MULTIPART_THRESHOLD))
+
+
+def get_concurrency(max_concurrency: int = None) -> int:
+    """Return the number of parts a single transfer may have in flight"""
+    if not max_concurrency:
+        max_concurrency = int(os.environ.get(ENV_TRANSFER_CONCURRENCY, DEFAULT_TRANSFER_CONCURRENCY))
+    return max(1, max_concurrency)
+
+
+def get_batch_concurrency(max_concurrency: int = None) -> int:
+    """Return the number of objects a batch transfer may have in flight"""
+    if not max_concurrency:
+        max_concurrency = int(os.environ.get(ENV_TRANSFER_BATCH_CONCURRENCY, DEFAULT_TRANSFER_BATCH_CONCURRENCY))
+    return max(1, max_concurrency)
+
+
+def get_part_retries() -> int:
+    """Return the number of retries allowed per part"""
+    return max(0, int(os.environ.get(ENV_TRANSFER_PART_RETRIES, DEFAULT_TRANSFER_PART_RETRIES)))
+
+
+def supports_multipart(driver) -> bool:
+    """Return True if the driver can upload parts of an object independently"""
+    return cloud.is_s3_driver(driver) and driver.supports_s3_multipart_upload
+
+
+def with_retries(func, retries: int, description: str):
+    """
+    Call func, retrying failures with jittered exponential backoff.
+
+    Individual provider requests are already retried by the profile's
+    resilience policy; this covers failures of the part as a whole (such as
+    a stream cut short) and gives up at once on errors retrying cannot fix.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= retries or cloud.classify_error(e) == cloud.ERROR_FATAL:
+                raise
+            delay = min(10.0, 0.5 * (2 ** attempt)) * random.uniform(0.5, 1.0)
+            attempt += 1
+            logger.warning(f"Retrying {description} in {delay:.2f}s (attempt {attempt}/{retries}): {str(e)}")
+            time.sleep(delay)
+
+
+def supports_ranges(driver) -> bool:
+    """Return True if the driver implements ranged object reads"""
+    from libcloud.storage.base import StorageDriver
+    return (type(driver).download_object_range_as_stream
+            is not StorageDriver.download_object_range_as_stream)
+
+
+def rebind_object(obj, driver):
+    """Return a copy of obj whose container and driver belong to the given driver"""
+    container = cloud.Container(name=obj.container.name, extra=obj.container.extra, driver=driver)
+    return cloud.Object(name=obj.name, size=obj.size, hash=obj.hash, extra=obj.extra,
+                        meta_data=obj.meta_data, container=container, driver=driver)
+
+
+def run_windowed(tasks, max_in_flight: int, on_result=None, keep_results: bool = True):
+    """
+    Run callables on the part executor with at most max_in_flight outstanding.
+
+    Stops submitting new work after the first failure and re-raises it once
+    outstanding work has finished.
+
+    Args:
+        tasks: Iterable of zero-argument callables
+        max_in_flight (int): Maximum number of tasks running or queued at once
+        on_result (Callable, optional): Called in the calling thread with each result as it completes
+        keep_results (bool, optional): Collect results in the returned list; disable for unbounded task streams
+
+    Returns:
+        List: Task results in completion order
+    """
+    pool = get_executor()
+    pending = set()
+    results = []
+    error = None
+    tasks = iter(tasks)
+
+    while True:
+        while error is None and len(pending) < max_in_flight:
+            task = next(tasks, None)
+            if task is None:
+                break
+            # Carry the caller's context so per-call metrics follow the work
+            pending.add(pool.submit(contextvars.copy_context().run, task))
+        if not pending:
+            break
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                if error is None:
+                    error = e
+                continue
+            if keep_results:
+                results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+    if error is not None:
+        raise error
+    return results
+
+
+def _upload_part(profile, container_name, container_extra, object_name, upload_id, file_path,
+                 part_number, offset, length, retries):
+    """Upload one part of a multipart upload from a byte range of file_path"""
+    def _put():
+        from libcloud.utils.py3 import httplib
+
+        driver = cloud.get_thread_driver(profile)
+        container = cloud.Container(name=container_name, extra=container_extra, driver=driver)
+
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+
+        # The Content-MD5 header lets the provider reject corrupted parts
+        headers = {
+            'Content-Length': len(data),
+            'Content-MD5': base64.b64encode(hashlib.md5(data).digest()).decode('utf-8'),
+        }
+        params = {'uploadId': upload_id, 'partNumber': part_number}
+        request_path = driver._get_object_path(container, object_name)
+        response = driver.connection.request(request_path, method='PUT', data=data,
+                                             headers=headers, params=params)
+        if response.status != httplib.OK:
+            raise cloud.LibcloudError(f"Error uploading part {part_number}", driver=driver)
+        return part_number, response.headers['etag'].replace('"', ''), len(data)
+
+    return with_retries(_put, retries, f"part {part_number} of {object_name}")
+
+
+def upload_file(driver, container, object_name: str, file_path: str, part_size: int = None,
+                max_concurrency: int = None, multipart_threshold: int = None,
+                profile: str = None) -> Dict[str, Any]:
+    """
+    Upload a local file, using a parallel multipart upload for large files.
+
+    Files smaller than the multipart threshold, and providers without
+    multipart support, use a single upload_object_via_stream call.
+
+    Args:
+        driver: libcloud storage driver owned by the calling thread
+        container: Destination libcloud Container
+        object_name (str): Name to give the uploaded object
+        file_path (str): Local path of the file to upload
+        part_size (int, optional): Bytes per part (minimum 5 MiB)
+        max_concurrency (int, optional): Parts uploaded at the same time
+        multipart_threshold (int, optional): Files at least this large use multipart upload
+        profile (str, optional): Cloud profile whose per-thread drivers upload the parts
+
+    Returns:
+        Dict[str, Any]: Uploaded object details and transfer statistics
+    """
+    size = os.path.getsize(file_path)
+    part_size = get_part_size(part_size)
+    if multipart_threshold is None:
+        multipart_threshold = get_multipart_threshold()
+    started_at = time.monotonic()
+
+    if size < max(multipart_threshold, part_size) or not supports_multipart(driver):
+        with open(file_path, 'rb') as file_obj:
+            obj = container.upload_object_via_stream(iterator=file_obj, object_name=object_name)
+        elapsed = time.monotonic() - started_at
+        return {
+            'name': obj.name,
+            'size': obj.size if obj.size is not None else size,
+            'hash': obj.hash,
+            'container': obj.container.name,
+            'mode': 'single',
+            'parts': 1,
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_bytes_per_sec': int(size / elapsed) if elapsed > 0 else None
+        }
+
+    # Grow parts if needed to stay within the provider's part count limit
+    part_size = max(part_size, -(-size // MAX_PARTS))
+    concurrency = get_concurrency(max_concurrency)
+    retries = get_part_retries()
+
+    headers = {'Content-Type': driver._determine_content_type(None, object_name)}
+    upload_id = driver._initiate_multipart(container, object_name, headers=headers)
+
+    def _part_tasks():
+        for index, offset in enumerate(range(0, size, part_size)):
+            length = min(part_size, size - offset)
+            yield lambda n=index + 1, o=offset, l=length: _upload_part(
+                profile, container.name, container.extra, object_name, upload_id, file_path, n, o, l, retries)
+
+    try:
+        parts = run_windowed(_part_tasks(), concurrency)
+        chunks = sorted((number, etag) for number, etag, _ in parts)
+        etag = driver._commit_multipart(container, object_name, upload_id, chunks)
+    except Exception:
+        logger.error(f"Aborting multipart upload of {object_name}")
+        try:
+            driver._abort_multipart(container, object_name, upload_id)
+        except Exception as e:
+            logger.error(f"Failed to abort multipart upload of {object_name}: {str(e)}")
+        raise
+
+    elapsed = time.monotonic() - started_at
+    return {
+        'name': object_name,
+        'size': sum(length for _, _, length in parts),
+        'hash': etag.replace('"', '') if etag else etag,
+        'container': container.name,
+        'mode': 'multipart',
+        'parts': len(chunks),
+        'part_size': part_size,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_bytes_per_sec': int(size / elapsed) if elapsed > 0 else None
+    }
+
+
+def has_resume_state(destination_path: str) -> bool:
+    """Return True if an interrupted ranged download of destination_path can be resumed"""
+    return os.path.exists(destination_path + PROGRESS_SUFFIX)
+
+
+def _load_progress(progress_path, partial_path, state):
+    """Return completed part numbers from a sidecar file that matches state, else an empty set"""
+    if not os.path.exists(progress_path) or not os.path.exists(partial_path):
+        return set()
+    try:
+        with open(progress_path, 'r') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if any(saved.get(name) != value for name, value in state.items()):
+        logger.info(f"Discarding stale download progress in {progress_path}")
+        return set()
+    if os.path.getsize(partial_path) != state['size']:
+        return set()
+    return set(saved.get('completed', []))
+
+
+def _save_progress(progress_path, state, completed):
+    """Atomically write the resume sidecar file"""
+    temp_path = progress_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(dict(state, completed=sorted(completed)), f)
+    os.replace(temp_path, progress_path)
+
+
+def _download_part(profile, obj, partial_path, part_number, offset, length, retries):
+    """Fetch one byte range of obj and write it at the same offset of partial_path"""
+    def _get():
+        driver = cloud.get_thread_driver(profile)
+        stream = driver.download_object_range_as_stream(
+            rebind_object(obj, driver), offset, offset + length, chunk_size=READ_CHUNK_SIZE)
+        written = 0
+        with open(partial_path, 'r+b') as f:
+            f.seek(offset)
+            for chunk in stream:
+                f.write(chunk)
+                written += len(chunk)
+        if written != length:
+            raise cloud.LibcloudError(f"Short read for part {part_number}: {written} of {length} bytes",
+                                      driver=driver)
+        return part_number, length
+
+    return with_retries(_get, retries, f"part {part_number} of {obj.name}")
+
+
+def file_md5(file_path: str) -> str:
+    """Return the hex MD5 digest of a local file"""
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download_file(obj, destination_path: str, part_size: int = None,
+                  max_concurrency: int = None, verify_hash: bool = True,
+                  profile: str = None) -> Dict[str, Any]:
+    """
+    Download an object with concurrent ranged GETs, resuming an interrupted transfer.
+
+    Ranges are written with positional writes into a preallocated
+    '<destination>.part' file. Finished part numbers are recorded in a
+    '<destination>.progress' sidecar so that a later call with the same
+    object, size and part size only fetches the missing ranges.
+
+    Args:
+        obj: libcloud Object with a known size
+        destination_path (str): Local path where the object should be saved
+        part_size (int, optional): Bytes per ranged GET (minimum 5 MiB)
+        max_concurrency (int, optional): Ranges fetched at the same time
+        verify_hash (bool, optional): Compare the file's MD5 with the object's ETag when it is a plain MD5
+        profile (str, optional): Cloud profile whose per-thread drivers fetch the ranges
+
+    Returns:
+        Dict[str, Any]: Transfer statistics, including whether the hash was verified
+    """
+    size = int(obj.size)
+    part_size = max(get_part_size(part_size), -(-size // MAX_PARTS))
+    concurrency = get_concurrency(max_concurrency)
+    retries = get_part_retries()
+    partial_path = destination_path + PARTIAL_SUFFIX
+    progress_path = destination_path + PROGRESS_SUFFIX
+    state = {
+        'bucket': obj.container.name,
+        'object': obj.name,
+        'size': size,
+        'hash': obj.hash,
+        'part_size': part_size
+    }
+    started_at = time.monotonic()
+
+    completed = _load_progress(progress_path, partial_path, state)
+    resumed_parts = len(completed)
+    if not completed:
+        # Preallocate so that every range can be written in place
+        with open(partial_path, 'wb') as f:
+            f.truncate(size)
+    _save_progress(progress_path, state, completed)
+
+    def _part_tasks():
+        for index, offset in enumerate(range(0, size, part_size)):
+            if index + 1 in completed:
+                continue
+            length = min(part_size, size - offset)
+            yield lambda n=index + 1, o=offset, l=length: _download_part(
+                profile, obj, partial_path, n, o, l, retries)
+
+    def _on_part(result):
+        completed.add(result[0])
+        _save_progress(progress_path, state, completed)
+
+    run_windowed(_part_tasks(), concurrency, on_result=_on_part)
+
+    # Only S3-style ETags of single-part uploads are content MD5s; multipart
+    # ETags end in '-<parts>' and other drivers hash other things
+    verified = None
+    if (verify_hash and cloud.is_s3_driver(obj.driver)
+            and obj.hash and _MD5_PATTERN.match(obj.hash.strip('"'))):
+        verified = file_md5(partial_path) == obj.hash.strip('"')
+        if not verified:
+            os.remove(partial_path)
+            os.remove(progress_path)
+            raise cloud.LibcloudError(f"Hash mismatch for {obj.name}: download discarded")
+
+    os.replace(partial_path, destination_path)
+    os.remove(progress_path)
+
+    elapsed = time.monotonic() - started_at
+    fetched = size - min(size, resumed_parts * part_size)
+    return {
+        'size': size,
+        'mode': 'ranged',
+        'parts': -(-size // part_size) if size else 0,
+        'part_size': part_size,
+        'resumed_parts': resumed_parts,
+        'verified': verified,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_bytes_per_sec': int(fetched / elapsed) if elapsed > 0 else None
+    }